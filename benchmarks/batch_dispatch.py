@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.stub_ai import StubConfig, start_in_thread
+
+
+def _setup(database_url: str, stub_url: str) -> None:
+    os.environ.update(
+        {
+            "DJANGO_SETTINGS_MODULE": "chatbox_project.settings",
+            "DATABASE_URL": database_url,
+            "AI_MESSAGE_WEBHOOK_URL": stub_url,
+            "AI_MESSAGE_WEBHOOK_METHOD": "POST",
+            "RATE_LIMIT_ENABLED": "False",
+        }
+    )
+    import django
+
+    django.setup()
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+
+
+def _enqueue(label: str, count: int) -> None:
+    from chatbox_app.models import ChatSession, Message, WebhookDelivery
+    from chatbox_app.webhooks import build_message_payload
+
+    session = ChatSession.objects.create(name=f"Benchmark lots {label}")
+    messages = Message.objects.bulk_create(
+        [Message(session=session, sender=Message.USER, content=f"Message {i}") for i in range(count)]
+    )
+    WebhookDelivery.objects.bulk_create(
+        [
+            WebhookDelivery(kind=WebhookDelivery.KIND_MESSAGE, message=message, payload=build_message_payload(message))
+            for message in messages
+        ]
+    )
+
+
+def _run(args, stub, batch_size: int) -> dict:
+    from django.core.management import call_command
+    from django.test.utils import override_settings
+
+    from chatbox_app.models import WebhookDelivery
+
+    label = f"lot={batch_size}" if batch_size > 1 else "unitaire"
+    _enqueue(label, args.messages)
+    requests_before = stub.requests
+    options = {
+        "concurrency": args.concurrency,
+        "message_batch_size": batch_size,
+        "message_batch_window": args.window,
+        "use_async": args.use_async,
+        "once": True,
+        "stdout": io.StringIO(),
+    }
+    with override_settings(AI_MESSAGE_BATCH_SIZE=batch_size):
+        started = time.perf_counter()
+        call_command("dispatch_webhooks", **options)
+        elapsed = time.perf_counter() - started
+
+    delivered = WebhookDelivery.objects.filter(status=WebhookDelivery.STATUS_DELIVERED).count()
+    WebhookDelivery.objects.all().delete()
+    return {
+        "label": label,
+        "messages": args.messages,
+        "delivered": delivered,
+        "upstream_requests": stub.requests - requests_before,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_msg_s": round(delivered / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare l'envoi des messages un par un et par lots vers un serveur IA factice."
+    )
+    parser.add_argument("--messages", type=int, default=500, help="Messages en file par scénario.")
+    parser.add_argument("--batch-sizes", default="1,10,50", help="Tailles de lot à comparer (1 : un appel par message).")
+    parser.add_argument("--window", type=float, default=50, help="Fenêtre de regroupement en millisecondes.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrence du worker webhook.")
+    parser.add_argument("--async", action="store_true", dest="use_async", help="Utilise le worker asynchrone.")
+    parser.add_argument("--stub-latency", type=float, default=0.05, help="Latence du serveur IA factice en secondes.")
+    parser.add_argument("--database-url", default="", help="Base à utiliser (SQLite temporaire par défaut).")
+    parser.add_argument("--output", default="", help="Fichier JSON où écrire les résultats.")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="chatbox-bench-")
+    stub = start_in_thread(StubConfig(latency=args.stub_latency))
+    _setup(args.database_url or f"sqlite:///{workdir}/bench.sqlite3", stub.url)
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": [_run(args, stub, int(size)) for size in args.batch_sizes.split(",") if size.strip()],
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+    if not args.database_url:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import httpx
+
+
+RequestFactory = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+def succeeded(status: int) -> bool:
+    return 200 <= status < 400
+
+
+@dataclass
+class LoadResult:
+    label: str
+    concurrency: int
+    # Successful responses only: rejections (429, 503) are usually fast and would flatter latency and throughput.
+    latencies: list[float] = field(default_factory=list)
+    statuses: dict[int, int] = field(default_factory=dict)
+    errors: int = 0
+    elapsed: float = 0.0
+
+    def percentile(self, value: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, round(value / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def as_dict(self) -> dict:
+        completed = sum(count for status, count in self.statuses.items() if succeeded(status))
+        requests = sum(self.statuses.values()) + self.errors
+        return {
+            "label": self.label,
+            "concurrency": self.concurrency,
+            "requests": requests,
+            "succeeded": completed,
+            "errors": self.errors,
+            "error_ratio": round((requests - completed) / requests, 4) if requests else 0.0,
+            "statuses": {str(code): count for code, count in sorted(self.statuses.items())},
+            "elapsed_s": round(self.elapsed, 3),
+            "throughput_rps": round(completed / self.elapsed, 2) if self.elapsed else 0.0,
+            "latency_ms": {
+                "mean": round(statistics.fmean(self.latencies) * 1000, 2) if self.latencies else 0.0,
+                "p50": round(self.percentile(50) * 1000, 2),
+                "p95": round(self.percentile(95) * 1000, 2),
+                "p99": round(self.percentile(99) * 1000, 2),
+                "max": round(max(self.latencies, default=0.0) * 1000, 2),
+            },
+        }
+
+
+async def run_load(
+    label: str,
+    base_url: str,
+    factory: RequestFactory,
+    total: int,
+    concurrency: int,
+    timeout: float = 60.0,
+    prepare: Callable[[httpx.AsyncClient], Awaitable[None]] | None = None,
+) -> LoadResult:
+    result = LoadResult(label=label, concurrency=concurrency)
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        if prepare is not None:
+            await prepare(client)
+
+        async def worker() -> None:
+            for index in counter:
+                started = time.perf_counter()
+                try:
+                    response = await factory(client, index)
+                    await response.aread()
+                except httpx.HTTPError:
+                    result.errors += 1
+                    continue
+                if succeeded(response.status_code):
+                    result.latencies.append(time.perf_counter() - started)
+                result.statuses[response.status_code] = result.statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import uuid
+from dataclasses import dataclass
+
+
+@dataclass
+class StubConfig:
+    latency: float = 0.2
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    response_size: int = 64
+    stream_chunks: int = 8
+
+
+class StubAIServer:
+    def __init__(self, config: StubConfig, host: str = "127.0.0.1", port: int = 0):
+        self.config = config
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.errors = 0
+        self._server: asyncio.base_events.Server | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=4096)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _delay(self) -> None:
+        delay = self.config.latency + random.uniform(0, self.config.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", "0"))
+                body = await reader.readexactly(length) if length else b""
+                self.requests += 1
+                await self._respond(writer, body)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, body: bytes) -> None:
+        try:
+            request = json.loads(body) if body else {}
+        except ValueError:
+            request = {}
+
+        if random.random() < self.config.error_rate:
+            self.errors += 1
+            await self._delay()
+            payload = b'{"error": "stub failure"}'
+            writer.write(
+                b"HTTP/1.1 503 Service Unavailable\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(payload)}\r\n\r\n".encode()
+                + payload
+            )
+            await writer.drain()
+            return
+
+        reply = "x" * self.config.response_size
+        if isinstance(request, dict) and request.get("stream"):
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+            chunk_count = max(1, self.config.stream_chunks)
+            step = max(1, len(reply) // chunk_count)
+            for start in range(0, len(reply), step):
+                await asyncio.sleep(self.config.latency / chunk_count)
+                event = f"data: {json.dumps({'delta': reply[start:start + step]})}\n\n".encode()
+                writer.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+                await writer.drain()
+            done = b"data: [DONE]\n\n"
+            writer.write(f"{len(done):x}\r\n".encode() + done + b"\r\n0\r\n\r\n")
+            await writer.drain()
+            return
+
+        await self._delay()
+        if isinstance(request, list):
+            data = [{"message_id": item.get("message_id"), "status": "ok", "reply": reply} for item in request]
+        else:
+            data = {"id": uuid.uuid4().hex, "status": "pending", "reply": reply}
+        payload = json.dumps(data).encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            + f"Content-Length: {len(payload)}\r\n\r\n".encode()
+            + payload
+        )
+        await writer.drain()
+
+
+def start_in_thread(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> StubAIServer:
+    server = StubAIServer(config, host, port)
+    ready = threading.Event()
+    loop = asyncio.new_event_loop()
+
+    def run() -> None:
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="stub-ai", daemon=True).start()
+    ready.wait()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serveur IA factice pour les webhooks message et vidéo.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Latence de base en secondes.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latence aléatoire supplémentaire en secondes.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion de réponses 503 (0 à 1).")
+    parser.add_argument("--response-size", type=int, default=64, help="Taille de la réponse générée en caractères.")
+    parser.add_argument("--stream-chunks", type=int, default=8, help="Nombre de fragments pour les réponses en flux.")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        response_size=args.response_size,
+        stream_chunks=args.stream_chunks,
+    )
+    server = StubAIServer(config, args.host, args.port)
+    print(f"Serveur IA factice sur http://{args.host}:{args.port}/")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+import httpx
+
+from benchmarks.driver import run_load
+from benchmarks.stub_ai import StubConfig, start_in_thread
+from benchmarks.wsgi_vs_asgi import BASE_DIR, _server_commands, _wait_for_port
+
+
+SCENARIOS = ("dashboard", "chat_session", "send_message", "video_status")
+VIEW_NAMES = {
+    "dashboard": "chatbox_app:dashboard",
+    "chat_session": "chatbox_app:chat_session",
+    "send_message": "chatbox_app:chat_session",
+    "video_status": "chatbox_app:video_status",
+}
+QUERY_METRIC_RE = re.compile(r'^chatbox_view_db_queries_(sum|count)\{view="([^"]+)"\} (\S+)$', re.MULTILINE)
+
+
+def _environment(database_url: str, stub_url: str) -> dict[str, str]:
+    os.environ.update(
+        {
+            "DJANGO_SETTINGS_MODULE": "chatbox_project.settings",
+            "DATABASE_URL": database_url,
+            "AI_MESSAGE_WEBHOOK_URL": stub_url,
+            "AI_VIDEO_API_URL": stub_url,
+            "ALLOWED_HOSTS": "127.0.0.1,localhost",
+            "RATE_LIMIT_ENABLED": "False",
+            "METRICS_ENABLED": "True",
+            "METRICS_TOKEN": "",
+            "METRICS_ALLOWED_IPS": "127.0.0.1",
+            "METRICS_LOG_SAMPLE_RATE": "0",
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(BASE_DIR), os.environ.get("PYTHONPATH", "")])),
+        }
+    )
+    return dict(os.environ)
+
+
+def _seed(args) -> dict:
+    import django
+
+    django.setup()
+    from django.core.management import call_command
+    from django.utils import timezone
+
+    from chatbox_app.models import ChatSession, GeneratedVideo, Message
+
+    call_command("migrate", verbosity=0)
+    rng = random.Random(args.seed)
+    words = "vidéo chat soleil montagne robot musique océan forêt ville nuit dragon jardin".split()
+    now = timezone.now()
+
+    # bulk_create skips the signals, so the denormalized counters are filled in directly.
+    sessions = ChatSession.objects.bulk_create(
+        [
+            ChatSession(
+                name=f"Session {index}",
+                message_count=args.messages,
+                video_count=args.videos,
+                last_activity_at=now - timedelta(minutes=index),
+            )
+            for index in range(args.sessions)
+        ]
+    )
+    for session in sessions:
+        Message.objects.bulk_create(
+            [
+                Message(
+                    session=session,
+                    sender=Message.USER if index % 2 == 0 else Message.ASSISTANT,
+                    content=" ".join(rng.choices(words, k=rng.randint(5, 40))),
+                )
+                for index in range(args.messages)
+            ],
+            batch_size=1000,
+        )
+    statuses = [choice for choice, _ in GeneratedVideo.STATUS_CHOICES]
+    videos = GeneratedVideo.objects.bulk_create(
+        [
+            GeneratedVideo(
+                session=session,
+                prompt=" ".join(rng.choices(words, k=8)),
+                status=rng.choice(statuses),
+                external_id=f"job-{session.pk}-{index}",
+            )
+            for session in sessions
+            for index in range(args.videos)
+        ],
+        batch_size=1000,
+    )
+    return {"session_ids": [session.pk for session in sessions], "video_ids": [video.pk for video in videos]}
+
+
+def _query_totals(text: str) -> dict[str, tuple[float, float]]:
+    totals: dict[str, list[float]] = {}
+    for kind, view, value in QUERY_METRIC_RE.findall(text):
+        totals.setdefault(view, [0.0, 0.0])[0 if kind == "sum" else 1] = float(value)
+    return {view: (queries, requests) for view, (queries, requests) in totals.items()}
+
+
+async def _scrape(base_url: str) -> dict[str, tuple[float, float]]:
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        response = await client.get("/metrics")
+        response.raise_for_status()
+        return _query_totals(response.text)
+
+
+def _factory(scenario: str, seeded: dict, csrf: dict, rng: random.Random):
+    session_ids, video_ids = seeded["session_ids"], seeded["video_ids"]
+
+    async def request(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        if scenario == "dashboard":
+            return await client.get("/")
+        if scenario == "chat_session":
+            return await client.get(f"/sessions/{rng.choice(session_ids)}/")
+        if scenario == "send_message":
+            return await client.post(
+                f"/sessions/{rng.choice(session_ids)}/",
+                data={"action": "send_message", "content": f"Message de charge {index}"},
+                headers={"X-CSRFToken": csrf["token"]},
+            )
+        return await client.get(f"/videos/{rng.choice(video_ids)}/status/")
+
+    return request
+
+
+async def _run_scenarios(args, base_url: str, label: str, seeded: dict) -> list[dict]:
+    results = []
+    for scenario in args.scenarios:
+        rng = random.Random(f"{args.seed}:{scenario}")
+        csrf = {}
+        before = {}
+
+        async def prepare(client: httpx.AsyncClient) -> None:
+            if scenario == "send_message":
+                response = await client.get(f"/sessions/{seeded['session_ids'][0]}/")
+                csrf["token"] = response.cookies.get("csrftoken") or client.cookies.get("csrftoken", "")
+            # Scraped once the warm-up request is done, so its queries are not charged to the scenario.
+            before.update(await _scrape(base_url))
+
+        result = await run_load(
+            f"{label}:{scenario}",
+            base_url,
+            _factory(scenario, seeded, csrf, rng),
+            args.requests,
+            args.concurrency,
+            prepare=prepare,
+        )
+        after = await _scrape(base_url)
+
+        report = result.as_dict()
+        view = VIEW_NAMES[scenario]
+        queries = after.get(view, (0.0, 0.0))[0] - before.get(view, (0.0, 0.0))[0]
+        requests = after.get(view, (0.0, 0.0))[1] - before.get(view, (0.0, 0.0))[1]
+        report["scenario"] = scenario
+        report["db_queries_per_request"] = round(queries / requests, 2) if requests else None
+        results.append(report)
+    return results
+
+
+def _compare(results: list[dict], baseline_path: str) -> list[dict]:
+    baseline = {item["label"]: item for item in json.loads(Path(baseline_path).read_text())["results"]}
+    deltas = []
+    for item in results:
+        previous = baseline.get(item["label"])
+        if previous is None:
+            continue
+        delta = {"label": item["label"]}
+        for key, current, old in (
+            ("throughput_rps", item["throughput_rps"], previous["throughput_rps"]),
+            ("p95_ms", item["latency_ms"]["p95"], previous["latency_ms"]["p95"]),
+            ("p99_ms", item["latency_ms"]["p99"], previous["latency_ms"]["p99"]),
+        ):
+            change = round((current - old) / old * 100, 1) if old else None
+            delta[key] = {"before": old, "after": current, "change_pct": change}
+        # A faster run that fails more often is not an improvement, so the error ratio is reported beside it.
+        ratio = previous.get("error_ratio")
+        change = round((item["error_ratio"] - ratio) * 100, 2) if ratio is not None else None
+        delta["error_ratio"] = {"before": ratio, "after": item["error_ratio"], "change_pts": change}
+        deltas.append(delta)
+    return deltas
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Suite de charge reproductible : tableau de bord, session, envoi de message et statut vidéo."
+    )
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Scénarios séparés par des virgules.")
+    parser.add_argument("--server", choices=["asgi", "wsgi"], default="asgi")
+    parser.add_argument("--requests", type=int, default=500, help="Nombre de requêtes par scénario.")
+    parser.add_argument("--concurrency", type=int, default=50, help="Clients simultanés.")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Processus serveur (1 pour des comptes de requêtes SQL exacts)."
+    )
+    parser.add_argument("--threads", type=int, default=8, help="Threads par processus gunicorn.")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--sessions", type=int, default=50, help="Sessions créées.")
+    parser.add_argument("--messages", type=int, default=200, help="Messages par session.")
+    parser.add_argument("--videos", type=int, default=20, help="Vidéos par session.")
+    parser.add_argument("--seed", type=int, default=42, help="Graine aléatoire des données et des requêtes.")
+    parser.add_argument("--stub-latency", type=float, default=0.2, help="Latence du serveur IA factice en secondes.")
+    parser.add_argument("--stub-jitter", type=float, default=0.0, help="Latence aléatoire supplémentaire.")
+    parser.add_argument("--stub-error-rate", type=float, default=0.0, help="Proportion de réponses 503 (0 à 1).")
+    parser.add_argument("--stub-response-size", type=int, default=64, help="Taille des réponses en caractères.")
+    parser.add_argument(
+        "--with-worker", action="store_true", help="Lance aussi dispatch_webhooks pour livrer les messages au stub."
+    )
+    parser.add_argument("--database-url", default="", help="Base à utiliser (SQLite temporaire par défaut).")
+    parser.add_argument("--baseline", default="", help="Résultats JSON d'un run précédent à comparer.")
+    parser.add_argument("--output", default="", help="Fichier JSON où écrire les résultats.")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Scénario(s) inconnu(s) : {', '.join(sorted(unknown))}")
+
+    random.seed(args.seed)
+    workdir = tempfile.mkdtemp(prefix="chatbox-bench-")
+    database_url = args.database_url or f"sqlite:///{workdir}/bench.sqlite3"
+    stub = start_in_thread(
+        StubConfig(
+            latency=args.stub_latency,
+            jitter=args.stub_jitter,
+            error_rate=args.stub_error_rate,
+            response_size=args.stub_response_size,
+        )
+    )
+    env = _environment(database_url, stub.url)
+    seeded = _seed(args)
+
+    command = _server_commands(args.port, args.workers, args.threads).get(args.server)
+    if command is None:
+        sys.exit(f"Serveur {args.server} introuvable : installez uvicorn ou gunicorn.")
+
+    processes = [subprocess.Popen(command, cwd=BASE_DIR, env=env)]
+    if args.with_worker:
+        worker = [sys.executable, "manage.py", "dispatch_webhooks", "--async", "--poll-interval", "0.2"]
+        processes.append(subprocess.Popen(worker, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL))
+    try:
+        _wait_for_port(args.port)
+        results = asyncio.run(_run_scenarios(args, f"http://127.0.0.1:{args.port}", args.server, seeded))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=30)
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in {"output", "baseline"}},
+        "environment": {
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+        "stub": {"requests": stub.requests, "errors": stub.errors},
+    }
+    if args.baseline:
+        report["comparison"] = _compare(results, args.baseline)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+    if not args.database_url:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
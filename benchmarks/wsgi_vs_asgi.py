@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.driver import run_load
+from benchmarks.stub_ai import StubConfig, start_in_thread
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def _configure_environment(database_url: str, stub_url: str) -> dict[str, str]:
+    env = {
+        "DJANGO_SETTINGS_MODULE": "chatbox_project.settings",
+        "DATABASE_URL": database_url,
+        "AI_MESSAGE_WEBHOOK_URL": stub_url,
+        "AI_VIDEO_API_URL": stub_url,
+        "AI_MESSAGE_STREAMING": "True",
+        "ALLOWED_HOSTS": "127.0.0.1,localhost",
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(BASE_DIR), os.environ.get("PYTHONPATH", "")])),
+    }
+    os.environ.update(env)
+    return dict(os.environ)
+
+
+def _seed(videos: int) -> tuple[int, list[int]]:
+    import django
+
+    django.setup()
+    from django.core.management import call_command
+
+    from chatbox_app.models import ChatSession, GeneratedVideo
+
+    call_command("migrate", verbosity=0)
+    session = ChatSession.objects.create(name="Benchmark WSGI/ASGI")
+    statuses = [choice for choice, _ in GeneratedVideo.STATUS_CHOICES]
+    created = GeneratedVideo.objects.bulk_create(
+        [
+            GeneratedVideo(session=session, prompt=f"Prompt {i}", status=statuses[i % len(statuses)])
+            for i in range(videos)
+        ]
+    )
+    return session.pk, [video.pk for video in created]
+
+
+def _server_commands(port: int, workers: int, threads: int) -> dict[str, list[str]]:
+    bind = f"127.0.0.1:{port}"
+    commands = {}
+    if shutil.which("gunicorn"):
+        commands["wsgi"] = [
+            "gunicorn", "chatbox_project.wsgi:application",
+            "--bind", bind, "--workers", str(workers), "--threads", str(threads),
+            "--worker-class", "gthread", "--log-level", "warning",
+        ]
+    if shutil.which("uvicorn"):
+        commands["asgi"] = [
+            "uvicorn", "chatbox_project.asgi:application",
+            "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+            "--log-level", "warning", "--no-access-log",
+        ]
+    return commands
+
+
+def _wait_for_port(port: int, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Le serveur n'a pas démarré sur le port {port}.")
+
+
+async def _scenarios(args, base_url: str, label: str, session_id: int, video_ids: list[int]) -> list[dict]:
+    results = []
+    if args.scenario in {"reply", "both"}:
+        csrf = {}
+
+        async def prepare(client: httpx.AsyncClient) -> None:
+            response = await client.get(f"/sessions/{session_id}/")
+            csrf["token"] = response.cookies.get("csrftoken") or client.cookies.get("csrftoken", "")
+
+        async def reply(client: httpx.AsyncClient, index: int) -> httpx.Response:
+            return await client.post(
+                f"/sessions/{session_id}/reply/",
+                data={"action": "send_message", "content": f"Message de charge {index}"},
+                headers={"X-CSRFToken": csrf["token"]},
+            )
+
+        result = await run_load(f"{label}:reply", base_url, reply, args.requests, args.concurrency, prepare=prepare)
+        results.append(result.as_dict())
+
+    if args.scenario in {"status", "both"}:
+
+        async def status(client: httpx.AsyncClient, index: int) -> httpx.Response:
+            return await client.get(f"/videos/{video_ids[index % len(video_ids)]}/status/")
+
+        result = await run_load(f"{label}:status", base_url, status, args.requests, args.concurrency)
+        results.append(result.as_dict())
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare le débit WSGI (gunicorn) et ASGI (uvicorn) face à un serveur IA factice."
+    )
+    parser.add_argument("--scenario", choices=["reply", "status", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=500, help="Nombre de requêtes par scénario.")
+    parser.add_argument("--concurrency", type=int, default=50, help="Clients simultanés.")
+    parser.add_argument("--workers", type=int, default=2, help="Processus serveur.")
+    parser.add_argument("--threads", type=int, default=8, help="Threads par processus gunicorn.")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--stub-latency", type=float, default=0.2, help="Latence du serveur IA factice en secondes.")
+    parser.add_argument("--videos", type=int, default=200, help="Vidéos créées pour le scénario de statut.")
+    parser.add_argument("--database-url", default="", help="Base à utiliser (SQLite temporaire par défaut).")
+    parser.add_argument("--output", default="", help="Fichier JSON où écrire les résultats.")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="chatbox-bench-")
+    database_url = args.database_url or f"sqlite:///{workdir}/bench.sqlite3"
+    stub = start_in_thread(StubConfig(latency=args.stub_latency))
+    env = _configure_environment(database_url, stub.url)
+    session_id, video_ids = _seed(args.videos)
+
+    commands = _server_commands(args.port, args.workers, args.threads)
+    if not commands:
+        sys.exit("gunicorn et uvicorn sont introuvables : installez-les pour lancer la comparaison.")
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": [],
+    }
+    for label, command in commands.items():
+        process = subprocess.Popen(command, cwd=BASE_DIR, env=env)
+        try:
+            _wait_for_port(args.port)
+            report["results"].extend(
+                asyncio.run(_scenarios(args, f"http://127.0.0.1:{args.port}", label, session_id, video_ids))
+            )
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    report["stub_requests"] = stub.requests
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+    if not args.database_url:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
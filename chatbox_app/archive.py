@@ -0,0 +1,532 @@
+from __future__ import annotations
+
+import json
+import logging
+import tempfile
+import time
+import uuid
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.core.files.storage import default_storage, storages
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import context, search, status_cache, uploads
+from .models import (
+    AttachmentBlob,
+    AttachmentUpload,
+    ChatSession,
+    GeneratedVideo,
+    Message,
+    SessionArchive,
+    WebhookDelivery,
+)
+from .storage import blob_storage
+
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {"zstd": ".jsonl.zst", "gzip": ".jsonl.gz"}
+IN_FLIGHT_VIDEOS = [GeneratedVideo.STATUS_PENDING, GeneratedVideo.STATUS_PROCESSING]
+IN_FLIGHT_DELIVERIES = [WebhookDelivery.STATUS_PENDING, WebhookDelivery.STATUS_SENDING]
+ZSTD_LEVEL = 3
+GZIP_LEVEL = 6
+ROW_CHUNK = 2000
+WRITE_BATCH = 500
+REHYDRATE_ATTEMPTS = 5
+REHYDRATE_BACKOFF = 0.05
+
+
+@dataclass
+class ArchiveStats:
+    sessions: int = 0
+    skipped: int = 0
+    messages: int = 0
+    videos: int = 0
+    attachments: int = 0
+    segments: int = 0
+    raw_bytes: int = 0
+    stored_bytes: int = 0
+
+
+@dataclass
+class _Frozen:
+    message_ids: list[int] = field(default_factory=list)
+    video_ids: list[int] = field(default_factory=list)
+    blob_refs: Counter = field(default_factory=Counter)
+    cold_blobs: set[str] = field(default_factory=set)
+    hot_files: list[str] = field(default_factory=list)
+
+
+def archive_storage():
+    return storages["archives"]
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as exc:
+        raise ImproperlyConfigured(
+            "ARCHIVE_COMPRESSION='zstd' nécessite le paquet zstandard (pip install zstandard)."
+        ) from exc
+    return zstandard
+
+
+def _codec() -> str:
+    codec = getattr(settings, "ARCHIVE_COMPRESSION", "")
+    if not codec:
+        try:
+            _zstd()
+        except ImproperlyConfigured:
+            return "gzip"
+        return "zstd"
+    if codec not in EXTENSIONS:
+        raise ImproperlyConfigured(f"ARCHIVE_COMPRESSION inconnu : {codec}")
+    return codec
+
+
+def _compressor(codec: str):
+    # One independent frame (zstd) or member (gzip) per session, so a session is read back from its own byte range.
+    if codec == "zstd":
+        return _zstd().ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def _decompress(segment: str, data: bytes) -> bytes:
+    if segment.endswith(EXTENSIONS["zstd"]):
+        return _zstd().ZstdDecompressor().decompressobj().decompress(data)
+    return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(data)
+
+
+def _segment_name(codec: str) -> str:
+    now = timezone.now()
+    return f"segments/{now:%Y/%m}/{now:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}{EXTENSIONS[codec]}"
+
+
+def _cold_blob_name(sha256: str) -> str:
+    return f"attachments/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def _cold_file_name(name: str) -> str:
+    return f"files/{name}"
+
+
+def _columns(model) -> list[str]:
+    return [column.attname for column in model._meta.concrete_fields]
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Type non sérialisable : {type(value).__name__}")
+
+
+def _instance(model, row: dict):
+    # Columns added after the session was archived are missing from the row and keep their defaults.
+    values = {
+        column.attname: column.to_python(row[column.attname])
+        for column in model._meta.concrete_fields
+        if column.attname in row
+    }
+    return model(**values)
+
+
+def _insert(model, objs: list) -> None:
+    # bulk_create stamps auto_now(_add) fields with the current time, on the instances too;
+    # put the archived timestamps back afterwards.
+    stamped = [
+        column.attname
+        for column in model._meta.concrete_fields
+        if getattr(column, "auto_now", False) or getattr(column, "auto_now_add", False)
+    ]
+    original = [[getattr(obj, name) for name in stamped] for obj in objs]
+    model.objects.bulk_create(objs, batch_size=WRITE_BATCH)
+    for obj, values in zip(objs, original):
+        for name, value in zip(stamped, values):
+            setattr(obj, name, value)
+    model.objects.bulk_update(objs, stamped, batch_size=WRITE_BATCH)
+
+
+def scan_inactive(cutoff: datetime, batch_size: int) -> Iterator[list[int]]:
+    # Keyset over the partial (last_activity_at, id) index, which only holds sessions still in the hot tables.
+    last = None
+    while True:
+        page = ChatSession.objects.filter(archived_at__isnull=True, last_activity_at__lt=cutoff)
+        if last is not None:
+            page = page.filter(Q(last_activity_at__gt=last[0]) | Q(last_activity_at=last[0], pk__gt=last[1]))
+        rows = list(page.order_by("last_activity_at", "pk").values_list("last_activity_at", "pk")[:batch_size])
+        if not rows:
+            return
+        last = rows[-1]
+        yield [pk for _, pk in rows]
+
+
+def _busy(session_ids: list[int]) -> set[int]:
+    busy = set(
+        GeneratedVideo.objects.filter(session_id__in=session_ids, status__in=IN_FLIGHT_VIDEOS).values_list(
+            "session_id", flat=True
+        )
+    )
+    # Uploads abandoned past UPLOAD_EXPIRY do not hold a session back; _drop_hot removes their partial files.
+    busy.update(
+        AttachmentUpload.objects.filter(
+            session_id__in=session_ids,
+            status=AttachmentUpload.STATUS_UPLOADING,
+            updated_at__gte=uploads.expiry_cutoff(),
+        ).values_list("session_id", flat=True)
+    )
+    deliveries = WebhookDelivery.objects.filter(status__in=IN_FLIGHT_DELIVERIES)
+    busy.update(
+        deliveries.filter(message__session_id__in=session_ids).values_list("message__session_id", flat=True)
+    )
+    busy.update(deliveries.filter(video__session_id__in=session_ids).values_list("video__session_id", flat=True))
+    return busy
+
+
+def _freeze_blob(sha256: str, name: str, frozen: _Frozen) -> None:
+    if sha256 in frozen.cold_blobs:
+        return
+    frozen.cold_blobs.add(sha256)
+    cold = _cold_blob_name(sha256)
+    if archive_storage().exists(cold):
+        return
+    if not blob_storage().exists(name):
+        logger.warning("Attachment blob missing, archived without content", extra={"sha256": sha256})
+        return
+    with blob_storage().open(name, "rb") as handle:
+        archive_storage().save(cold, handle)
+
+
+def _freeze_file(name: str, frozen: _Frozen) -> None:
+    if not default_storage.exists(name):
+        logger.warning("Attachment file missing, archived without content", extra={"attachment": name})
+        return
+    with default_storage.open(name, "rb") as handle:
+        archive_storage().save(_cold_file_name(name), handle)
+    frozen.hot_files.append(name)
+
+
+def _write_frame(handle, codec: str, session: ChatSession, frozen: _Frozen) -> SessionArchive:
+    compressor = _compressor(codec)
+    offset = handle.tell()
+    counts = Counter()
+
+    def emit(record: dict) -> None:
+        line = json.dumps(record, default=_default, ensure_ascii=False).encode() + b"\n"
+        counts["raw"] += len(line)
+        handle.write(compressor.compress(line))
+
+    emit({"type": "session", "row": {"id": session.pk, "name": session.name, "created_at": session.created_at}})
+    messages = (
+        Message.objects.filter(session_id=session.pk)
+        .order_by("created_at", "pk")
+        .values(*_columns(Message), "blob__sha256", "blob__content_type", "blob__file")
+    )
+    for row in messages.iterator(chunk_size=ROW_CHUNK):
+        sha256, content_type, blob_file = row.pop("blob__sha256"), row.pop("blob__content_type"), row.pop("blob__file")
+        record = {"type": "message", "row": row}
+        if row["blob_id"]:
+            _freeze_blob(sha256, blob_file, frozen)
+            frozen.blob_refs[row["blob_id"]] += 1
+            record["blob"] = {"sha256": sha256, "content_type": content_type}
+        elif row["attachment"]:
+            _freeze_file(row["attachment"], frozen)
+        frozen.message_ids.append(row["id"])
+        counts["messages"] += 1
+        emit(record)
+    videos = GeneratedVideo.objects.filter(session_id=session.pk).order_by("pk").values(*_columns(GeneratedVideo))
+    for row in videos.iterator(chunk_size=ROW_CHUNK):
+        frozen.video_ids.append(row["id"])
+        counts["videos"] += 1
+        emit({"type": "video", "row": row})
+    handle.write(compressor.flush())
+    return SessionArchive(
+        session=session,
+        offset=offset,
+        length=handle.tell() - offset,
+        message_count=counts["messages"],
+        video_count=counts["videos"],
+        raw_size=counts["raw"],
+    )
+
+
+def _drop_hot(session_ids: list[int], frozen: _Frozen, now: datetime) -> None:
+    # Raw deletes skip the per-row post_delete signals, which would also bump last_activity_at on every row;
+    # their side effects are replayed below in bulk.
+    db = Message.objects.db
+    WebhookDelivery.objects.filter(
+        Q(message__session_id__in=session_ids) | Q(video__session_id__in=session_ids)
+    )._raw_delete(db)
+    abandoned = AttachmentUpload.objects.filter(session_id__in=session_ids, status=AttachmentUpload.STATUS_UPLOADING)
+    partials = [uploads.partial_path(upload) for upload in abandoned.only("pk")]
+    AttachmentUpload.objects.filter(session_id__in=session_ids)._raw_delete(db)
+    GeneratedVideo.objects.filter(coalesced_into__session_id__in=session_ids).exclude(
+        session_id__in=session_ids
+    ).update(coalesced_into=None)
+    GeneratedVideo.objects.filter(session_id__in=session_ids)._raw_delete(db)
+    Message.objects.filter(session_id__in=session_ids)._raw_delete(db)
+    search.unindex_many("message", frozen.message_ids)
+    search.unindex_many("video", frozen.video_ids)
+    for blob_id, count in frozen.blob_refs.items():
+        AttachmentBlob.objects.filter(pk=blob_id).update(ref_count=Greatest(F("ref_count") - count, 0), updated_at=now)
+    ChatSession.objects.filter(pk__in=session_ids).update(archived_at=now)
+
+    def cleanup() -> None:
+        status_cache.invalidate_many(frozen.video_ids)
+        for session_id in session_ids:
+            context.forget_session(session_id)
+        for name in frozen.hot_files:
+            default_storage.delete(name)
+        for path in partials:
+            path.unlink(missing_ok=True)
+
+    transaction.on_commit(cleanup)
+
+
+def _eligible(session_ids: list[int], cutoff: datetime, lock: bool = False) -> list[ChatSession]:
+    sessions = ChatSession.objects.filter(pk__in=session_ids, archived_at__isnull=True, last_activity_at__lt=cutoff)
+    if lock:
+        sessions = sessions.select_for_update()
+    sessions = list(sessions.order_by("pk"))
+    busy = _busy([session.pk for session in sessions])
+    return [session for session in sessions if session.pk not in busy]
+
+
+def _merge(parts: list[_Frozen]) -> _Frozen:
+    frozen = _Frozen()
+    for part in parts:
+        frozen.message_ids += part.message_ids
+        frozen.video_ids += part.video_ids
+        frozen.blob_refs.update(part.blob_refs)
+        frozen.cold_blobs |= part.cold_blobs
+        frozen.hot_files += part.hot_files
+    return frozen
+
+
+def archive_batch(session_ids: list[int], cutoff: datetime, codec: str, stats: ArchiveStats, dry_run: bool) -> None:
+    sessions = _eligible(session_ids, cutoff)
+    if not sessions or dry_run:
+        ids = [session.pk for session in sessions]
+        stats.skipped += len(session_ids) - len(ids)
+        if ids:
+            stats.sessions += len(ids)
+            stats.messages += Message.objects.filter(session_id__in=ids).count()
+            stats.videos += GeneratedVideo.objects.filter(session_id__in=ids).count()
+        return
+
+    # Compression and attachment copies run before the transaction, which then only holds its locks for the
+    # hot deletes. A session written to meanwhile stays hot; its frame is left unreferenced in the segment.
+    frames: dict[int, tuple[SessionArchive, _Frozen]] = {}
+    with tempfile.TemporaryFile() as handle:
+        for session in sessions:
+            frozen = _Frozen()
+            frames[session.pk] = (_write_frame(handle, codec, session, frozen), frozen)
+        handle.seek(0)
+        segment = archive_storage().save(_segment_name(codec), File(handle))
+    ids: list[int] = []
+    try:
+        with transaction.atomic():
+            locked = [session.pk for session in _eligible(list(frames), cutoff, lock=True)]
+            index = [frames[session_id][0] for session_id in locked]
+            frozen = _merge([frames[session_id][1] for session_id in locked])
+            for entry in index:
+                entry.segment = segment
+            SessionArchive.objects.bulk_create(index)
+            _drop_hot(locked, frozen, timezone.now())
+        ids = locked
+    finally:
+        for session_id, (_, part) in frames.items():
+            if session_id not in ids:
+                for name in part.hot_files:
+                    archive_storage().delete(_cold_file_name(name))
+        if not ids:
+            archive_storage().delete(segment)
+
+    stats.skipped += len(session_ids) - len(ids)
+    if not ids:
+        return
+    stats.sessions += len(ids)
+    stats.segments += 1
+    stats.messages += len(frozen.message_ids)
+    stats.videos += len(frozen.video_ids)
+    stats.attachments += len(frozen.cold_blobs) + len(frozen.hot_files)
+    stats.raw_bytes += sum(entry.raw_size for entry in index)
+    stats.stored_bytes += sum(entry.length for entry in index)
+    logger.info(
+        "Sessions archived",
+        extra={
+            "segment": segment,
+            "sessions": len(ids),
+            "messages": len(frozen.message_ids),
+            "videos": len(frozen.video_ids),
+            "stored_bytes": sum(entry.length for entry in index),
+        },
+    )
+
+
+def archive_inactive(
+    inactive_for: int, batch_size: int = 200, limit: int | None = None, dry_run: bool = False
+) -> ArchiveStats:
+    cutoff = timezone.now() - timedelta(seconds=inactive_for)
+    codec = _codec()
+    stats = ArchiveStats()
+    for session_ids in scan_inactive(cutoff, batch_size):
+        if limit is not None:
+            session_ids = session_ids[: limit - stats.sessions]
+        archive_batch(session_ids, cutoff, codec, stats, dry_run)
+        if limit is not None and stats.sessions >= limit:
+            break
+    return stats
+
+
+def read_frame(archive: SessionArchive) -> Iterator[dict]:
+    with archive_storage().open(archive.segment, "rb") as handle:
+        handle.seek(archive.offset)
+        data = handle.read(archive.length)
+    for line in _decompress(archive.segment, data).split(b"\n"):
+        if line:
+            yield json.loads(line)
+
+
+def _thaw_blob(sha256: str, content_type: str) -> AttachmentBlob | None:
+    blob = AttachmentBlob.objects.filter(sha256=sha256).first()
+    if blob is not None:
+        return blob
+    cold = _cold_blob_name(sha256)
+    if not archive_storage().exists(cold):
+        logger.warning("Archived attachment blob missing", extra={"sha256": sha256})
+        return None
+    with archive_storage().open(cold, "rb") as handle:
+        return AttachmentBlob.objects.store(handle, sha256=sha256, content_type=content_type)
+
+
+def _thaw_file(name: str) -> str:
+    cold = _cold_file_name(name)
+    if not archive_storage().exists(cold):
+        logger.warning("Archived attachment file missing", extra={"attachment": name})
+        return ""
+    with archive_storage().open(cold, "rb") as handle:
+        return default_storage.save(name, handle)
+
+
+def _restore_messages(records: list[dict], now: datetime) -> tuple[list[Message], list[str]]:
+    blobs: dict[str, AttachmentBlob | None] = {}
+    refs = Counter()
+    thawed_files = []
+    messages = []
+    for record in records:
+        message = _instance(Message, record["row"])
+        if "blob" in record:
+            sha256 = record["blob"]["sha256"]
+            if sha256 not in blobs:
+                blobs[sha256] = _thaw_blob(sha256, record["blob"]["content_type"])
+            blob = blobs[sha256]
+            message.blob_id = blob.pk if blob is not None else None
+            message.attachment = blob.file.name if blob is not None else ""
+            if blob is not None:
+                refs[blob.pk] += 1
+        elif message.attachment:
+            thawed_files.append(message.attachment.name)
+            message.attachment = _thaw_file(message.attachment.name)
+        messages.append(message)
+    for blob_id, count in refs.items():
+        AttachmentBlob.objects.filter(pk=blob_id).update(ref_count=F("ref_count") + count, updated_at=now)
+
+    _insert(Message, messages)
+    return messages, thawed_files
+
+
+def _restore_videos(records: list[dict]) -> list[GeneratedVideo]:
+    videos = [_instance(GeneratedVideo, record["row"]) for record in records]
+    leaders = {video.coalesced_into_id for video in videos if video.coalesced_into_id}
+    leaders = {video.pk for video in videos} | set(
+        GeneratedVideo.objects.filter(pk__in=leaders).values_list("pk", flat=True)
+    )
+    for video in videos:
+        if video.coalesced_into_id not in leaders:
+            video.coalesced_into_id = None
+    _insert(GeneratedVideo, videos)
+    return videos
+
+
+def _drop_segment_if_unused(segment: str) -> None:
+    if not SessionArchive.objects.filter(segment=segment).exists():
+        archive_storage().delete(segment)
+
+
+def _restore(session: ChatSession) -> tuple[datetime, int, int] | None:
+    with transaction.atomic():
+        now = timezone.now()
+        # Claim the restore with a write first: a concurrent open waits on (or fails fast at) the row lock
+        # instead of racing through the reads, and finds the session already hot once it gets through.
+        # Reopening counts as activity, otherwise the next archival run would freeze the session straight back.
+        claimed = ChatSession.objects.filter(pk=session.pk, archived_at__isnull=False).update(
+            archived_at=None, last_activity_at=now
+        )
+        if not claimed:
+            return None
+        archive = SessionArchive.objects.filter(session_id=session.pk).first()
+        if archive is None:
+            logger.warning("Archived session has no archive entry", extra={"session_id": session.pk})
+            return None
+        records: dict[str, list[dict]] = {"session": [], "message": [], "video": []}
+        for record in read_frame(archive):
+            records[record["type"]].append(record)
+        if not records["session"] or records["session"][0]["row"]["id"] != session.pk:
+            raise ValueError(f"Archive incohérente pour la session {session.pk} ({archive.segment})")
+
+        messages, thawed_files = _restore_messages(records["message"], now)
+        videos = _restore_videos(records["video"])
+        search.index_many("message", [(message.pk, session.pk, message.content) for message in messages])
+        search.index_many("video", [(video.pk, session.pk, video.prompt) for video in videos])
+        segment = archive.segment
+        archive.delete()
+
+        def cleanup() -> None:
+            context.forget_session(session.pk)
+            _drop_segment_if_unused(segment)
+            for name in thawed_files:
+                archive_storage().delete(_cold_file_name(name))
+
+        transaction.on_commit(cleanup)
+    return now, len(messages), len(videos)
+
+
+def rehydrate(session: ChatSession) -> bool:
+    started = time.perf_counter()
+    for attempt in range(REHYDRATE_ATTEMPTS):
+        try:
+            restored = _restore(session)
+            break
+        except (OperationalError, IntegrityError):
+            # SQLite has no row locks: a concurrent restore surfaces as "database is locked". The retry's claim
+            # finds the session already hot if the other one committed.
+            if attempt == REHYDRATE_ATTEMPTS - 1:
+                raise
+            logger.warning("Rehydration contended, retrying", extra={"session_id": session.pk, "attempt": attempt + 1})
+            time.sleep(REHYDRATE_BACKOFF * 2**attempt)
+
+    session.archived_at = None
+    if restored is None:
+        # Another request restored it first.
+        return False
+    session.last_activity_at, messages, videos = restored
+    logger.info(
+        "Archived session rehydrated",
+        extra={
+            "session_id": session.pk,
+            "messages": messages,
+            "videos": videos,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        },
+    )
+    return True
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class DisconnectMiddleware:
+    # Django 4.2 stops reading receive() once the body is in, so a streaming response runs on after the client
+    # leaves. Keep listening and cancel the response when the client disconnects once the headers are out.
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        messages: asyncio.Queue = asyncio.Queue()
+        started = asyncio.Event()
+
+        async def tracked_send(message) -> None:
+            if message["type"] == "http.response.start":
+                started.set()
+            await send(message)
+
+        response = asyncio.create_task(self.app(scope, messages.get, tracked_send))
+        listener = asyncio.create_task(self._listen(receive, messages, started, response))
+        try:
+            await asyncio.wait({response})
+        finally:
+            listener.cancel()
+            if not response.done():
+                # The server cancelled us: take the response down too.
+                response.cancel()
+        if response.cancelled():
+            logger.info("Client disconnected; response cancelled", extra={"path": scope.get("path", "")})
+            return
+        response.result()
+
+    @staticmethod
+    async def _listen(receive, messages: asyncio.Queue, started: asyncio.Event, response: asyncio.Task) -> None:
+        while True:
+            message = await receive()
+            messages.put_nowait(message)
+            if message["type"] == "http.disconnect":
+                break
+        # A view still computing its response is left to finish; only the body it streams is cut short.
+        await started.wait()
+        response.cancel()
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator
+
+from django.conf import settings
+from django.db.models import Case, F, Q, Value, When
+
+from asgiref.sync import sync_to_async
+import httpx
+import requests
+
+from . import metrics
+from .models import CircuitBreakerState
+from .ratelimit import Overloaded
+
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+BREAKERS = ("message", "video")
+TRANSITION_HISTORY = 20
+
+
+class CircuitOpen(Overloaded):
+    pass
+
+
+def is_failure(exc: BaseException) -> bool:
+    if isinstance(exc, (requests.HTTPError, httpx.HTTPStatusError)) and exc.response is not None:
+        return exc.response.status_code >= 500 or exc.response.status_code == 429
+    return isinstance(exc, (requests.RequestException, httpx.HTTPError))
+
+
+def _threshold() -> int:
+    return getattr(settings, "BREAKER_FAILURE_THRESHOLD", 5)
+
+
+def _cooldown() -> float:
+    return getattr(settings, "BREAKER_COOLDOWN", 30)
+
+
+def _failure_window() -> float:
+    return getattr(settings, "BREAKER_FAILURE_WINDOW", 60)
+
+
+class CircuitBreaker:
+    # State lives in one database row per breaker so every web process and worker sees the same circuit.
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def _row(self) -> CircuitBreakerState:
+        return CircuitBreakerState.objects.filter(name=self.name).first() or CircuitBreakerState(name=self.name)
+
+    def _rows(self):
+        CircuitBreakerState.objects.get_or_create(name=self.name)
+        return CircuitBreakerState.objects.filter(name=self.name)
+
+    def state(self) -> dict:
+        row = self._row()
+        return {"state": row.state, "opened_at": row.opened_at, "changed_at": row.changed_at}
+
+    def transitions(self) -> list[dict]:
+        return self._row().transitions
+
+    def snapshot(self) -> dict:
+        row = self._row()
+        now = time.time()
+        retry_after = 0.0
+        if row.state == OPEN:
+            retry_after = max(0.0, row.opened_at + _cooldown() - now)
+        failures = 0
+        if row.window_started_at is not None and row.window_started_at + _failure_window() > now:
+            failures = row.failures
+        return {
+            "name": self.name,
+            "state": row.state,
+            "failures": failures,
+            "threshold": _threshold(),
+            "retry_after": round(retry_after, 1),
+            "changed_at": row.changed_at,
+            "transitions": row.transitions,
+        }
+
+    def reset(self) -> None:
+        self._transition(CLOSED, "manual reset")
+
+    def _transition(self, new_state: str, reason: str, expected: tuple[str, ...] | None = None) -> bool:
+        while True:
+            row = self._rows().get()
+            if expected is not None and row.state not in expected:
+                return False
+            now = time.time()
+            history = row.transitions[-(TRANSITION_HISTORY - 1) :]
+            history.append({"from": row.state, "to": new_state, "at": now, "reason": reason})
+            changes = {
+                "state": new_state,
+                "version": F("version") + 1,
+                "failures": 0,
+                "window_started_at": None,
+                "opened_at": now if new_state == OPEN else None,
+                "changed_at": now,
+                "transitions": history,
+            }
+            if new_state != HALF_OPEN:
+                changes.update(probe_token="", probe_expires_at=None)
+            # Compare-and-set on the version so concurrent processes never apply the same transition twice.
+            if CircuitBreakerState.objects.filter(name=self.name, version=row.version).update(**changes):
+                break
+        log = logger.warning if new_state == OPEN else logger.info
+        log(
+            "Circuit breaker transition",
+            extra={"breaker": self.name, "from": row.state, "to": new_state, "reason": reason},
+        )
+        return True
+
+    def _release_probe(self, probe: str) -> None:
+        CircuitBreakerState.objects.filter(name=self.name, probe_token=probe).update(
+            probe_token="", probe_expires_at=None
+        )
+
+    def before_call(self) -> str | None:
+        row = self._row()
+        if row.state == CLOSED:
+            return None
+        now = time.time()
+        if row.state == OPEN:
+            remaining = row.opened_at + _cooldown() - now
+            if remaining > 0:
+                raise CircuitOpen("Le service IA est momentanément indisponible.", retry_after=remaining)
+        # One worker at a time probes recovery; everyone else keeps failing fast.
+        probe = uuid.uuid4().hex
+        claimed = (
+            CircuitBreakerState.objects.filter(name=self.name, state=row.state)
+            .filter(Q(probe_token="") | Q(probe_expires_at__lt=now))
+            .update(probe_token=probe, probe_expires_at=now + getattr(settings, "BREAKER_PROBE_TIMEOUT", 60))
+        )
+        if not claimed:
+            raise CircuitOpen("Le service IA est momentanément indisponible.", retry_after=_cooldown())
+        if row.state == OPEN:
+            self._transition(HALF_OPEN, "cooldown elapsed", expected=(OPEN,))
+        return probe
+
+    def record_success(self, probe: str | None) -> None:
+        if probe is not None:
+            if not self._transition(CLOSED, "probe succeeded", expected=(OPEN, HALF_OPEN)):
+                self._release_probe(probe)
+            return
+        # Read first so the hot path never takes a write lock when there is nothing to reset.
+        failed = CircuitBreakerState.objects.filter(name=self.name, failures__gt=0)
+        if failed.exists():
+            failed.update(failures=0, window_started_at=None)
+
+    def record_failure(self, probe: str | None, exc: BaseException) -> None:
+        # The class only: exception messages can carry upstream URLs, and the history is served over HTTP.
+        reason = type(exc).__name__
+        if probe is not None:
+            if not self._transition(OPEN, f"probe failed ({reason})", expected=(OPEN, HALF_OPEN)):
+                self._release_probe(probe)
+            return
+        now = time.time()
+        in_window = Q(window_started_at__gte=now - _failure_window())
+        self._rows().update(
+            failures=Case(When(in_window, then=F("failures") + 1), default=Value(1)),
+            window_started_at=Case(When(in_window, then=F("window_started_at")), default=Value(now)),
+        )
+        row = self._row()
+        if row.failures >= _threshold() and row.state == CLOSED:
+            self._transition(OPEN, f"{row.failures} consecutive failures ({reason})", expected=(CLOSED,))
+
+    def _finish(self, probe: str | None, exc: BaseException | None) -> None:
+        if exc is None:
+            self.record_success(probe)
+        elif is_failure(exc):
+            self.record_failure(probe, exc)
+        elif probe is not None and isinstance(exc, Exception):
+            # The upstream answered (e.g. a 4xx), so it is reachable again.
+            self.record_success(probe)
+        elif probe is not None:
+            # Cancelled or disconnected before an answer: let the next caller probe instead.
+            self._release_probe(probe)
+
+    def _admit(self) -> str | None:
+        try:
+            return self.before_call()
+        except CircuitOpen:
+            metrics.UPSTREAM_CALLS.inc(self.name, "circuit_open")
+            raise
+
+    def _done(self, probe: str | None, started: float, exc: BaseException | None) -> None:
+        metrics.observe_upstream(self.name, time.perf_counter() - started, exc)
+        self._finish(probe, exc)
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        probe = self._admit()
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException as exc:
+            self._done(probe, started, exc)
+            raise
+        self._done(probe, started, None)
+
+    @asynccontextmanager
+    async def aguard(self) -> AsyncIterator[None]:
+        probe = await sync_to_async(self._admit)()
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException as exc:
+            await sync_to_async(self._done)(probe, started, exc)
+            raise
+        await sync_to_async(self._done)(probe, started, None)
+
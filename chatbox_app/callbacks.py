@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import ChatSession, GeneratedVideo, Message
+from .webhooks import apply_video_result
+
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "HTTP_X_KERNEL_SIGNATURE"
+TIMESTAMP_HEADER = "HTTP_X_KERNEL_TIMESTAMP"
+
+
+class CallbackError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def callbacks_enabled() -> bool:
+    return bool(getattr(settings, "AI_CALLBACK_SECRET", ""))
+
+
+def sign(body: bytes, timestamp: str, secret: str | None = None) -> str:
+    key = (secret if secret is not None else getattr(settings, "AI_CALLBACK_SECRET", "")).encode()
+    digest = hmac.new(key, timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def verify_signature(body: bytes, timestamp: str, signature: str) -> None:
+    if not timestamp or not signature:
+        raise CallbackError("Signature manquante.", status=401)
+    try:
+        sent_at = int(timestamp)
+    except ValueError as exc:
+        raise CallbackError("Horodatage invalide.", status=401) from exc
+    tolerance = getattr(settings, "AI_CALLBACK_TOLERANCE", 300)
+    if abs(time.time() - sent_at) > tolerance:
+        raise CallbackError("Horodatage expiré.", status=401)
+    if not hmac.compare_digest(sign(body, timestamp), signature):
+        raise CallbackError("Signature invalide.", status=401)
+
+
+def apply_video_callback(data: dict) -> tuple[GeneratedVideo, bool]:
+    external_id = str(data.get("external_id") or data.get("id") or data.get("job_id") or "")
+    if not external_id:
+        raise CallbackError("external_id manquant.")
+    with transaction.atomic():
+        video = (
+            GeneratedVideo.objects.select_for_update()
+            .filter(external_id=external_id)
+            .order_by("-created_at")
+            .first()
+        )
+        if video is None:
+            raise CallbackError("Vidéo inconnue.", status=404)
+        if video.is_terminal:
+            return video, False
+        previous = (video.status, video.video_url)
+        apply_video_result(video, data)
+        if (video.status, video.video_url) == previous:
+            return video, False
+        video.save(update_fields=["video_url", "status", "updated_at"])
+    logger.info(
+        "Video callback applied",
+        extra={"video_id": video.pk, "external_id": external_id, "status": video.status},
+    )
+    return video, True
+
+
+def apply_message_callback(data: dict) -> tuple[Message, bool]:
+    external_id = str(data.get("external_id") or data.get("id") or "")
+    content = data.get("content") or data.get("reply") or ""
+    if not external_id:
+        raise CallbackError("external_id manquant.")
+    if not content:
+        raise CallbackError("Contenu manquant.")
+    try:
+        session_id = int(data["session_id"]) if data.get("session_id") else None
+        reply_to = int(data["message_id"]) if data.get("message_id") else None
+    except (TypeError, ValueError) as exc:
+        raise CallbackError("Identifiant invalide.") from exc
+    if session_id is None and reply_to is not None:
+        session_id = Message.objects.filter(pk=reply_to).values_list("session_id", flat=True).first()
+    if not session_id or not ChatSession.objects.filter(pk=session_id).exists():
+        raise CallbackError("Session inconnue.", status=404)
+    message, created = Message.objects.get_or_create(
+        session_id=session_id,
+        external_id=external_id,
+        defaults={"sender": Message.ASSISTANT, "content": content},
+    )
+    if created:
+        logger.info(
+            "Assistant reply stored from callback",
+            extra={"session_id": session_id, "message_id": message.pk, "external_id": external_id},
+        )
+    return message, created
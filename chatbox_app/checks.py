@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.checks import Error, register
+
+from .shared_cache import is_atomic
+
+
+@register()
+def check_shared_limits(app_configs, **kwargs) -> list[Error]:
+    errors = []
+    if is_atomic():
+        return errors
+    if getattr(settings, "RATE_LIMIT_ENABLED", False) and getattr(settings, "RATE_LIMIT_BACKEND", "cache") == "cache":
+        errors.append(
+            Error(
+                "RATE_LIMIT_BACKEND='cache' compte les requêtes dans un cache propre à chaque processus.",
+                hint="Définissez REDIS_URL, ou RATE_LIMIT_ENABLED=False.",
+                id="chatbox_app.E001",
+            )
+        )
+    if getattr(settings, "UPSTREAM_MAX_INFLIGHT", 0):
+        errors.append(
+            Error(
+                "UPSTREAM_MAX_INFLIGHT compte les appels en cours dans un cache propre à chaque processus.",
+                hint="Définissez REDIS_URL, ou UPSTREAM_MAX_INFLIGHT=0.",
+                id="chatbox_app.E002",
+            )
+        )
+    return errors
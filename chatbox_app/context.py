@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import math
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Message
+
+LOCK_TIMEOUT = 5
+SUMMARY_SNIPPET = 160
+TURN_FIELDS = ("pk", "sender", "content", "attachment_type", "created_at")
+PRIVATE_FIELDS = {"tokens", "created_at"}
+
+
+def enabled() -> bool:
+    return getattr(settings, "CONVERSATION_CONTEXT_ENABLED", True)
+
+
+def _history():
+    return caches["conversations"]
+
+
+def _key(session_id: int) -> str:
+    return f"history:v2:{session_id}"
+
+
+def _max_turns() -> int:
+    return max(1, getattr(settings, "CONVERSATION_HISTORY_TURNS", 20))
+
+
+def _ttl() -> int:
+    return getattr(settings, "CONVERSATION_CACHE_TTL", 3600)
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for French and English text; close enough for budgeting.
+    return math.ceil(len(text) / 4)
+
+
+def _turn(pk: int, sender: str, content: str, attachment_type: str, created_at) -> dict:
+    turn = {"id": pk, "role": sender, "content": content, "created_at": created_at}
+    if attachment_type:
+        turn["attachment_type"] = attachment_type
+    turn["tokens"] = estimate_tokens(content) + 4
+    return turn
+
+
+def _snippet(turn: dict) -> str:
+    text = " ".join(turn["content"].split())
+    if len(text) > SUMMARY_SNIPPET:
+        text = text[:SUMMARY_SNIPPET].rsplit(" ", 1)[0] + "…"
+    return f"{turn['role']}: {text}" if text else ""
+
+
+def _summary(folded: list[str]) -> str:
+    # Extractive summary: the opening of each turn that left the window, newest kept.
+    summary = "\n".join(line for line in folded if line)
+    limit = getattr(settings, "CONVERSATION_SUMMARY_TOKENS", 300) * 4
+    if len(summary) > limit:
+        summary = summary[-limit:].split("\n", 1)[-1]
+    return summary
+
+
+def _append(entry: dict, turns: list[dict]) -> dict:
+    for turn in turns:
+        if turn["id"] <= entry["last_id"]:
+            continue
+        entry["turns"].append(turn)
+        entry["last_id"] = turn["id"]
+        entry["last_created_at"] = turn["created_at"]
+    overflow = len(entry["turns"]) - _max_turns()
+    if overflow > 0:
+        # Only the last _max_turns() turns before the window are summarised, the span a cold load reads,
+        # so a long-lived entry and a fresh one hand the same summary upstream.
+        folded = entry["folded"] + [_snippet(turn) for turn in entry["turns"][:overflow]]
+        entry["folded"] = folded[-_max_turns() :]
+        entry["turns"] = entry["turns"][overflow:]
+    return entry
+
+
+def _load(session_id: int, through_id: int) -> dict:
+    # The current message is included: its own insert hook ran before the entry existed.
+    rows = list(
+        Message.objects.filter(session_id=session_id, pk__lte=through_id)
+        .order_by("-created_at", "-id")
+        .values_list(*TURN_FIELDS)[: _max_turns() * 2]
+    )
+    entry = {"last_id": 0, "last_created_at": None, "turns": [], "folded": []}
+    return _append(entry, [_turn(*row) for row in reversed(rows)])
+
+
+def _catch_up(entry: dict, session_id: int, before_id: int) -> list[dict]:
+    # Picks up tail inserts that bypassed the signals (bulk_create, raw SQL); one index range, usually empty.
+    if entry["last_id"] >= before_id - 1:
+        return []
+    rows = Message.objects.filter(session_id=session_id, pk__gt=entry["last_id"], pk__lt=before_id)
+    if entry["last_created_at"] is not None:
+        rows = rows.filter(created_at__gte=entry["last_created_at"])
+    return [_turn(*row) for row in rows.order_by("created_at", "id").values_list(*TURN_FIELDS)]
+
+
+def record_message(message: Message) -> None:
+    history = _history()
+    lock = f"{_key(message.session_id)}:lock"
+    if not history.add(lock, 1, LOCK_TIMEOUT):
+        # Another writer holds the entry; dropping it is safe, the next build reloads from the database.
+        history.delete(_key(message.session_id))
+        return
+    try:
+        entry = history.get(_key(message.session_id))
+        if entry is None:
+            return
+        turn = _turn(message.pk, message.sender, message.content, message.attachment_type, message.created_at)
+        history.set(_key(message.session_id), _append(entry, [turn]), _ttl())
+    finally:
+        history.delete(lock)
+
+
+def forget_session(session_id: int) -> None:
+    _history().delete(_key(session_id))
+
+
+def _fit(turns: list[dict], budget: int) -> list[dict]:
+    kept = []
+    for turn in reversed(turns):
+        if turn["tokens"] > budget:
+            if not kept and budget > 16:
+                # Always keep the latest turn, trimmed to what is left of the budget.
+                kept.append(dict(turn, content=turn["content"][: (budget - 4) * 4] + "…", tokens=budget))
+            break
+        kept.append(turn)
+        budget -= turn["tokens"]
+    return kept[::-1]
+
+
+def build_context(message: Message) -> dict:
+    history = _history()
+    entry = history.get(_key(message.session_id))
+    if entry is None:
+        entry = _load(message.session_id, message.pk)
+        history.set(_key(message.session_id), entry, _ttl())
+    else:
+        missed = _catch_up(entry, message.session_id, message.pk)
+        if missed:
+            history.set(_key(message.session_id), _append(entry, missed), _ttl())
+
+    summary = _summary(entry["folded"])
+    budget = getattr(settings, "CONVERSATION_TOKEN_BUDGET", 2000) - estimate_tokens(summary)
+    eligible = [turn for turn in entry["turns"] if turn["id"] < message.pk]
+    turns = _fit(eligible, max(0, budget))
+    return {
+        "summary": summary,
+        "turns": [{key: value for key, value in turn.items() if key not in PRIVATE_FIELDS} for turn in turns],
+        "truncated": bool(summary) or len(turns) < len(eligible),
+    }
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import AsyncIterator
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "chatbox:session:"
+
+
+def _offer(queue: asyncio.Queue, message: str) -> None:
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+
+class InProcessBroker:
+    def __init__(self) -> None:
+        self._subscribers: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, message: str) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, message)
+            except RuntimeError:
+                pass
+
+    async def subscribe(self, channel: str, timeout: float) -> AsyncIterator[str | None]:
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=100))
+        with self._lock:
+            self._subscribers[channel].add(entry)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(entry[1].get(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(entry)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+
+
+class RedisBroker:
+    def __init__(self, url: str) -> None:
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured(
+                "CHAT_EVENTS_BACKEND='redis' nécessite le paquet redis (pip install redis)."
+            ) from exc
+        self._url = url
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self, channel: str, message: str) -> None:
+        self._client.publish(channel, message)
+
+    async def subscribe(self, channel: str, timeout: float) -> AsyncIterator[str | None]:
+        from redis import asyncio as aioredis
+
+        client = aioredis.Redis.from_url(self._url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(channel)
+        try:
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+                if message is None:
+                    yield None
+                else:
+                    data = message["data"]
+                    yield data.decode() if isinstance(data, bytes) else data
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.close()
+            await client.close()
+
+
+_broker: InProcessBroker | RedisBroker | None = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> InProcessBroker | RedisBroker:
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                backend = getattr(settings, "CHAT_EVENTS_BACKEND", "memory")
+                if backend == "redis":
+                    _broker = RedisBroker(getattr(settings, "REDIS_URL", ""))
+                elif backend == "memory":
+                    _broker = InProcessBroker()
+                else:
+                    raise ImproperlyConfigured(f"CHAT_EVENTS_BACKEND inconnu : {backend}")
+    return _broker
+
+
+def session_channel(session_id: int) -> str:
+    return f"{CHANNEL_PREFIX}{session_id}"
+
+
+def publish(session_id: int, event: str, data: dict) -> None:
+    message = json.dumps({"event": event, "data": data})
+    try:
+        get_broker().publish(session_channel(session_id), message)
+    except Exception:
+        logger.exception("Failed to publish session event", extra={"session_id": session_id, "event": event})
+
+
+def subscribe(session_id: int) -> AsyncIterator[str | None]:
+    timeout = getattr(settings, "CHAT_EVENTS_KEEPALIVE", 15)
+    return get_broker().subscribe(session_channel(session_id), timeout)
+
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
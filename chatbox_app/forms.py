@@ -1,5 +1,8 @@
 from django import forms
 
+from .sniffing import sniff_file
+from .uploads import UploadError, check_size
+
 
 class MessageForm(forms.Form):
     content = forms.CharField(
@@ -23,6 +26,18 @@ class MessageForm(forms.Form):
         ),
     )
 
+    def clean_attachment(self):
+        attachment = self.cleaned_data.get("attachment")
+        if not attachment:
+            return attachment
+        mime_type = sniff_file(attachment)
+        try:
+            check_size(mime_type, attachment.size)
+        except UploadError as exc:
+            raise forms.ValidationError(str(exc)) from exc
+        attachment.content_type = mime_type
+        return attachment
+
 
 class VideoGenerationForm(forms.Form):
     prompt = forms.CharField(
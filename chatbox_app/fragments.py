@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import ChatSession
+from .shared_cache import is_shared
+
+
+SIDEBAR_VERSION_KEY = "chatbox:fragments:sidebar-version"
+SIDEBAR_SIZE = 10
+
+
+def fragment_timeout() -> int:
+    return getattr(settings, "CHAT_FRAGMENT_CACHE_TIMEOUT", 3600)
+
+
+def sidebar_version() -> int:
+    version = cache.get(SIDEBAR_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.add(SIDEBAR_VERSION_KEY, version, None)
+    return version
+
+
+def bump_sidebar() -> None:
+    # Time-based versions never reuse a value after the key is evicted.
+    cache.set(SIDEBAR_VERSION_KEY, time.time_ns(), None)
+
+
+def sidebar():
+    sessions = ChatSession.objects.order_by("-created_at")[:SIDEBAR_SIZE]
+    if is_shared():
+        return sessions, sidebar_version()
+    # A per-process version key would miss bumps made by other workers, so hash the rows the fragment renders.
+    sessions = list(sessions)
+    rows = [(session.pk, session.name, session.created_at.isoformat()) for session in sessions]
+    return sessions, hashlib.sha1(repr(rows).encode()).hexdigest()[:16]
+
+
+def touch_session(session_id: int, **changes) -> None:
+    ChatSession.objects.filter(pk=session_id).update(last_activity_at=timezone.now(), **changes)
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import threading
+import weakref
+
+from django.conf import settings
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+logger = logging.getLogger(__name__)
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+_async_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = weakref.WeakKeyDictionary()
+
+
+class JitteredRetry(Retry):
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        if backoff <= 0:
+            return 0
+        return random.uniform(0, backoff)
+
+
+def _build_session() -> requests.Session:
+    retries = JitteredRetry(
+        total=getattr(settings, "AI_HTTP_MAX_RETRIES", 3),
+        connect=getattr(settings, "AI_HTTP_MAX_RETRIES", 3),
+        read=getattr(settings, "AI_HTTP_MAX_RETRIES", 3),
+        status=getattr(settings, "AI_HTTP_MAX_RETRIES", 3),
+        backoff_factor=getattr(settings, "AI_HTTP_BACKOFF_FACTOR", 0.5),
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=getattr(settings, "AI_HTTP_POOL_CONNECTIONS", 4),
+        pool_maxsize=getattr(settings, "AI_HTTP_POOL_MAXSIZE", 16),
+        pool_block=getattr(settings, "AI_HTTP_POOL_BLOCK", False),
+        max_retries=retries,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def default_timeout() -> tuple[float, float]:
+    return (
+        getattr(settings, "AI_HTTP_CONNECT_TIMEOUT", 5.0),
+        getattr(settings, "AI_HTTP_READ_TIMEOUT", 30.0),
+    )
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    kwargs.setdefault("timeout", default_timeout())
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def _build_async_client() -> httpx.AsyncClient:
+    connect_timeout, read_timeout = default_timeout()
+    limits = httpx.Limits(
+        max_connections=getattr(settings, "AI_HTTP_ASYNC_MAX_CONNECTIONS", 1000),
+        max_keepalive_connections=getattr(settings, "AI_HTTP_POOL_MAXSIZE", 16),
+    )
+    transport = httpx.AsyncHTTPTransport(retries=getattr(settings, "AI_HTTP_MAX_RETRIES", 3), limits=limits)
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        headers={"Connection": "keep-alive"},
+    )
+
+
+def get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = _build_async_client()
+        _async_clients[loop] = client
+    return client
+
+
+async def arequest(method: str, url: str, **kwargs) -> httpx.Response:
+    return await get_async_client().request(method, url, **kwargs)
+
+
+async def aget(url: str, **kwargs) -> httpx.Response:
+    return await arequest("GET", url, **kwargs)
+
+
+async def apost(url: str, **kwargs) -> httpx.Response:
+    return await arequest("POST", url, **kwargs)
+
+
+def astream(method: str, url: str, **kwargs):
+    return get_async_client().stream(method, url, **kwargs)
+
+
+async def aclose() -> None:
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def pool_stats() -> dict[str, dict[str, int]]:
+    if _session is None:
+        return {}
+    stats = {}
+    seen = set()
+    for adapter in _session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_sent = pool.num_requests
+            connections = pool.num_connections
+            stats[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                "requests": requests_sent,
+                "connections": connections,
+                "reused": max(0, requests_sent - connections),
+            }
+    return stats
+
+
+def log_pool_stats() -> None:
+    for host, counts in pool_stats().items():
+        logger.info("HTTP connection pool stats", extra={"host": host, **counts})
+
+
+def reset() -> None:
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbox_app.archive import archive_inactive, rehydrate
+from chatbox_app.models import ChatSession
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive les sessions inactives dans des segments JSONL compressés (zstd ou gzip), pièces jointes "
+        "comprises, et les retire des tables actives. Une session archivée est restaurée à sa prochaine ouverture."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--inactive-for",
+            type=int,
+            default=getattr(settings, "ARCHIVE_INACTIVE_AFTER", 90 * 24 * 3600),
+            help="Durée d'inactivité en secondes au-delà de laquelle une session est archivée.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=getattr(settings, "ARCHIVE_BATCH_SIZE", 200),
+            help="Sessions écrites par segment.",
+        )
+        parser.add_argument("--limit", type=int, default=None, help="Nombre maximal de sessions archivées.")
+        parser.add_argument(
+            "--restore", type=int, nargs="+", metavar="SESSION_ID", help="Restaure ces sessions au lieu d'archiver."
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Affiche les actions sans rien modifier.")
+
+    def handle(self, *args, **options):
+        if options["restore"]:
+            self._restore(options["restore"])
+            return
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size doit être positif.")
+
+        stats = archive_inactive(
+            options["inactive_for"],
+            batch_size=options["batch_size"],
+            limit=options["limit"],
+            dry_run=options["dry_run"],
+        )
+        prefix = "[simulation] " if options["dry_run"] else ""
+        ratio = f", taux de compression {stats.raw_bytes / stats.stored_bytes:.1f}x" if stats.stored_bytes else ""
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}{stats.sessions} session(s) archivée(s) ({stats.messages} message(s), "
+                f"{stats.videos} vidéo(s), {stats.attachments} pièce(s) jointe(s)) en {stats.segments} segment(s), "
+                f"{stats.stored_bytes / (1024 * 1024):.1f} Mo écrits{ratio}."
+            )
+        )
+        if stats.skipped:
+            self.stdout.write(f"{stats.skipped} session(s) ignorée(s) : activité récente ou traitement en cours.")
+
+    def _restore(self, session_ids: list[int]) -> None:
+        restored = 0
+        for session in ChatSession.objects.filter(pk__in=session_ids, archived_at__isnull=False):
+            restored += rehydrate(session)
+        self.stdout.write(self.style.SUCCESS(f"{restored} session(s) restaurée(s)."))
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from chatbox_app.models import ChatSession, GeneratedVideo, Message
+
+
+BATCH_SIZE = 5000
+
+
+def _access_paths(session_id: int) -> list[tuple[str, object]]:
+    return [
+        (
+            "Messages d'une session par date",
+            Message.objects.filter(session_id=session_id).order_by("created_at", "id")[:50],
+        ),
+        (
+            "Vidéos d'une session par date décroissante",
+            GeneratedVideo.objects.filter(session_id=session_id).order_by("-created_at")[:50],
+        ),
+        (
+            "Vidéos en attente par ancienneté",
+            GeneratedVideo.objects.filter(status=GeneratedVideo.STATUS_PENDING).order_by("updated_at")[:500],
+        ),
+        (
+            "Sessions récentes",
+            ChatSession.objects.order_by("-created_at")[:10],
+        ),
+        (
+            "Sessions par activité récente",
+            ChatSession.objects.order_by("-last_activity_at", "-id")[:20],
+        ),
+    ]
+
+
+def _indexed_models():
+    return [ChatSession, Message, GeneratedVideo]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure les requêtes critiques (EXPLAIN et durées) avec et sans les index composites. "
+        "À lancer sur une base de test : l'option --seed insère des millions de lignes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default", help="Alias de la base à utiliser.")
+        parser.add_argument("--seed", action="store_true", help="Insère des données de test avant la mesure.")
+        parser.add_argument("--sessions", type=int, default=10_000)
+        parser.add_argument("--messages", type=int, default=2_000_000)
+        parser.add_argument("--videos", type=int, default=500_000)
+        parser.add_argument("--runs", type=int, default=20, help="Nombre d'exécutions par requête.")
+        parser.add_argument(
+            "--skip-baseline",
+            action="store_true",
+            help="Ne supprime pas temporairement les index pour la mesure de référence.",
+        )
+
+    def handle(self, *args, **options):
+        alias = options["database"]
+        connection = connections[alias]
+        if connection.vendor not in {"sqlite", "postgresql"}:
+            raise CommandError(f"Base non prise en charge : {connection.vendor}")
+
+        if options["seed"]:
+            self._seed(alias, options["sessions"], options["messages"], options["videos"])
+
+        session_id = (
+            Message.objects.using(alias).order_by("-id").values_list("session_id", flat=True).first()
+        )
+        if session_id is None:
+            raise CommandError("Aucune donnée à mesurer. Utilisez --seed.")
+
+        self._analyze(connection)
+        if not options["skip_baseline"]:
+            self._drop_indexes(connection)
+            try:
+                self._analyze(connection)
+                self._measure("Sans index composites", alias, session_id, options["runs"])
+            finally:
+                self._create_indexes(connection)
+                self._analyze(connection)
+        self._measure("Avec index composites", alias, session_id, options["runs"])
+
+    def _seed(self, alias: str, sessions: int, messages: int, videos: int) -> None:
+        self.stdout.write(f"Insertion de {sessions} sessions, {messages} messages, {videos} vidéos...")
+        started = time.perf_counter()
+        for start in range(0, sessions, BATCH_SIZE):
+            count = min(BATCH_SIZE, sessions - start)
+            ChatSession.objects.using(alias).bulk_create(
+                [ChatSession(name=f"Session {start + i}") for i in range(count)]
+            )
+        session_ids = list(ChatSession.objects.using(alias).values_list("id", flat=True))
+        for start in range(0, messages, BATCH_SIZE):
+            count = min(BATCH_SIZE, messages - start)
+            Message.objects.using(alias).bulk_create(
+                [
+                    Message(session_id=random.choice(session_ids), content=f"Message {start + i}")
+                    for i in range(count)
+                ]
+            )
+        statuses = [choice for choice, _ in GeneratedVideo.STATUS_CHOICES]
+        for start in range(0, videos, BATCH_SIZE):
+            count = min(BATCH_SIZE, videos - start)
+            GeneratedVideo.objects.using(alias).bulk_create(
+                [
+                    GeneratedVideo(
+                        session_id=random.choice(session_ids),
+                        prompt=f"Prompt {start + i}",
+                        status=random.choice(statuses),
+                    )
+                    for i in range(count)
+                ]
+            )
+        self.stdout.write(f"Données insérées en {time.perf_counter() - started:.1f} s.")
+
+    def _analyze(self, connection) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def _drop_indexes(self, connection) -> None:
+        with connection.schema_editor() as editor:
+            for model in _indexed_models():
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+
+    def _create_indexes(self, connection) -> None:
+        with connection.schema_editor() as editor:
+            for model in _indexed_models():
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
+
+    def _measure(self, title: str, alias: str, session_id: int, runs: int) -> None:
+        vendor = connections[alias].vendor
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {title} ({vendor}) =="))
+        for label, queryset in _access_paths(session_id):
+            queryset = queryset.using(alias)
+            explain_options = {"analyze": True} if vendor == "postgresql" else {}
+            plan = queryset.explain(**explain_options)
+            timings = []
+            for _ in range(max(1, runs)):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(self.style.SQL_FIELD(label))
+            self.stdout.write(plan)
+            self.stdout.write(
+                f"  médiane {statistics.median(timings):.2f} ms, "
+                f"min {min(timings):.2f} ms, max {max(timings):.2f} ms ({len(timings)} exécutions)\n"
+            )
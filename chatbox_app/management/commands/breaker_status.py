@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbox_app.breaker import BREAKERS, CLOSED, CircuitBreaker
+
+
+class Command(BaseCommand):
+    help = "Affiche l'état des disjoncteurs des webhooks IA et leurs dernières transitions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", choices=BREAKERS, help="Referme le disjoncteur indiqué.")
+        parser.add_argument("--history", type=int, default=5, help="Nombre de transitions affichées (défaut : 5).")
+
+    def handle(self, *args, **options):
+        if options["history"] < 0:
+            raise CommandError("--history doit être positif.")
+        if options["reset"]:
+            CircuitBreaker(options["reset"]).reset()
+            self.stdout.write(self.style.SUCCESS(f"Disjoncteur {options['reset']} refermé."))
+
+        for name in BREAKERS:
+            snapshot = CircuitBreaker(name).snapshot()
+            style = self.style.SUCCESS if snapshot["state"] == CLOSED else self.style.WARNING
+            line = f"{name} : {snapshot['state']} ({snapshot['failures']}/{snapshot['threshold']} échecs)"
+            if snapshot["retry_after"]:
+                line += f", nouvel essai dans {snapshot['retry_after']:.0f} s"
+            self.stdout.write(style(line))
+            for transition in snapshot["transitions"][-options["history"] :] if options["history"] else []:
+                at = datetime.fromtimestamp(transition["at"]).strftime("%Y-%m-%d %H:%M:%S")
+                self.stdout.write(f"  {at} {transition['from']} → {transition['to']} : {transition['reason']}")
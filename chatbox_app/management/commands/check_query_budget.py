@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from chatbox_app import fragments
+from chatbox_app.models import ChatSession, GeneratedVideo, Message
+
+
+QUERY_BUDGETS = {
+    "chat_session (cache froid)": 4,
+    # Without a shared cache the sidebar version is hashed from its rows: one query more than with Redis.
+    "chat_session (cache chaud)": 2,
+    "session_messages": 2,
+    "dashboard": 2,
+    "dashboard (page suivante)": 1,
+    "video_status_batch": 1,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Vérifie que le rendu des pages principales respecte un budget fixe de requêtes SQL, "
+        "quel que soit le volume de la session. Les données de test sont annulées à la fin et les pages sont "
+        "rendues avec des caches privés, vidés ensuite, pour ne rien laisser dans les caches partagés."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=120, help="Messages insérés dans la session de test.")
+        parser.add_argument("--videos", type=int, default=30, help="Vidéos insérées dans la session de test.")
+        parser.add_argument("--sessions", type=int, default=15, help="Autres sessions insérées pour la barre latérale.")
+        parser.add_argument("--show-sql", action="store_true", help="Affiche les requêtes des pages hors budget.")
+
+    def handle(self, *args, **options):
+        failures = []
+        private = {
+            alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"query-budget-{alias}"}
+            for alias in settings.CACHES
+        }
+        with override_settings(ALLOWED_HOSTS=["testserver"], CACHES=private), transaction.atomic():
+            try:
+                self._check(options, failures)
+            finally:
+                for alias in private:
+                    caches[alias].clear()
+                transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"Budget de requêtes dépassé : {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("Tous les budgets de requêtes sont respectés."))
+
+    def _check(self, options, failures: list[str]) -> None:
+        session = self._seed(options["sessions"], options["messages"], options["videos"])
+        for label, path in self._pages(session):
+            with CaptureQueriesContext(connection) as captured:
+                response = Client().get(path)
+            if response.status_code != 200:
+                raise CommandError(f"{label} : réponse HTTP {response.status_code} pour {path}")
+            budget = QUERY_BUDGETS[label]
+            used = len(captured)
+            if used > budget:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f"{label} : {used} requête(s) pour un budget de {budget}"))
+                if options["show_sql"]:
+                    for query in captured.captured_queries:
+                        self.stdout.write(f"  {query['sql']}")
+            else:
+                self.stdout.write(f"{label} : {used}/{budget} requête(s)")
+
+    def _seed(self, sessions: int, messages: int, videos: int) -> ChatSession:
+        ChatSession.objects.bulk_create([ChatSession(name=f"Budget {i}") for i in range(sessions)])
+        session = ChatSession.objects.create(name="Budget de requêtes")
+        Message.objects.bulk_create(
+            [Message(session=session, content=f"Message {i}") for i in range(messages)]
+        )
+        GeneratedVideo.objects.bulk_create(
+            [GeneratedVideo(session=session, prompt=f"Prompt {i}") for i in range(videos)]
+        )
+        # bulk_create bypasses the signals that keep the counters and fragment versions current.
+        fragments.touch_session(session.pk, message_count=messages, video_count=videos)
+        session.refresh_from_db()
+        return session
+
+    def _pages(self, session: ChatSession) -> list[tuple[str, str]]:
+        page_url = reverse("chatbox_app:chat_session", args=[session.pk])
+        newest = session.messages.order_by("-id").values_list("pk", flat=True).first() or 0
+        video_ids = ",".join(str(pk) for pk in session.generated_videos.values_list("pk", flat=True)[:20])
+        return [
+            ("chat_session (cache froid)", page_url),
+            ("chat_session (cache chaud)", page_url),
+            ("session_messages", f"{reverse('chatbox_app:session_messages', args=[session.pk])}?before={newest}"),
+            ("dashboard", reverse("chatbox_app:dashboard")),
+            ("dashboard (page suivante)", f"{reverse('chatbox_app:dashboard')}?after={session.pk}"),
+            ("video_status_batch", f"{reverse('chatbox_app:video_status_batch')}?ids={video_ids}"),
+        ]
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from asgiref.sync import sync_to_async
+
+from chatbox_app import http_client, metrics
+from chatbox_app.outbox import MessageBatcher, aprocess_batch, claim_deliveries, process_batch
+
+
+logger = logging.getLogger(__name__)
+
+
+def _process_in_thread(deliveries) -> list[bool]:
+    try:
+        return process_batch(deliveries)
+    except Exception:
+        logger.exception(
+            "Unexpected error while processing delivery", extra={"delivery_ids": [d.pk for d in deliveries]}
+        )
+        return [False] * len(deliveries)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Envoie les messages et vidéos en attente vers les webhooks IA."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=getattr(settings, "WEBHOOK_WORKER_CONCURRENCY", 8),
+            help="Nombre maximal d'appels webhook simultanés.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Nombre de livraisons réservées par itération (défaut : 2 x concurrence).",
+        )
+        parser.add_argument(
+            "--message-batch-size",
+            type=int,
+            default=getattr(settings, "AI_MESSAGE_BATCH_SIZE", 1),
+            help="Messages regroupés dans un même appel webhook (1 : un appel par message).",
+        )
+        parser.add_argument(
+            "--message-batch-window",
+            type=float,
+            default=getattr(settings, "AI_MESSAGE_BATCH_WINDOW_MS", 50),
+            help="Attente maximale en millisecondes avant d'envoyer un lot incomplet.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=getattr(settings, "WEBHOOK_WORKER_POLL_INTERVAL", 1.0),
+            help="Attente en secondes lorsque la file est vide.",
+        )
+        parser.add_argument(
+            "--stats-interval",
+            type=float,
+            default=60.0,
+            help="Intervalle en secondes entre deux journalisations des statistiques du pool HTTP.",
+        )
+        parser.add_argument(
+            "--async",
+            action="store_true",
+            dest="use_async",
+            help="Utilise une boucle asyncio et un client HTTP asynchrone (adapté à des milliers d'appels simultanés).",
+        )
+        parser.add_argument(
+            "--metrics-port",
+            type=int,
+            default=getattr(settings, "METRICS_WORKER_PORT", 0),
+            help="Port d'exposition des métriques du worker sur /metrics (0 : désactivé).",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Vide la file puis s'arrête.",
+        )
+
+    def handle(self, *args, **options):
+        exporter = None
+        if options["metrics_port"] and metrics.enabled():
+            exporter = metrics.serve(options["metrics_port"], getattr(settings, "METRICS_WORKER_ADDR", "127.0.0.1"))
+            host, port = exporter.server_address[:2]
+            self.stdout.write(f"Métriques du worker exposées sur http://{host}:{port}/metrics.")
+        try:
+            if options["use_async"]:
+                delivered, failed = asyncio.run(self._run_async(options))
+            else:
+                delivered, failed = self._run_threaded(options)
+        finally:
+            if exporter is not None:
+                exporter.shutdown()
+                exporter.server_close()
+
+        for host, counts in http_client.pool_stats().items():
+            self.stdout.write(
+                f"{host} : {counts['requests']} requête(s), {counts['connections']} connexion(s), "
+                f"{counts['reused']} réutilisation(s)"
+            )
+        self.stdout.write(self.style.SUCCESS(f"{delivered} livraison(s) réussie(s), {failed} en échec."))
+
+    @staticmethod
+    def _batch_label(batcher: MessageBatcher) -> str:
+        if not batcher.enabled:
+            return ""
+        return f", lots de {batcher.size} messages / {batcher.window * 1000:.0f} ms"
+
+    @staticmethod
+    def _groups(batcher: MessageBatcher, deliveries: list, once: bool) -> list[list]:
+        groups = [[delivery] for delivery in batcher.add(deliveries)]
+        # In --once mode an empty claim means the queue is drained, so send the partial batch now.
+        return groups + batcher.ready(flush=once and not deliveries)
+
+    def _run_threaded(self, options) -> tuple[int, int]:
+        concurrency = max(1, options["concurrency"])
+        batcher = MessageBatcher(options["message_batch_size"], options["message_batch_window"])
+        batch_size = options["batch_size"] or concurrency * 2 * (batcher.size if batcher.enabled else 1)
+        poll_interval = options["poll_interval"]
+        delivered = failed = 0
+        # Each future maps to the number of deliveries it carries (more than one for a message batch).
+        in_flight: dict = {}
+        stats_interval = options["stats_interval"]
+        next_stats_at = time.monotonic() + stats_interval
+
+        self.stdout.write(f"Worker webhook démarré (concurrence={concurrency}{self._batch_label(batcher)}).")
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="webhook") as pool:
+            try:
+                while True:
+                    if time.monotonic() >= next_stats_at:
+                        http_client.log_pool_stats()
+                        next_stats_at = time.monotonic() + stats_interval
+                    free_slots = batch_size - sum(in_flight.values()) - len(batcher)
+                    deliveries = claim_deliveries(free_slots) if free_slots > 0 else []
+                    for group in self._groups(batcher, deliveries, options["once"]):
+                        in_flight[pool.submit(_process_in_thread, group)] = len(group)
+                    if not in_flight:
+                        if options["once"] and not len(batcher):
+                            break
+                        time.sleep(batcher.wait_time(poll_interval))
+                        continue
+                    done, _ = wait(in_flight, timeout=batcher.wait_time(poll_interval), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        del in_flight[future]
+                        outcomes = future.result()
+                        delivered += sum(outcomes)
+                        failed += len(outcomes) - sum(outcomes)
+            except KeyboardInterrupt:
+                self.stdout.write("Arrêt demandé.")
+        return delivered, failed
+
+    async def _run_async(self, options) -> tuple[int, int]:
+        concurrency = max(1, options["concurrency"])
+        batcher = MessageBatcher(options["message_batch_size"], options["message_batch_window"])
+        per_task = batcher.size if batcher.enabled else 1
+        batch_size = options["batch_size"] or concurrency * 2 * per_task
+        poll_interval = options["poll_interval"]
+        delivered = failed = 0
+        in_flight: set[asyncio.Task] = set()
+        claim = sync_to_async(claim_deliveries)
+
+        async def run(deliveries) -> list[bool]:
+            try:
+                return await aprocess_batch(deliveries)
+            except Exception:
+                logger.exception(
+                    "Unexpected error while processing delivery", extra={"delivery_ids": [d.pk for d in deliveries]}
+                )
+                return [False] * len(deliveries)
+
+        self.stdout.write(
+            f"Worker webhook asynchrone démarré (concurrence={concurrency}{self._batch_label(batcher)})."
+        )
+        try:
+            while True:
+                free_slots = min(batch_size, (concurrency - len(in_flight)) * per_task) - len(batcher)
+                deliveries = await claim(free_slots) if free_slots > 0 else []
+                in_flight.update(
+                    asyncio.create_task(run(group)) for group in self._groups(batcher, deliveries, options["once"])
+                )
+                if not in_flight:
+                    if options["once"] and not len(batcher):
+                        break
+                    await asyncio.sleep(batcher.wait_time(poll_interval))
+                    continue
+                done, in_flight = await asyncio.wait(
+                    in_flight, timeout=batcher.wait_time(poll_interval), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    outcomes = task.result()
+                    delivered += sum(outcomes)
+                    failed += len(outcomes) - sum(outcomes)
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            self.stdout.write("Arrêt demandé.")
+        finally:
+            await http_client.aclose()
+        return delivered, failed
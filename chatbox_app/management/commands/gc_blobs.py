@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from chatbox_app import uploads
+from chatbox_app.fragments import touch_session
+from chatbox_app.models import AttachmentBlob, Message
+from chatbox_app.storage import BLOB_PREFIX
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompte les références des pièces jointes dédupliquées et supprime les blobs orphelins "
+        "(par exemple après la suppression d'une session) ainsi que les téléversements abandonnés."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace",
+            type=int,
+            default=getattr(settings, "BLOB_GC_GRACE", 3600),
+            help="Âge minimal en secondes d'un blob sans référence avant suppression.",
+        )
+        parser.add_argument(
+            "--backfill",
+            action="store_true",
+            help="Migre d'abord vers les blobs les pièces jointes enregistrées avant la déduplication.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Affiche les actions sans rien modifier.")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        if options["backfill"]:
+            migrated = self._backfill(dry_run)
+            self.stdout.write(f"{migrated} pièce(s) jointe(s) migrée(s) vers le stockage dédupliqué.")
+
+        reaped = uploads.reap_expired(dry_run)
+        fixed = self._recount(dry_run)
+        deleted, freed = self._collect(timedelta(seconds=options["grace"]), dry_run)
+        prefix = "[simulation] " if dry_run else ""
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}{reaped} téléversement(s) expiré(s) supprimé(s), {fixed} compteur(s) corrigé(s), "
+                f"{deleted} blob(s) supprimé(s), {freed / (1024 * 1024):.1f} Mo libérés."
+            )
+        )
+
+    def _backfill(self, dry_run: bool) -> int:
+        pending = (
+            Message.objects.filter(blob__isnull=True)
+            .exclude(attachment="")
+            .exclude(attachment__isnull=True)
+            .exclude(attachment__startswith=f"{BLOB_PREFIX}/")
+        )
+        migrated = 0
+        for message in list(pending):
+            old_name = message.attachment.name
+            if not default_storage.exists(old_name):
+                self.stderr.write(f"Fichier introuvable pour le message {message.pk} : {old_name}")
+                continue
+            migrated += 1
+            if dry_run:
+                continue
+            with message.attachment.open("rb"):
+                blob = AttachmentBlob.objects.store(message.attachment.file)
+            with transaction.atomic():
+                Message.objects.filter(pk=message.pk).update(
+                    blob=blob,
+                    attachment=blob.file.name,
+                    attachment_type=message.attachment_type or blob.content_type,
+                    attachment_name=message.attachment_name or os.path.basename(old_name)[:255],
+                )
+                AttachmentBlob.objects.filter(pk=blob.pk).update(
+                    ref_count=F("ref_count") + 1, updated_at=timezone.now()
+                )
+                touch_session(message.session_id)
+            if not Message.objects.filter(attachment=old_name).exists():
+                default_storage.delete(old_name)
+        return migrated
+
+    def _recount(self, dry_run: bool) -> int:
+        drifted = (
+            AttachmentBlob.objects.annotate(refs=Count("messages"))
+            .exclude(ref_count=F("refs"))
+            .values_list("pk", "refs")
+        )
+        fixed = 0
+        for pk, refs in list(drifted):
+            fixed += 1
+            if not dry_run:
+                AttachmentBlob.objects.filter(pk=pk).update(ref_count=refs)
+        return fixed
+
+    def _collect(self, grace: timedelta, dry_run: bool) -> tuple[int, int]:
+        cutoff = timezone.now() - grace
+        orphaned = AttachmentBlob.objects.filter(ref_count=0, updated_at__lt=cutoff)
+        deleted = freed = 0
+        for pk in list(orphaned.values_list("pk", flat=True)):
+            with transaction.atomic():
+                blob = orphaned.select_for_update().filter(pk=pk).first()
+                if blob is None or Message.objects.filter(blob_id=pk).exists():
+                    continue
+                deleted += 1
+                freed += blob.size
+                if dry_run:
+                    continue
+                names = [field.name for field in (blob.file, blob.preview) if field]
+                storage = blob.file.storage
+                blob.delete()
+                for name in names:
+                    transaction.on_commit(lambda name=name: storage.delete(name))
+            logger.info("Orphaned attachment blob deleted", extra={"sha256": blob.sha256, "size": blob.size})
+        return deleted, freed
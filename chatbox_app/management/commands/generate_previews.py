@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chatbox_app.models import AttachmentBlob
+from chatbox_app.previews import claim_blobs, mark_preview, preview_options, save_preview
+from chatbox_app.thumbnails import PreviewOptions, PreviewUnavailable, render_preview
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère en arrière-plan les miniatures WebP des images et les affiches des vidéos jointes, "
+        "dans un pool de processus."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "PREVIEW_WORKERS", None) or os.cpu_count() or 1,
+            help="Nombre de processus de rendu.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Nombre de pièces jointes réservées par itération (défaut : 4 x processus).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5.0,
+            help="Attente en secondes lorsqu'il n'y a rien à traiter.",
+        )
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Remet en file les pièces jointes en échec ou ignorées (par exemple après l'installation de ffmpeg).",
+        )
+        parser.add_argument("--once", action="store_true", help="Traite la file puis s'arrête.")
+
+    def handle(self, *args, **options):
+        workers = max(1, options["workers"])
+        batch_size = options["batch_size"] or workers * 4
+        render_options = preview_options()
+        if options["retry_failed"]:
+            requeued = AttachmentBlob.objects.filter(
+                preview_status__in=[AttachmentBlob.PREVIEW_FAILED, AttachmentBlob.PREVIEW_SKIPPED]
+            ).update(preview_status=AttachmentBlob.PREVIEW_PENDING)
+            self.stdout.write(f"{requeued} pièce(s) jointe(s) remise(s) en file.")
+
+        counts = dict.fromkeys(
+            [AttachmentBlob.PREVIEW_READY, AttachmentBlob.PREVIEW_FAILED, AttachmentBlob.PREVIEW_SKIPPED], 0
+        )
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    blobs = claim_blobs(batch_size)
+                    if not blobs:
+                        if options["once"]:
+                            break
+                        time.sleep(options["poll_interval"])
+                        continue
+                    futures = {
+                        pool.submit(render_preview, blob.file.path, blob.content_type, render_options): blob
+                        for blob in blobs
+                    }
+                    for future in as_completed(futures):
+                        status = self._finish(futures[future], future, render_options)
+                        counts[status] += 1
+            except KeyboardInterrupt:
+                self.stdout.write("Arrêt demandé.")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{counts[AttachmentBlob.PREVIEW_READY]} aperçu(s) généré(s), "
+                f"{counts[AttachmentBlob.PREVIEW_SKIPPED]} ignoré(s), "
+                f"{counts[AttachmentBlob.PREVIEW_FAILED]} échec(s)."
+            )
+        )
+
+    def _finish(self, blob: AttachmentBlob, future, render_options: PreviewOptions) -> str:
+        try:
+            data, width, height = future.result()
+        except PreviewUnavailable as exc:
+            logger.warning("Attachment preview skipped", extra={"sha256": blob.sha256, "reason": str(exc)})
+            mark_preview(blob, AttachmentBlob.PREVIEW_SKIPPED)
+            return AttachmentBlob.PREVIEW_SKIPPED
+        except Exception:
+            logger.exception("Attachment preview failed", extra={"sha256": blob.sha256})
+            mark_preview(blob, AttachmentBlob.PREVIEW_FAILED)
+            return AttachmentBlob.PREVIEW_FAILED
+        save_preview(blob, data, width, height, render_options.max_size)
+        return AttachmentBlob.PREVIEW_READY
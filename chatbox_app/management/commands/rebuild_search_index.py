@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from chatbox_app import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruit l'index plein texte des messages et des prompts vidéo (FTS5 sur SQLite), "
+        "par exemple après un import en masse. Sur PostgreSQL, l'index est maintenu par la base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000, help="Nombre de lignes indexées par lot.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            self.stdout.write(f"Rien à faire : l'index plein texte est maintenu par {connection.vendor}.")
+            return
+        started = time.perf_counter()
+        with transaction.atomic():
+            indexed = search.rebuild(max(1, options["batch_size"]))
+        self.stdout.write(
+            self.style.SUCCESS(f"{indexed} élément(s) indexé(s) en {time.perf_counter() - started:.1f} s.")
+        )
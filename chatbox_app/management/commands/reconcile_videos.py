@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbox_app.reconcile import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Réconcilie les vidéos bloquées en attente ou en cours : interroge le service IA sur l'état des tâches "
+        "et marque en échec celles qui ont dépassé le délai."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=getattr(settings, "VIDEO_RECONCILE_STALE_AFTER", 600),
+            help="Ancienneté minimale en secondes de la dernière mise à jour avant de vérifier une vidéo.",
+        )
+        parser.add_argument(
+            "--deadline",
+            type=int,
+            default=getattr(settings, "VIDEO_RECONCILE_DEADLINE", 86400),
+            help="Âge en secondes au-delà duquel une vidéo non terminée est marquée en échec.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500, help="Vidéos lues par page.")
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=getattr(settings, "VIDEO_RECONCILE_CONCURRENCY", 8),
+            help="Requêtes de statut simultanées vers le service IA.",
+        )
+        parser.add_argument("--limit", type=int, default=None, help="Nombre maximal de vidéos examinées.")
+        parser.add_argument("--dry-run", action="store_true", help="Affiche les actions sans rien modifier.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--batch-size et --concurrency doivent être positifs.")
+        if options["deadline"] < options["stale_after"]:
+            raise CommandError("--deadline doit être supérieur ou égal à --stale-after.")
+
+        stats = reconcile(
+            stale_after=options["stale_after"],
+            deadline=options["deadline"],
+            batch_size=options["batch_size"],
+            concurrency=options["concurrency"],
+            limit=options["limit"],
+            dry_run=options["dry_run"],
+        )
+        outcomes = ", ".join(f"{name} : {count}" for name, count in sorted(stats.outcomes.items())) or "aucun"
+        prefix = "[simulation] " if options["dry_run"] else ""
+        self.stdout.write(
+            f"{stats.scanned} vidéo(s) examinée(s), {stats.looked_up} statut(s) consulté(s), "
+            f"{stats.lookup_errors} consultation(s) en échec."
+        )
+        summary = f"{prefix}{stats.changed} vidéo(s) mise(s) à jour ({outcomes}), {stats.unchanged} inchangée(s)."
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbox_app import video_cache
+from chatbox_app.shared_cache import is_atomic
+
+
+class Command(BaseCommand):
+    help = "Affiche les compteurs du cache de prompts vidéo (réutilisations, appels amont, regroupements)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Remet les compteurs à zéro après affichage.")
+
+    def handle(self, *args, **options):
+        if not is_atomic():
+            raise CommandError(
+                "Les compteurs sont conservés dans le cache de chaque processus : sans cache partagé (REDIS_URL), "
+                "cette commande ne voit pas ceux des workers. Consultez /metrics sur chaque processus."
+            )
+        stats = video_cache.stats()
+        total = sum(stats.values())
+        saved = stats["hit"] + stats["coalesced"]
+        self.stdout.write(
+            f"Réutilisations : {stats['hit']}, regroupements : {stats['coalesced']}, appels amont : {stats['miss']}"
+        )
+        if total:
+            self.stdout.write(self.style.SUCCESS(f"{saved / total:.1%} des demandes n'ont pas sollicité l'API vidéo."))
+        if options["reset"]:
+            video_cache.reset_stats()
+            self.stdout.write("Compteurs remis à zéro.")
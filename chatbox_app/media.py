@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import mimetypes
+import os
+import re
+import stat
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse, HttpResponseNotAllowed
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from .storage import BLOB_PREFIX
+from .uploads import PARTIAL_DIR
+
+
+IMMUTABLE_PREFIXES = (f"{BLOB_PREFIX}/", "previews/")
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class FileRange:
+    def __init__(self, handle, start: int, length: int):
+        handle.seek(start)
+        self._handle = handle
+        self._remaining = length
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b""
+        size = self._remaining if size is None or size < 0 else min(size, self._remaining)
+        data = self._handle.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self) -> int:
+        # Exposed so servers can sendfile() from the current offset for Content-Length bytes.
+        return self._handle.fileno()
+
+    def close(self) -> None:
+        self._handle.close()
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    match = RANGE_RE.match(header.replace(" ", ""))
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - suffix), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and end < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, min(end, size - 1)
+
+
+def _etag(path: str, stats: os.stat_result) -> str:
+    if path.startswith(IMMUTABLE_PREFIXES):
+        return f'"{PurePosixPath(path).stem}"'
+    return f'"{stats.st_size:x}-{stats.st_mtime_ns:x}"'
+
+
+def _range_allowed(request: HttpRequest, etag: str, mtime: int) -> bool:
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == mtime
+
+
+def _offload(response: HttpResponse, path: str, full_path: str) -> bool:
+    backend = getattr(settings, "MEDIA_SENDFILE_BACKEND", "")
+    if backend == "x-accel-redirect":
+        prefix = getattr(settings, "MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+        response["X-Accel-Redirect"] = f"{prefix.rstrip('/')}/{path}"
+        return True
+    if backend == "x-sendfile":
+        response["X-Sendfile"] = full_path
+        return True
+    return False
+
+
+def serve_media(request: HttpRequest, path: str) -> HttpResponse:
+    if request.method not in {"GET", "HEAD"}:
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+    path = PurePosixPath(path).as_posix().lstrip("/")
+    if path.startswith(f"{PARTIAL_DIR}/"):
+        raise Http404("Fichier introuvable")
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stats = os.stat(full_path)
+    except (ValueError, OSError):
+        raise Http404("Fichier introuvable")
+    if not stat.S_ISREG(stats.st_mode):
+        raise Http404("Fichier introuvable")
+
+    etag = _etag(path, stats)
+    mtime = int(stats.st_mtime)
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(mtime),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": (
+            "public, max-age=31536000, immutable"
+            if path.startswith(IMMUTABLE_PREFIXES)
+            else f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)}"
+        ),
+    }
+    response = HttpResponse(content_type=content_type, headers=headers)
+    conditional = get_conditional_response(request, etag=etag, last_modified=mtime, response=response)
+    if conditional is not response:
+        return conditional
+    if _offload(response, path, full_path):
+        # The front server answers Range requests itself from the redirected file.
+        return response
+
+    size = stats.st_size
+    byte_range = None
+    range_header = request.headers.get("Range")
+    if range_header and _range_allowed(request, etag, mtime):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416, headers=headers)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    handle = open(full_path, "rb")
+    if byte_range is None:
+        response = FileResponse(handle, content_type=content_type, headers=headers)
+        response["Content-Length"] = size
+        return response
+    start, end = byte_range
+    length = end - start + 1
+    response = FileResponse(
+        FileRange(handle, start, length), status=206, content_type=content_type, headers=headers
+    )
+    response["Content-Length"] = length
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return response
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import bisect
+import hmac
+import ipaddress
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+import httpx
+import requests
+
+
+logger = logging.getLogger(__name__)
+
+VIEW_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+QUERY_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PROXY_HEADERS = ("Forwarded", "X-Forwarded-For", "X-Real-IP")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        lines += [f"{self.name}{_labels(self.labels, key)} {value:g}" for key, value in values]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...], buckets: tuple[float, ...]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # Per label set: non-cumulative bucket counts (last slot is +Inf), sum, count.
+        self._series: dict[tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                le = bound if isinstance(bound, str) else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_labels((*self.labels, 'le'), (*key, le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {count}")
+        return lines
+
+
+VIEW_DURATION = Histogram(
+    "chatbox_view_duration_seconds",
+    "Time spent in the view until the response is returned.",
+    ("view", "method", "status"),
+    VIEW_BUCKETS,
+)
+VIEW_QUERIES = Histogram("chatbox_view_db_queries", "Database queries per request.", ("view",), QUERY_COUNT_BUCKETS)
+VIEW_QUERY_TIME = Histogram("chatbox_view_db_seconds", "Database time per request.", ("view",), QUERY_TIME_BUCKETS)
+UPSTREAM_DURATION = Histogram(
+    "chatbox_upstream_duration_seconds", "AI webhook call latency.", ("endpoint", "status"), UPSTREAM_BUCKETS
+)
+UPSTREAM_CALLS = Counter("chatbox_upstream_requests_total", "AI webhook calls by outcome.", ("endpoint", "status"))
+UPSTREAM_ERRORS = Counter("chatbox_upstream_errors_total", "AI webhook call errors by type.", ("endpoint", "error"))
+
+REGISTRY = [VIEW_DURATION, VIEW_QUERIES, VIEW_QUERY_TIME, UPSTREAM_DURATION, UPSTREAM_CALLS, UPSTREAM_ERRORS]
+
+
+def enabled() -> bool:
+    return getattr(settings, "METRICS_ENABLED", True)
+
+
+def _allowed_networks() -> list[ipaddress.IPv4Network | ipaddress.IPv6Network]:
+    try:
+        return [ipaddress.ip_network(value, strict=False) for value in getattr(settings, "METRICS_ALLOWED_IPS", [])]
+    except ValueError as exc:
+        raise ImproperlyConfigured(f"METRICS_ALLOWED_IPS invalide : {exc}") from exc
+
+
+def allowed(authorization: str, remote_addr: str, proxied: bool) -> bool:
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        return hmac.compare_digest(authorization, f"Bearer {token}")
+    # Without a token the peer address decides, and behind a proxy that address is the proxy's.
+    if proxied:
+        return False
+    try:
+        address = ipaddress.ip_address(remote_addr)
+    except ValueError:
+        return False
+    networks = _allowed_networks()
+    if networks:
+        return any(address in network for network in networks)
+    # Neither a token nor an allow-list: closed, except to a local development server.
+    return settings.DEBUG and address.is_loopback
+
+
+def sampled() -> bool:
+    rate = getattr(settings, "METRICS_LOG_SAMPLE_RATE", 0.01)
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar("chatbox_query_stats", default=None)
+
+
+def start_request() -> tuple[QueryStats, object]:
+    stats = QueryStats()
+    # sync_to_async copies the context, so queries run in worker threads land on the same object.
+    return stats, _query_stats.set(stats)
+
+
+def end_request(token) -> None:
+    _query_stats.reset(token)
+
+
+def _track_query(execute, sql, params, many, context):
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - started
+
+
+def install_query_tracker(connection) -> None:
+    if _track_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_track_query)
+
+
+def observe_request(view: str, method: str, status: int, seconds: float, stats: QueryStats) -> None:
+    VIEW_DURATION.observe(seconds, view, method, str(status))
+    VIEW_QUERIES.observe(stats.count, view)
+    VIEW_QUERY_TIME.observe(stats.seconds, view)
+
+
+def upstream_status(exc: BaseException | None) -> str:
+    if exc is None:
+        return "ok"
+    response = getattr(exc, "response", None)
+    if isinstance(exc, (requests.HTTPError, httpx.HTTPStatusError)) and response is not None:
+        return str(response.status_code)
+    return "error" if isinstance(exc, Exception) else "cancelled"
+
+
+def observe_upstream(endpoint: str, seconds: float, exc: BaseException | None) -> None:
+    status = upstream_status(exc)
+    UPSTREAM_DURATION.observe(seconds, endpoint, status)
+    UPSTREAM_CALLS.inc(endpoint, status)
+    if status == "error":
+        UPSTREAM_ERRORS.inc(endpoint, type(exc).__name__)
+
+
+def _gauges() -> list[str]:
+    from . import ratelimit, video_cache
+    from .breaker import BREAKERS, CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+    codes = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+    lines = [
+        "# HELP chatbox_breaker_state Circuit breaker state (0 closed, 1 half-open, 2 open).",
+        "# TYPE chatbox_breaker_state gauge",
+    ]
+    lines += [
+        f'chatbox_breaker_state{{endpoint="{name}"}} {codes[CircuitBreaker(name).state()["state"]]}'
+        for name in BREAKERS
+    ]
+    lines += [
+        "# HELP chatbox_upstream_inflight AI webhook calls in flight across workers.",
+        "# TYPE chatbox_upstream_inflight gauge",
+        f"chatbox_upstream_inflight {cache.get(ratelimit.INFLIGHT_KEY) or 0}",
+        "# HELP chatbox_video_prompt_lookups_total Video prompt cache lookups by outcome.",
+        "# TYPE chatbox_video_prompt_lookups_total counter",
+    ]
+    lines += [
+        f'chatbox_video_prompt_lookups_total{{outcome="{outcome}"}} {count}'
+        for outcome, count in video_cache.stats().items()
+    ]
+    return lines
+
+
+def render(gauges: bool = True) -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    if gauges:
+        lines += _gauges()
+    return "\n".join(lines) + "\n"
+
+
+class _ExporterHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] != "/metrics":
+            self._reply(404, "Introuvable.", "text/plain; charset=utf-8")
+        elif not allowed(
+            self.headers.get("Authorization", ""),
+            self.client_address[0],
+            any(header in self.headers for header in PROXY_HEADERS),
+        ):
+            self._reply(401, "Jeton invalide.", "text/plain; charset=utf-8")
+        else:
+            # Shared gauges (breakers, in-flight calls) are already exported by the web /metrics.
+            self._reply(200, render(gauges=False), CONTENT_TYPE)
+
+    def _reply(self, status: int, body: str, content_type: str) -> None:
+        payload = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def serve(port: int, addr: str = "127.0.0.1") -> ThreadingHTTPServer:
+    # Worker processes serve no HTTP, so their upstream metrics get their own scrape endpoint.
+    server = ThreadingHTTPServer((addr, port), _ExporterHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+    logger.info("Metrics exporter listening", extra={"addr": addr, "port": server.server_address[1]})
+    return server
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import logging
+import time
+
+from django.utils.decorators import sync_and_async_middleware
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+def _view_name(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else "unmatched"
+
+
+def _record(request, response, started: float, stats: metrics.QueryStats) -> None:
+    elapsed = time.perf_counter() - started
+    view = _view_name(request)
+    metrics.observe_request(view, request.method, response.status_code, elapsed, stats)
+    if metrics.sampled():
+        logger.info(
+            "Request handled",
+            extra={
+                "view": view,
+                "method": request.method,
+                "status": response.status_code,
+                "duration_ms": round(elapsed * 1000, 2),
+                "db_queries": stats.count,
+                "db_ms": round(stats.seconds * 1000, 2),
+                "streaming": response.streaming,
+            },
+        )
+
+
+@sync_and_async_middleware
+def MetricsMiddleware(get_response):
+    # Streaming responses are timed until their headers are ready, not until the body is consumed.
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            if not metrics.enabled():
+                return await get_response(request)
+            started = time.perf_counter()
+            stats, token = metrics.start_request()
+            try:
+                response = await get_response(request)
+            finally:
+                metrics.end_request(token)
+            _record(request, response, started, stats)
+            return response
+
+        return markcoroutinefunction(middleware)
+
+    def middleware(request):
+        if not metrics.enabled():
+            return get_response(request)
+        started = time.perf_counter()
+        stats, token = metrics.start_request()
+        try:
+            response = get_response(request)
+        finally:
+            metrics.end_request(token)
+        _record(request, response, started, stats)
+        return response
+
+    return middleware
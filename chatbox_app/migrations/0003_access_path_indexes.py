@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbox_app', '0002_webhook_delivery'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(fields=['-created_at'], name='session_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='generatedvideo',
+            index=models.Index(fields=['session', '-created_at'], name='video_session_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='generatedvideo',
+            index=models.Index(fields=['status', 'updated_at'], name='video_status_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['session', 'created_at', 'id'], name='message_session_created_idx'),
+        ),
+    ]
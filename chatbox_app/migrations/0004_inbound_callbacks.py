@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbox_app', '0003_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='generatedvideo',
+            index=models.Index(fields=['external_id'], name='video_external_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(condition=models.Q(('external_id', ''), _negated=True), fields=('session', 'external_id'), name='message_session_external_uniq'),
+        ),
+    ]
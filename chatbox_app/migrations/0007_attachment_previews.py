@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:12
+
+import chatbox_app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbox_app', '0006_attachment_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachmentblob',
+            name='preview',
+            field=models.FileField(blank=True, max_length=255, storage=chatbox_app.storage.blob_storage, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='attachmentblob',
+            name='preview_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='attachmentblob',
+            name='preview_status',
+            field=models.CharField(choices=[('pending', 'En attente'), ('processing', 'En cours'), ('ready', 'Prêt'), ('failed', 'Échec'), ('skipped', 'Non applicable')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='attachmentblob',
+            name='preview_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='attachmentblob',
+            index=models.Index(fields=['preview_status', 'updated_at'], name='blob_preview_status_idx'),
+        ),
+    ]
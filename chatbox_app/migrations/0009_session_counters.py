@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:18
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_counters(apps, schema_editor):
+    ChatSession = apps.get_model("chatbox_app", "ChatSession")
+    Message = apps.get_model("chatbox_app", "Message")
+    GeneratedVideo = apps.get_model("chatbox_app", "GeneratedVideo")
+
+    def per_session(model, aggregate):
+        return Subquery(
+            model.objects.filter(session=OuterRef("pk")).order_by().values("session").annotate(value=aggregate).values("value")
+        )
+
+    ChatSession.objects.update(
+        message_count=Coalesce(per_session(Message, Count("pk")), 0),
+        video_count=Coalesce(per_session(GeneratedVideo, Count("pk")), 0),
+        last_activity_at=Greatest(
+            "created_at",
+            Coalesce(per_session(Message, Max("created_at")), "created_at"),
+            Coalesce(per_session(GeneratedVideo, Max("updated_at")), "created_at"),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbox_app', '0008_session_last_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsession',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='video_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(fields=['-last_activity_at', '-id'], name='session_activity_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,93 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+
+# Frozen copy of chatbox_app.stemming as of this migration, so later stemmer changes do not alter it.
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+STOP_WORDS = frozenset(
+    """
+    a au aux avec ce ces dans de des du elle en et eux il ils je la le les leur lui ma mais me meme mes moi
+    mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une vos
+    votre vous c d j l m n s t y est sont ete etre avoir
+    """.split()
+)
+
+
+def fold(text):
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def light_stem(word):
+    if len(word) < 5 or word.isdigit():
+        return word
+    if word.endswith("aux"):
+        return word[:-3] + "al"
+    if word[-1] in "sx":
+        word = word[:-1]
+    for suffix, replacement in (("euse", "eu"), ("ive", "if"), ("elle", "el"), ("enne", "en"), ("ement", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            word = word[: -len(suffix)] + replacement
+            break
+    for suffix in ("ee", "er", "ez", "e"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[: -len(suffix)]
+    return word
+
+
+def stem_text(text):
+    words = (fold(match.group()) for match in WORD_RE.finditer(text))
+    return " ".join(light_stem(word) for word in words if word not in STOP_WORDS)
+
+
+FTS_TABLES = {"chatbox_message_fts": ("Message", "content"), "chatbox_video_fts": ("GeneratedVideo", "prompt")}
+POSTGRES_COLUMNS = {"chatbox_app_message": "content", "chatbox_app_generatedvideo": "prompt"}
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        for table, column in POSTGRES_COLUMNS.items():
+            schema_editor.execute(
+                f"ALTER TABLE {table} ADD COLUMN search_vector tsvector "
+                f"GENERATED ALWAYS AS (to_tsvector('french', coalesce({column}, ''))) STORED"
+            )
+            schema_editor.execute(f"CREATE INDEX {table}_search_idx ON {table} USING GIN (search_vector)")
+    elif vendor == "sqlite":
+        for table, (model_name, field) in FTS_TABLES.items():
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {table} USING fts5("
+                f"body, session_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            model = apps.get_model("chatbox_app", model_name)
+            rows = model.objects.order_by("pk").values_list("pk", "session_id", field).iterator(chunk_size=2000)
+            with schema_editor.connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {table} (rowid, body, session_id) VALUES (%s, %s, %s)",
+                    ((pk, stem_text(text), session_id) for pk, session_id, text in rows),
+                )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        for table in POSTGRES_COLUMNS:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {table}_search_idx")
+            schema_editor.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
+    elif vendor == "sqlite":
+        for table in FTS_TABLES:
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbox_app', '0009_session_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbox_app', '0010_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedvideo',
+            name='coalesced_into',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='followers', to='chatbox_app.generatedvideo'),
+        ),
+        migrations.AddField(
+            model_name='generatedvideo',
+            name='prompt_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='generatedvideo',
+            index=models.Index(fields=['prompt_hash', 'status'], name='video_prompt_status_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbox_app', '0011_video_prompt_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('segment', models.CharField(max_length=255)),
+                ('offset', models.BigIntegerField()),
+                ('length', models.BigIntegerField()),
+                ('message_count', models.PositiveIntegerField(default=0)),
+                ('video_count', models.PositiveIntegerField(default=0)),
+                ('raw_size', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(condition=models.Q(('archived_at__isnull', True)), fields=['last_activity_at', 'id'], name='session_hot_activity_idx'),
+        ),
+        migrations.AddField(
+            model_name='sessionarchive',
+            name='session',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archive', to='chatbox_app.chatsession'),
+        ),
+        migrations.AddIndex(
+            model_name='sessionarchive',
+            index=models.Index(fields=['segment'], name='archive_segment_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbox_app', '0012_session_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CircuitBreakerState',
+            fields=[
+                ('name', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('state', models.CharField(choices=[('closed', 'Fermé'), ('open', 'Ouvert'), ('half_open', 'Semi-ouvert')], default='closed', max_length=20)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('failures', models.PositiveIntegerField(default=0)),
+                ('window_started_at', models.FloatField(blank=True, null=True)),
+                ('opened_at', models.FloatField(blank=True, null=True)),
+                ('changed_at', models.FloatField(blank=True, null=True)),
+                ('probe_token', models.CharField(blank=True, max_length=32)),
+                ('probe_expires_at', models.FloatField(blank=True, null=True)),
+                ('transitions', models.JSONField(default=list)),
+            ],
+        ),
+    ]
@@ -1,21 +1,130 @@
-import mimetypes
 import os
+import uuid
 
 from django.db import models
+from django.utils import timezone
+
+from .sniffing import sniff_file
+from .storage import blob_name, blob_storage, hash_file
+
+
+def attachment_path(session_id, filename):
+    extension = os.path.splitext(filename)[1].lower()[:16]
+    return os.path.join("uploads", f"session_{session_id}", f"{uuid.uuid4().hex}{extension}")
 
 
 def message_upload_path(instance, filename):
-    session_folder = f"session_{instance.session_id}"
-    return os.path.join("uploads", session_folder, filename)
+    return attachment_path(instance.session_id, filename)
 
 
 class ChatSession(models.Model):
     name = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    last_activity_at = models.DateTimeField(default=timezone.now)
+    message_count = models.PositiveIntegerField(default=0)
+    video_count = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at"], name="session_created_idx"),
+            models.Index(fields=["-last_activity_at", "-id"], name="session_activity_idx"),
+            models.Index(
+                fields=["last_activity_at", "id"],
+                condition=models.Q(archived_at__isnull=True),
+                name="session_hot_activity_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.name or f"Session {self.pk}"
 
+    @property
+    def activity_version(self) -> int:
+        return int(self.last_activity_at.timestamp() * 1_000_000)
+
+    @property
+    def is_archived(self) -> bool:
+        return self.archived_at is not None
+
+
+class SessionArchive(models.Model):
+    session = models.OneToOneField(ChatSession, related_name="archive", on_delete=models.CASCADE)
+    segment = models.CharField(max_length=255)
+    offset = models.BigIntegerField()
+    length = models.BigIntegerField()
+    message_count = models.PositiveIntegerField(default=0)
+    video_count = models.PositiveIntegerField(default=0)
+    raw_size = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["segment"], name="archive_segment_idx")]
+
+    def __str__(self):
+        return f"Archive de la session {self.session_id} ({self.segment})"
+
+
+class AttachmentBlobManager(models.Manager):
+    def store(self, fileobj, sha256: str = "", content_type: str = "") -> "AttachmentBlob":
+        if sha256:
+            size = fileobj.size
+        else:
+            sha256, size = hash_file(fileobj)
+        blob = self.filter(sha256=sha256).first()
+        if blob is not None:
+            # Touching the row keeps the garbage collector's grace period from racing a new reference.
+            self.filter(pk=blob.pk).update(updated_at=timezone.now())
+            return blob
+        content_type = content_type or sniff_file(fileobj)
+        name = blob_storage().save(blob_name(sha256, content_type), fileobj)
+        blob, _ = self.get_or_create(
+            sha256=sha256, defaults={"file": name, "size": size, "content_type": content_type}
+        )
+        return blob
+
+
+class AttachmentBlob(models.Model):
+    PREVIEW_PENDING = "pending"
+    PREVIEW_PROCESSING = "processing"
+    PREVIEW_READY = "ready"
+    PREVIEW_FAILED = "failed"
+    PREVIEW_SKIPPED = "skipped"
+    PREVIEW_STATUS_CHOICES = [
+        (PREVIEW_PENDING, "En attente"),
+        (PREVIEW_PROCESSING, "En cours"),
+        (PREVIEW_READY, "Prêt"),
+        (PREVIEW_FAILED, "Échec"),
+        (PREVIEW_SKIPPED, "Non applicable"),
+    ]
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(storage=blob_storage, max_length=255)
+    size = models.BigIntegerField()
+    content_type = models.CharField(max_length=100, blank=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    preview = models.FileField(storage=blob_storage, max_length=255, blank=True)
+    preview_width = models.PositiveIntegerField(blank=True, null=True)
+    preview_height = models.PositiveIntegerField(blank=True, null=True)
+    preview_status = models.CharField(max_length=20, choices=PREVIEW_STATUS_CHOICES, default=PREVIEW_PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = AttachmentBlobManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["ref_count", "updated_at"], name="blob_refcount_updated_idx"),
+            models.Index(fields=["preview_status", "updated_at"], name="blob_preview_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"Blob {self.sha256[:12]} ({self.ref_count} réf.)"
+
+    @property
+    def has_preview(self) -> bool:
+        return self.preview_status == self.PREVIEW_READY and bool(self.preview)
+
 
 class Message(models.Model):
     USER = "user"
@@ -27,15 +136,61 @@ class Message(models.Model):
     content = models.TextField(blank=True)
     attachment = models.FileField(upload_to=message_upload_path, blank=True, null=True)
     attachment_type = models.CharField(max_length=50, blank=True)
+    attachment_name = models.CharField(max_length=255, blank=True)
+    blob = models.ForeignKey(
+        AttachmentBlob, related_name="messages", on_delete=models.PROTECT, blank=True, null=True
+    )
+    external_id = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["session", "created_at", "id"], name="message_session_created_idx")]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["session", "external_id"],
+                condition=~models.Q(external_id=""),
+                name="message_session_external_uniq",
+            )
+        ]
+
     def save(self, *args, **kwargs):
+        if self.attachment and not self.attachment_name:
+            self.attachment_name = os.path.basename(self.attachment.name)[:255]
+        if self.attachment and not self.attachment._committed:
+            self.blob = AttachmentBlob.objects.store(self.attachment.file)
+            self.attachment = self.blob.file.name
+            self.attachment_type = self.attachment_type or self.blob.content_type
         if self.attachment and not self.attachment_type:
-            mime_type, _ = mimetypes.guess_type(self.attachment.name)
-            self.attachment_type = mime_type or "application/octet-stream"
+            self.attachment_type = sniff_file(self.attachment)
         super().save(*args, **kwargs)
 
 
+class AttachmentUpload(models.Model):
+    STATUS_UPLOADING = "uploading"
+    STATUS_COMPLETED = "completed"
+    STATUS_CHOICES = [(STATUS_UPLOADING, "En cours"), (STATUS_COMPLETED, "Terminé")]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    session = models.ForeignKey(ChatSession, related_name="uploads", on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    content_type = models.CharField(max_length=100, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_UPLOADING)
+    message = models.OneToOneField(
+        Message, related_name="upload", on_delete=models.SET_NULL, blank=True, null=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "updated_at"], name="upload_status_updated_idx")]
+
+    def __str__(self):
+        return f"Téléversement {self.filename} ({self.received}/{self.size})"
+
+
 class GeneratedVideo(models.Model):
     STATUS_PENDING = "pending"
     STATUS_PROCESSING = "processing"
@@ -50,11 +205,100 @@ class GeneratedVideo(models.Model):
 
     session = models.ForeignKey(ChatSession, related_name="generated_videos", on_delete=models.CASCADE)
     prompt = models.TextField()
+    prompt_hash = models.CharField(max_length=64, blank=True)
+    coalesced_into = models.ForeignKey(
+        "self", related_name="followers", on_delete=models.SET_NULL, blank=True, null=True
+    )
     external_id = models.CharField(max_length=255, blank=True)
     video_url = models.URLField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["session", "-created_at"], name="video_session_created_idx"),
+            models.Index(fields=["status", "updated_at"], name="video_status_updated_idx"),
+            models.Index(fields=["external_id"], name="video_external_idx"),
+            models.Index(fields=["prompt_hash", "status"], name="video_prompt_status_idx"),
+        ]
+
     def __str__(self):
         return f"Vidéo {self.pk} - {self.status}"
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.status in {self.STATUS_COMPLETED, self.STATUS_FAILED}
+
+    def status_payload(self) -> dict:
+        return {
+            "id": self.pk,
+            "status": self.status,
+            "status_display": self.get_status_display(),
+            "video_url": self.video_url,
+            "external_id": self.external_id,
+        }
+
+
+class WebhookDelivery(models.Model):
+    KIND_MESSAGE = "message"
+    KIND_VIDEO = "video"
+    KIND_CHOICES = [(KIND_MESSAGE, "Message"), (KIND_VIDEO, "Vidéo")]
+
+    STATUS_PENDING = "pending"
+    STATUS_SENDING = "sending"
+    STATUS_DELIVERED = "delivered"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "En attente"),
+        (STATUS_SENDING, "En cours d'envoi"),
+        (STATUS_DELIVERED, "Livré"),
+        (STATUS_FAILED, "Échec"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    message = models.ForeignKey(
+        Message, related_name="deliveries", on_delete=models.CASCADE, blank=True, null=True
+    )
+    video = models.ForeignKey(
+        GeneratedVideo, related_name="deliveries", on_delete=models.CASCADE, blank=True, null=True
+    )
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=64, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"], name="delivery_status_next_idx")]
+
+    def __str__(self):
+        return f"Livraison {self.pk} ({self.kind}) - {self.status}"
+
+
+class CircuitBreakerState(models.Model):
+    STATE_CLOSED = "closed"
+    STATE_OPEN = "open"
+    STATE_HALF_OPEN = "half_open"
+    STATE_CHOICES = [
+        (STATE_CLOSED, "Fermé"),
+        (STATE_OPEN, "Ouvert"),
+        (STATE_HALF_OPEN, "Semi-ouvert"),
+    ]
+
+    name = models.CharField(max_length=32, primary_key=True)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=STATE_CLOSED)
+    version = models.PositiveIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
+    window_started_at = models.FloatField(blank=True, null=True)
+    opened_at = models.FloatField(blank=True, null=True)
+    changed_at = models.FloatField(blank=True, null=True)
+    probe_token = models.CharField(max_length=32, blank=True)
+    probe_expires_at = models.FloatField(blank=True, null=True)
+    transitions = models.JSONField(default=list)
+
+    def __str__(self):
+        return f"Disjoncteur {self.name} - {self.state}"
@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Subquery
+from django.utils import timezone
+
+from asgiref.sync import sync_to_async
+import httpx
+import requests
+
+from . import ratelimit
+from .models import GeneratedVideo, Message, WebhookDelivery
+from .webhooks import (
+    BatchItemError,
+    adispatch_message_batch,
+    adispatch_message_webhook,
+    atrigger_video_generation,
+    build_message_payload,
+    build_video_payload,
+    dispatch_message_batch,
+    dispatch_message_webhook,
+    extract_reply,
+    message_batching_enabled,
+    message_webhook_configured,
+    save_assistant_reply,
+    trigger_video_generation,
+    video_api_configured,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_message(
+    message: Message,
+    attachment_url: str | None = None,
+    callback_url: str | None = None,
+    payload: dict | None = None,
+) -> WebhookDelivery | None:
+    if not message_webhook_configured():
+        logger.warning(
+            "No message webhook configured; skipping dispatch",
+            extra={"session_id": message.session_id, "message_id": message.pk},
+        )
+        return None
+    return WebhookDelivery.objects.create(
+        kind=WebhookDelivery.KIND_MESSAGE,
+        message=message,
+        payload=payload or build_message_payload(message, attachment_url, callback_url),
+    )
+
+
+def enqueue_video(video: GeneratedVideo, callback_url: str | None = None) -> WebhookDelivery | None:
+    if not video_api_configured():
+        return None
+    return WebhookDelivery.objects.create(
+        kind=WebhookDelivery.KIND_VIDEO,
+        video=video,
+        payload=build_video_payload(video.session, video.prompt, callback_url),
+    )
+
+
+def claim_deliveries(limit: int) -> list[WebhookDelivery]:
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, "WEBHOOK_CLAIM_TIMEOUT", 120))
+    token = uuid.uuid4().hex
+    claimable = {
+        "status__in": [WebhookDelivery.STATUS_PENDING, WebhookDelivery.STATUS_SENDING],
+        "next_attempt_at__lte": now,
+    }
+    claim = {
+        "status": WebhookDelivery.STATUS_SENDING,
+        "claimed_by": token,
+        "attempts": F("attempts") + 1,
+        "next_attempt_at": now + lease,
+        "updated_at": now,
+    }
+    candidates = WebhookDelivery.objects.filter(**claimable).order_by("next_attempt_at", "pk")
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(candidates.select_for_update(skip_locked=True).values_list("pk", flat=True)[:limit])
+            if not ids:
+                return []
+            WebhookDelivery.objects.filter(pk__in=ids).update(**claim)
+    else:
+        # A single UPDATE keeps SQLite from upgrading a read lock while worker threads write.
+        claimed = WebhookDelivery.objects.filter(
+            pk__in=Subquery(candidates.values("pk")[:limit]), **claimable
+        ).update(**claim)
+        if not claimed:
+            return []
+    return list(
+        WebhookDelivery.objects.filter(claimed_by=token, status=WebhookDelivery.STATUS_SENDING)
+        .select_related("message", "video__session")
+        .order_by("pk")
+    )
+
+
+UPSTREAM_ERRORS = (requests.RequestException, httpx.HTTPError, ValueError)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, BatchItemError):
+        return exc.retryable
+    if isinstance(exc, (requests.HTTPError, httpx.HTTPStatusError)) and exc.response is not None:
+        status = exc.response.status_code
+        return status >= 500 or status in {408, 429}
+    return isinstance(exc, (requests.RequestException, httpx.HTTPError))
+
+
+def _schedule_retry(delivery: WebhookDelivery, exc: Exception) -> None:
+    max_attempts = getattr(settings, "WEBHOOK_MAX_ATTEMPTS", 5)
+    delivery.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+    if _is_retryable(exc) and delivery.attempts < max_attempts:
+        backoff = getattr(settings, "WEBHOOK_RETRY_BACKOFF", 10) * 2 ** (delivery.attempts - 1)
+        delivery.status = WebhookDelivery.STATUS_PENDING
+        delivery.next_attempt_at = timezone.now() + timedelta(seconds=backoff)
+        delivery.save(update_fields=["status", "next_attempt_at", "last_error", "updated_at"])
+        logger.warning(
+            "Webhook delivery failed; retry scheduled",
+            extra={"delivery_id": delivery.pk, "attempts": delivery.attempts, "retry_in": backoff},
+        )
+        return
+
+    delivery.status = WebhookDelivery.STATUS_FAILED
+    delivery.save(update_fields=["status", "last_error", "updated_at"])
+    if delivery.video is not None:
+        delivery.video.status = GeneratedVideo.STATUS_FAILED
+        delivery.video.save(update_fields=["status", "updated_at"])
+    logger.error(
+        "Webhook delivery failed permanently",
+        extra={"delivery_id": delivery.pk, "attempts": delivery.attempts, "kind": delivery.kind},
+    )
+
+
+def _record_reply(delivery: WebhookDelivery, data) -> None:
+    reply = extract_reply(data)
+    if reply:
+        external_id = str(data.get("reply_id") or "") if isinstance(data, dict) else ""
+        save_assistant_reply(delivery.message, reply, external_id)
+
+
+def _mark_delivered(delivery: WebhookDelivery) -> None:
+    delivery.status = WebhookDelivery.STATUS_DELIVERED
+    delivery.last_error = ""
+    delivery.save(update_fields=["status", "last_error", "updated_at"])
+
+
+def _log_failure(delivery: WebhookDelivery) -> None:
+    logger.exception(
+        "Webhook call failed",
+        extra={"delivery_id": delivery.pk, "kind": delivery.kind},
+    )
+
+
+def _postpone(delivery: WebhookDelivery, exc: ratelimit.Overloaded) -> None:
+    # Shedding is not a failed attempt: hand the claimed attempt back and retry shortly.
+    now = timezone.now()
+    WebhookDelivery.objects.filter(pk=delivery.pk, claimed_by=delivery.claimed_by).update(
+        status=WebhookDelivery.STATUS_PENDING,
+        attempts=F("attempts") - 1,
+        next_attempt_at=now + timedelta(seconds=exc.retry_after),
+        updated_at=now,
+    )
+    logger.info(
+        "Upstream saturated; delivery postponed",
+        extra={"delivery_id": delivery.pk, "retry_in": exc.retry_after},
+    )
+
+
+def process_delivery(delivery: WebhookDelivery) -> bool:
+    try:
+        with ratelimit.upstream_slot():
+            if delivery.kind == WebhookDelivery.KIND_VIDEO:
+                trigger_video_generation(delivery.video, delivery.payload)
+            else:
+                _record_reply(delivery, dispatch_message_webhook(delivery.message_id, delivery.payload))
+    except ratelimit.Overloaded as exc:
+        _postpone(delivery, exc)
+        return False
+    except UPSTREAM_ERRORS as exc:
+        _log_failure(delivery)
+        _schedule_retry(delivery, exc)
+        return False
+
+    _mark_delivered(delivery)
+    return True
+
+
+async def aprocess_delivery(delivery: WebhookDelivery) -> bool:
+    try:
+        async with ratelimit.aupstream_slot():
+            if delivery.kind == WebhookDelivery.KIND_VIDEO:
+                await atrigger_video_generation(delivery.video, delivery.payload)
+            else:
+                data = await adispatch_message_webhook(delivery.message_id, delivery.payload)
+                await sync_to_async(_record_reply)(delivery, data)
+    except ratelimit.Overloaded as exc:
+        await sync_to_async(_postpone)(delivery, exc)
+        return False
+    except UPSTREAM_ERRORS as exc:
+        _log_failure(delivery)
+        await sync_to_async(_schedule_retry)(delivery, exc)
+        return False
+
+    await sync_to_async(_mark_delivered)(delivery)
+    return True
+
+
+class MessageBatcher:
+    def __init__(self, size: int | None = None, window_ms: float | None = None) -> None:
+        self.size = size or getattr(settings, "AI_MESSAGE_BATCH_SIZE", 1)
+        self.window = (window_ms if window_ms is not None else getattr(settings, "AI_MESSAGE_BATCH_WINDOW_MS", 50)) / 1000
+        self.enabled = self.size > 1 and message_batching_enabled()
+        self._pending: list[WebhookDelivery] = []
+        self._opened_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, deliveries: list[WebhookDelivery]) -> list[WebhookDelivery]:
+        if not self.enabled:
+            return deliveries
+        singles = []
+        for delivery in deliveries:
+            if delivery.kind == WebhookDelivery.KIND_MESSAGE:
+                if not self._pending:
+                    self._opened_at = time.monotonic()
+                self._pending.append(delivery)
+            else:
+                singles.append(delivery)
+        return singles
+
+    def ready(self, flush: bool = False) -> list[list[WebhookDelivery]]:
+        batches = []
+        while len(self._pending) >= self.size:
+            batches.append(self._pending[: self.size])
+            self._pending = self._pending[self.size :]
+            self._opened_at = time.monotonic()
+        if self._pending and (flush or time.monotonic() - self._opened_at >= self.window):
+            batches.append(self._pending)
+            self._pending = []
+        return batches
+
+    def wait_time(self, default: float) -> float:
+        if not self._pending:
+            return default
+        return max(0.0, min(default, self._opened_at + self.window - time.monotonic()))
+
+
+def _settle_batch(deliveries: list[WebhookDelivery], results: dict[int, object]) -> list[bool]:
+    outcomes, delivered = [], []
+    for delivery in deliveries:
+        result = results[delivery.message_id]
+        if isinstance(result, BatchItemError):
+            logger.warning(
+                "Batched message rejected by webhook",
+                extra={"delivery_id": delivery.pk, "message_id": delivery.message_id, "error": str(result)},
+            )
+            _schedule_retry(delivery, result)
+            outcomes.append(False)
+            continue
+        try:
+            _record_reply(delivery, result)
+        except Exception as exc:
+            logger.exception("Could not store batched reply", extra={"delivery_id": delivery.pk})
+            _schedule_retry(delivery, exc)
+            outcomes.append(False)
+            continue
+        delivered.append(delivery.pk)
+        outcomes.append(True)
+    WebhookDelivery.objects.filter(pk__in=delivered).update(
+        status=WebhookDelivery.STATUS_DELIVERED, last_error="", updated_at=timezone.now()
+    )
+    return outcomes
+
+
+def _fail_batch(deliveries: list[WebhookDelivery], exc: Exception) -> list[bool]:
+    logger.error("Batched webhook call failed", exc_info=exc, extra={"batch_size": len(deliveries)})
+    for delivery in deliveries:
+        _schedule_retry(delivery, exc)
+    return [False] * len(deliveries)
+
+
+def _postpone_batch(deliveries: list[WebhookDelivery], exc: ratelimit.Overloaded) -> list[bool]:
+    for delivery in deliveries:
+        _postpone(delivery, exc)
+    return [False] * len(deliveries)
+
+
+def process_batch(deliveries: list[WebhookDelivery]) -> list[bool]:
+    if len(deliveries) == 1:
+        return [process_delivery(deliveries[0])]
+    try:
+        with ratelimit.upstream_slot():
+            results = dispatch_message_batch([delivery.payload for delivery in deliveries])
+    except ratelimit.Overloaded as exc:
+        return _postpone_batch(deliveries, exc)
+    except UPSTREAM_ERRORS as exc:
+        return _fail_batch(deliveries, exc)
+    return _settle_batch(deliveries, results)
+
+
+async def aprocess_batch(deliveries: list[WebhookDelivery]) -> list[bool]:
+    if len(deliveries) == 1:
+        return [await aprocess_delivery(deliveries[0])]
+    try:
+        async with ratelimit.aupstream_slot():
+            results = await adispatch_message_batch([delivery.payload for delivery in deliveries])
+    except ratelimit.Overloaded as exc:
+        return await sync_to_async(_postpone_batch)(deliveries, exc)
+    except UPSTREAM_ERRORS as exc:
+        return await sync_to_async(_fail_batch)(deliveries, exc)
+    return await sync_to_async(_settle_batch)(deliveries, results)
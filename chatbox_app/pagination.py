@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from django.db.models import Q, Subquery
+
+from .models import ChatSession, Message
+
+
+@dataclass
+class MessagePage:
+    messages: list[Message]
+    has_more: bool
+
+    @property
+    def first_id(self) -> int | None:
+        return self.messages[0].pk if self.messages else None
+
+    @property
+    def last_id(self) -> int | None:
+        return self.messages[-1].pk if self.messages else None
+
+
+def message_page(
+    session: ChatSession,
+    limit: int,
+    after: int | None = None,
+    before: int | None = None,
+) -> MessagePage:
+    queryset = Message.objects.filter(session=session).select_related("blob")
+    if after is not None:
+        anchor = Subquery(Message.objects.filter(pk=after, session=session).values("created_at"))
+        rows = list(
+            queryset.filter(Q(created_at__gt=anchor) | Q(created_at=anchor, pk__gt=after))
+            .order_by("created_at", "pk")[: limit + 1]
+        )
+        return MessagePage(messages=rows[:limit], has_more=len(rows) > limit)
+
+    if before is not None:
+        anchor = Subquery(Message.objects.filter(pk=before, session=session).values("created_at"))
+        queryset = queryset.filter(Q(created_at__lt=anchor) | Q(created_at=anchor, pk__lt=before))
+    rows = list(queryset.order_by("-created_at", "-pk")[: limit + 1])
+    page = rows[:limit]
+    page.reverse()
+    return MessagePage(messages=page, has_more=len(rows) > limit)
+
+
+SESSION_SORTS = {"activity": "last_activity_at", "created": "created_at"}
+
+
+@dataclass
+class SessionPage:
+    sessions: list[ChatSession]
+    has_more: bool
+    sort: str
+    query: str
+
+    @property
+    def last_id(self) -> int | None:
+        return self.sessions[-1].pk if self.sessions else None
+
+
+def session_page(limit: int, sort: str = "activity", query: str = "", after: int | None = None) -> SessionPage:
+    if sort not in SESSION_SORTS:
+        sort = "activity"
+    field = SESSION_SORTS[sort]
+    queryset = ChatSession.objects.all()
+    if query:
+        queryset = queryset.filter(name__icontains=query)
+    if after is not None:
+        anchor = Subquery(ChatSession.objects.filter(pk=after).values(field))
+        queryset = queryset.filter(Q(**{f"{field}__lt": anchor}) | Q(**{field: anchor, "pk__lt": after}))
+    rows = list(queryset.order_by(f"-{field}", "-pk")[: limit + 1])
+    return SessionPage(sessions=rows[:limit], has_more=len(rows) > limit, sort=sort, query=query)
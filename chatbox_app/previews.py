@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AttachmentBlob, ChatSession
+from .storage import blob_storage
+from .thumbnails import PreviewOptions, preview_name
+
+
+logger = logging.getLogger(__name__)
+
+
+def preview_options() -> PreviewOptions:
+    return PreviewOptions(
+        max_size=getattr(settings, "PREVIEW_MAX_SIZE", 480),
+        quality=getattr(settings, "PREVIEW_QUALITY", 75),
+        ffmpeg=getattr(settings, "PREVIEW_FFMPEG_BINARY", "ffmpeg"),
+        video_offset=getattr(settings, "PREVIEW_VIDEO_OFFSET", 1.0),
+    )
+
+
+def claim_blobs(limit: int) -> list[AttachmentBlob]:
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, "PREVIEW_CLAIM_TIMEOUT", 600))
+    AttachmentBlob.objects.filter(
+        preview_status=AttachmentBlob.PREVIEW_PROCESSING, updated_at__lt=now - lease
+    ).update(preview_status=AttachmentBlob.PREVIEW_PENDING)
+
+    pending = AttachmentBlob.objects.filter(preview_status=AttachmentBlob.PREVIEW_PENDING)
+    previewable = Q(content_type__startswith="image/") | Q(content_type__startswith="video/")
+    pending.exclude(previewable).update(preview_status=AttachmentBlob.PREVIEW_SKIPPED, updated_at=now)
+
+    claimed = []
+    for blob in pending.filter(previewable).order_by("pk")[:limit]:
+        if AttachmentBlob.objects.filter(pk=blob.pk, preview_status=AttachmentBlob.PREVIEW_PENDING).update(
+            preview_status=AttachmentBlob.PREVIEW_PROCESSING, updated_at=now
+        ):
+            claimed.append(blob)
+    return claimed
+
+
+def save_preview(blob: AttachmentBlob, data: bytes, width: int, height: int, max_size: int) -> None:
+    name = blob_storage().save(preview_name(blob.sha256, max_size), ContentFile(data))
+    AttachmentBlob.objects.filter(pk=blob.pk).update(
+        preview=name,
+        preview_width=width,
+        preview_height=height,
+        preview_status=AttachmentBlob.PREVIEW_READY,
+        updated_at=timezone.now(),
+    )
+    # Cached message fragments embed the original file until their session version moves.
+    ChatSession.objects.filter(messages__blob=blob).update(last_activity_at=timezone.now())
+    logger.info(
+        "Attachment preview generated",
+        extra={"sha256": blob.sha256, "bytes": len(data), "source_bytes": blob.size},
+    )
+
+
+def mark_preview(blob: AttachmentBlob, status: str) -> None:
+    AttachmentBlob.objects.filter(pk=blob.pk).update(preview_status=status, updated_at=timezone.now())
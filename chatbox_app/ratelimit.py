@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpRequest
+
+from .shared_cache import require_atomic
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "chatbox:ratelimit:"
+INFLIGHT_KEY = "chatbox:upstream:inflight"
+SATURATED = "Le service IA est saturé, réessayez dans quelques secondes."
+
+# Checks every bucket first and only spends tokens when all of them allow the call.
+TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 3 - 1])
+    local rate = tonumber(ARGV[i * 3])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    levels[i] = tokens
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - 1), 'ts', tostring(now))
+    redis.call('EXPIRE', key, tonumber(ARGV[i * 3 + 1]))
+end
+return '0'
+"""
+
+
+class Overloaded(Exception):
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class Bucket:
+    key: str
+    capacity: float
+    rate: float
+
+    @property
+    def ttl(self) -> int:
+        return max(1, math.ceil(self.capacity / self.rate))
+
+
+def parse_rate(value: str) -> tuple[float, float] | None:
+    if not value:
+        return None
+    try:
+        count, period = value.split("/", 1)
+        capacity, seconds = float(count), float(period)
+    except ValueError as exc:
+        raise ImproperlyConfigured(f"Débit invalide : {value!r} (format attendu : 20/60)") from exc
+    if capacity <= 0 or seconds <= 0:
+        return None
+    return capacity, capacity / seconds
+
+
+class CacheBucketStore:
+    # Fixed windows counted with add/incr: each call is a single cache operation, so every process shares them.
+    # A token bucket needs a read-modify-write the cache API cannot make atomic, hence windows, which let up to
+    # twice the capacity through around a window boundary. RedisBucketStore is the real token bucket.
+    def __init__(self) -> None:
+        require_atomic("RATE_LIMIT_BACKEND='cache'")
+
+    def consume(self, buckets: list[Bucket], now: float) -> float:
+        taken = []
+        for bucket in buckets:
+            period = bucket.capacity / bucket.rate
+            window = math.floor(now / period)
+            key = f"{bucket.key}:{window}"
+            cache.add(key, 0, bucket.ttl)
+            try:
+                count = cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, bucket.ttl)
+                count = 1
+            taken.append(key)
+            if count > bucket.capacity:
+                # Hand back what this call took so a refused request does not count against the other buckets.
+                for spent in taken:
+                    try:
+                        cache.decr(spent)
+                    except ValueError:
+                        pass
+                return (window + 1) * period - now
+        return 0.0
+
+
+class RedisBucketStore:
+    def __init__(self, url: str) -> None:
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured(
+                "RATE_LIMIT_BACKEND='redis' nécessite le paquet redis (pip install redis)."
+            ) from exc
+        self._script = redis.Redis.from_url(url).register_script(TOKEN_BUCKET_LUA)
+
+    def consume(self, buckets: list[Bucket], now: float) -> float:
+        args = [now]
+        for bucket in buckets:
+            args += [bucket.capacity, bucket.rate, bucket.ttl]
+        result = self._script(keys=[bucket.key for bucket in buckets], args=args)
+        return float(result)
+
+
+_store: CacheBucketStore | RedisBucketStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> CacheBucketStore | RedisBucketStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = getattr(settings, "RATE_LIMIT_BACKEND", "cache")
+                if backend == "redis":
+                    _store = RedisBucketStore(getattr(settings, "REDIS_URL", ""))
+                elif backend == "cache":
+                    _store = CacheBucketStore()
+                else:
+                    raise ImproperlyConfigured(f"RATE_LIMIT_BACKEND inconnu : {backend}")
+    return _store
+
+
+def client_ip(request: HttpRequest) -> str:
+    proxies = getattr(settings, "RATE_LIMIT_TRUSTED_PROXIES", 0)
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+    if proxies and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if len(hops) >= proxies:
+            return hops[-proxies]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _upstream_url(kind: str) -> str:
+    if kind == "video":
+        return getattr(settings, "AI_VIDEO_API_URL", "")
+    return getattr(settings, "AI_MESSAGE_WEBHOOK_URL", "")
+
+
+def _buckets(request: HttpRequest, session_id: int, kind: str) -> list[Bucket]:
+    upstream = hashlib.sha1(_upstream_url(kind).encode()).hexdigest()[:16]
+    scopes = [
+        ("RATE_LIMIT_SESSION", f"session:{session_id}"),
+        ("RATE_LIMIT_IP", f"ip:{client_ip(request)}"),
+        ("RATE_LIMIT_UPSTREAM", f"upstream:{upstream}"),
+    ]
+    buckets = []
+    for setting, scope in scopes:
+        rate = parse_rate(getattr(settings, setting, ""))
+        if rate is not None:
+            buckets.append(Bucket(f"{KEY_PREFIX}{scope}", *rate))
+    return buckets
+
+
+def _max_inflight() -> int:
+    limit = getattr(settings, "UPSTREAM_MAX_INFLIGHT", 0)
+    if limit:
+        require_atomic("UPSTREAM_MAX_INFLIGHT")
+    return limit
+
+
+def upstream_saturated() -> bool:
+    limit = _max_inflight()
+    return bool(limit) and (cache.get(INFLIGHT_KEY) or 0) >= limit
+
+
+def admit(request: HttpRequest, session_id: int, kind: str) -> None:
+    if not getattr(settings, "RATE_LIMIT_ENABLED", True):
+        return
+    if upstream_saturated():
+        logger.warning("Upstream saturated; request shed", extra={"session_id": session_id, "kind": kind})
+        raise Overloaded(SATURATED, retry_after=5)
+    buckets = _buckets(request, session_id, kind)
+    if not buckets:
+        return
+    wait = get_store().consume(buckets, time.time())
+    if wait > 0:
+        logger.warning(
+            "Rate limit exceeded",
+            extra={"session_id": session_id, "kind": kind, "ip": client_ip(request), "retry_after": wait},
+        )
+        raise Overloaded("Trop de requêtes, merci de patienter avant de réessayer.", retry_after=wait)
+
+
+def _inflight_ttl() -> int:
+    # The counter expires once no slot has been taken for this long, in case a crashed process never released its own.
+    return getattr(settings, "UPSTREAM_INFLIGHT_TTL", 300)
+
+
+def _check_slot(taken: int, strict: bool) -> None:
+    if strict and taken > _max_inflight():
+        raise Overloaded(SATURATED, retry_after=5)
+
+
+@contextmanager
+def upstream_slot(strict: bool = True) -> Iterator[None]:
+    if not _max_inflight():
+        yield
+        return
+    cache.add(INFLIGHT_KEY, 0, _inflight_ttl())
+    try:
+        taken = cache.incr(INFLIGHT_KEY)
+    except ValueError:
+        cache.set(INFLIGHT_KEY, 1, _inflight_ttl())
+        taken = 1
+    # add() only sets the TTL once; under steady load the counter would expire with slots still held.
+    cache.touch(INFLIGHT_KEY, _inflight_ttl())
+    try:
+        _check_slot(taken, strict)
+        yield
+    finally:
+        try:
+            cache.decr(INFLIGHT_KEY)
+        except ValueError:
+            pass
+
+
+@asynccontextmanager
+async def aupstream_slot(strict: bool = True) -> AsyncIterator[None]:
+    if not _max_inflight():
+        yield
+        return
+    await cache.aadd(INFLIGHT_KEY, 0, _inflight_ttl())
+    try:
+        taken = await cache.aincr(INFLIGHT_KEY)
+    except ValueError:
+        await cache.aset(INFLIGHT_KEY, 1, _inflight_ttl())
+        taken = 1
+    await cache.atouch(INFLIGHT_KEY, _inflight_ttl())
+    try:
+        _check_slot(taken, strict)
+        yield
+    finally:
+        try:
+            await cache.adecr(INFLIGHT_KEY)
+        except ValueError:
+            pass
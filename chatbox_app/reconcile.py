@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+import httpx
+import requests
+
+from . import events, http_client, status_cache, video_cache
+from .breaker import CircuitOpen
+from .models import ChatSession, GeneratedVideo, WebhookDelivery
+from .webhooks import _auth_headers, apply_video_result, video_breaker
+
+
+logger = logging.getLogger(__name__)
+
+STUCK = (GeneratedVideo.STATUS_PENDING, GeneratedVideo.STATUS_PROCESSING)
+SCAN_FIELDS = ("session", "coalesced_into", "prompt_hash", "external_id", "video_url", "status", "created_at")
+UPDATE_FIELDS = ["status", "video_url", "updated_at"]
+LOOKUP_ERRORS = (requests.RequestException, httpx.HTTPError, ValueError)
+
+
+@dataclass
+class ReconcileStats:
+    scanned: int = 0
+    looked_up: int = 0
+    unchanged: int = 0
+    lookup_errors: int = 0
+    outcomes: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def changed(self) -> int:
+        return sum(self.outcomes.values())
+
+
+def _status_url() -> str:
+    return getattr(settings, "AI_VIDEO_STATUS_URL", "")
+
+
+def _lookup_batch_size() -> int:
+    return max(1, getattr(settings, "AI_VIDEO_STATUS_LOOKUP_BATCH", 100))
+
+
+def scan_stuck(stale_before: datetime, batch_size: int) -> Iterator[list[GeneratedVideo]]:
+    # Keyset over (status, updated_at, id) so each page is an index range scan, whatever the backlog size.
+    for status in STUCK:
+        last = None
+        while True:
+            page = GeneratedVideo.objects.filter(status=status, updated_at__lt=stale_before)
+            if last is not None:
+                page = page.filter(Q(updated_at__gt=last[0]) | Q(updated_at=last[0], pk__gt=last[1]))
+            rows = list(
+                page.select_related("coalesced_into")
+                .only(*SCAN_FIELDS, "updated_at", "coalesced_into__status", "coalesced_into__video_url")
+                .order_by("updated_at", "pk")[:batch_size]
+            )
+            if not rows:
+                break
+            # Take the anchor before yielding: the caller bumps updated_at on the rows it resolves.
+            last = (rows[-1].updated_at, rows[-1].pk)
+            yield rows
+
+
+def _job_id(data: dict) -> str:
+    return str(data.get("id") or data.get("job_id") or data.get("external_id") or "")
+
+
+def _fetch_one(external_id: str) -> dict[str, dict]:
+    url = _status_url().format(external_id=external_id)
+    with video_breaker.guard():
+        response = http_client.get(url, headers=_auth_headers(getattr(settings, "AI_VIDEO_API_KEY", "")))
+        if response.status_code == 404:
+            return {external_id: {"status": GeneratedVideo.STATUS_FAILED}}
+        response.raise_for_status()
+    return {external_id: response.json()}
+
+
+def _fetch_many(external_ids: list[str]) -> dict[str, dict]:
+    headers = _auth_headers(getattr(settings, "AI_VIDEO_API_KEY", ""))
+    with video_breaker.guard():
+        response = http_client.post(_status_url(), json={"ids": external_ids}, headers=headers)
+        response.raise_for_status()
+    data = response.json()
+    if isinstance(data, dict):
+        data = data.get("jobs", data.get("results", data))
+    if isinstance(data, dict):
+        # {"<external_id>": {...}} mapping.
+        return {str(job_id): job for job_id, job in data.items() if isinstance(job, dict)}
+    return {_job_id(job): job for job in data if isinstance(job, dict) and _job_id(job)}
+
+
+def _fetch(chunk: list[str]) -> dict[str, dict] | None:
+    try:
+        if "{external_id}" in _status_url():
+            return _fetch_one(chunk[0])
+        return _fetch_many(chunk)
+    except CircuitOpen:
+        return None
+    except LOOKUP_ERRORS:
+        logger.warning("Video status lookup failed", exc_info=True, extra={"external_ids": chunk[:10]})
+        return None
+    finally:
+        connections.close_all()
+
+
+def lookup_jobs(external_ids: list[str], pool: ThreadPoolExecutor, stats: ReconcileStats) -> dict[str, dict]:
+    if not external_ids or not _status_url():
+        return {}
+    size = 1 if "{external_id}" in _status_url() else _lookup_batch_size()
+    chunks = [external_ids[start : start + size] for start in range(0, len(external_ids), size)]
+    jobs = {}
+    for chunk, found in zip(chunks, pool.map(_fetch, chunks)):
+        if found is None:
+            stats.lookup_errors += len(chunk)
+            continue
+        stats.looked_up += len(chunk)
+        jobs.update(found)
+    return jobs
+
+
+def _resolve(video: GeneratedVideo, job: dict | None, deadline: datetime, queued: set[int]) -> str | None:
+    previous = (video.status, video.video_url)
+    leader = video.coalesced_into
+    if leader is not None and leader.is_terminal:
+        video.status, video.video_url = leader.status, leader.video_url
+    elif job is not None:
+        apply_video_result(video, job)
+    if video.status in STUCK and video.created_at < deadline:
+        video.status = GeneratedVideo.STATUS_FAILED
+        return "expired"
+    if video.status in STUCK and video.pk in queued:
+        # The outbox still owns this one; its retries will settle the status.
+        return None
+    if (video.status, video.video_url) == previous:
+        return None
+    return video.status
+
+
+def _apply(changed: list[GeneratedVideo]) -> None:
+    now = timezone.now()
+    for video in changed:
+        video.updated_at = now
+    with transaction.atomic():
+        GeneratedVideo.objects.bulk_update(changed, UPDATE_FIELDS)
+        expired = [video.pk for video in changed if video.status == GeneratedVideo.STATUS_FAILED]
+        WebhookDelivery.objects.filter(
+            video_id__in=expired, status__in=[WebhookDelivery.STATUS_PENDING, WebhookDelivery.STATUS_SENDING]
+        ).update(status=WebhookDelivery.STATUS_FAILED, last_error="Délai de génération dépassé", updated_at=now)
+        ChatSession.objects.filter(pk__in={video.session_id for video in changed}).update(last_activity_at=now)
+
+    # bulk_update skips post_save, so do what the video signals would have done.
+    status_cache.invalidate_many([video.pk for video in changed])
+    for video in changed:
+        events.publish(video.session_id, "video", video.status_payload())
+        if video.coalesced_into_id is None:
+            video_cache.propagate(video)
+
+
+def reconcile(
+    stale_after: int,
+    deadline: int,
+    batch_size: int = 500,
+    concurrency: int = 8,
+    limit: int | None = None,
+    dry_run: bool = False,
+) -> ReconcileStats:
+    now = timezone.now()
+    expire_before = now - timedelta(seconds=deadline)
+    stats = ReconcileStats()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="reconcile") as pool:
+        for rows in scan_stuck(now - timedelta(seconds=stale_after), batch_size):
+            if limit is not None:
+                rows = rows[: limit - stats.scanned]
+            stats.scanned += len(rows)
+            external_ids = sorted({row.external_id for row in rows if row.external_id and not row.coalesced_into_id})
+            jobs = lookup_jobs(external_ids, pool, stats)
+            queued = set(
+                WebhookDelivery.objects.filter(
+                    video_id__in=[row.pk for row in rows],
+                    status__in=[WebhookDelivery.STATUS_PENDING, WebhookDelivery.STATUS_SENDING],
+                ).values_list("video_id", flat=True)
+            )
+
+            changed = []
+            for video in rows:
+                job = jobs.get(video.external_id) if video.external_id else None
+                outcome = _resolve(video, job, expire_before, queued)
+                if outcome is None:
+                    stats.unchanged += 1
+                    continue
+                changed.append(video)
+                stats.outcomes[outcome] = stats.outcomes.get(outcome, 0) + 1
+            if changed and not dry_run:
+                _apply(changed)
+            logger.info(
+                "Reconciled stuck videos",
+                extra={"scanned": len(rows), "changed": len(changed), "dry_run": dry_run},
+            )
+            if limit is not None and stats.scanned >= limit:
+                break
+    return stats
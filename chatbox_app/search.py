@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection
+from django.utils.html import escape
+
+from .models import GeneratedVideo, Message
+from .stemming import WORD_RE, fold, light_stem, stem_text, tokens
+
+
+FTS_TABLES = {"message": "chatbox_message_fts", "video": "chatbox_video_fts"}
+SNIPPET_WORDS = 24
+MARK_START, MARK_STOP = "\x02", "\x03"
+HEADLINE_OPTIONS = f"StartSel={MARK_START}, StopSel={MARK_STOP}, MaxWords={SNIPPET_WORDS}, MinWords=8, MaxFragments=1"
+
+
+@dataclass
+class SearchResult:
+    kind: str
+    object_id: int
+    session_id: int
+    score: float
+    snippet: str = ""
+    created_at: datetime | None = None
+    session_name: str = ""
+
+
+def _candidates() -> int:
+    return getattr(settings, "SEARCH_CANDIDATES", 2000)
+
+
+def _uses_fts5() -> bool:
+    return connection.vendor == "sqlite"
+
+
+def index_object(kind: str, object_id: int, session_id: int, text: str) -> None:
+    if not _uses_fts5():
+        # Postgres maintains its tsvector columns itself (generated columns, see migration 0010).
+        return
+    table = FTS_TABLES[kind]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [object_id])
+        cursor.execute(
+            f"INSERT INTO {table} (rowid, body, session_id) VALUES (%s, %s, %s)",
+            [object_id, stem_text(text), session_id],
+        )
+
+
+def unindex_object(kind: str, object_id: int) -> None:
+    if _uses_fts5():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLES[kind]} WHERE rowid = %s", [object_id])
+
+
+def index_many(kind: str, rows: list[tuple[int, int, str]]) -> None:
+    if not _uses_fts5() or not rows:
+        return
+    table = FTS_TABLES[kind]
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {table} WHERE rowid = %s", [(object_id,) for object_id, _, _ in rows])
+        cursor.executemany(
+            f"INSERT INTO {table} (rowid, body, session_id) VALUES (%s, %s, %s)",
+            [(object_id, stem_text(text), session_id) for object_id, session_id, text in rows],
+        )
+
+
+def unindex_many(kind: str, object_ids: list[int]) -> None:
+    if _uses_fts5() and object_ids:
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLES[kind]} WHERE rowid = %s", [(pk,) for pk in object_ids])
+
+
+def highlight(marked: str) -> str:
+    return escape(marked).replace(MARK_START, "<mark>").replace(MARK_STOP, "</mark>")
+
+
+def _match_expression(query: str) -> str:
+    stems = dict.fromkeys(stem for _, stem in tokens(query))
+    return " ".join(f'"{stem}"' for stem in stems)
+
+
+def _snippet(text: str, query: str) -> str:
+    stems = {stem for _, stem in tokens(query)}
+    words = [(match, light_stem(fold(match.group()))) for match in WORD_RE.finditer(text)]
+    first = next((index for index, (_, stem) in enumerate(words) if stem in stems), 0)
+    window = words[max(0, first - SNIPPET_WORDS // 3) :][:SNIPPET_WORDS]
+    if not window:
+        return text[:200]
+    start, end = window[0][0].start(), window[-1][0].end()
+    parts, cursor = [], start
+    for match, stem in window:
+        parts.append(text[cursor : match.start()])
+        parts.append(f"{MARK_START}{match.group()}{MARK_STOP}" if stem in stems else match.group())
+        cursor = match.end()
+    prefix = "… " if start > 0 else ""
+    suffix = " …" if end < len(text) else ""
+    return prefix + "".join(parts) + suffix
+
+
+def _fts5_search(query: str, limit: int, session_id: int | None) -> list[SearchResult]:
+    expression = _match_expression(query)
+    if not expression:
+        return []
+    selects, params = [], []
+    for kind, table in FTS_TABLES.items():
+        session_filter = " AND session_id = %s" if session_id is not None else ""
+        # Ranking every hit of a common term is what gets slow; rank only the newest candidates.
+        selects.append(
+            f"SELECT * FROM (SELECT '{kind}' AS kind, rowid AS object_id, session_id, bm25({table}) AS score "
+            f"FROM {table} WHERE {table} MATCH %s{session_filter} ORDER BY rowid DESC LIMIT %s)"
+        )
+        params += [expression, *([session_id] if session_id is not None else []), _candidates()]
+    sql = " UNION ALL ".join(selects) + " ORDER BY score LIMIT %s"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, limit])
+        # bm25() is negative, lower is better; flip it so scores read like Postgres ranks.
+        return [SearchResult(kind, object_id, sid, -score) for kind, object_id, sid, score in cursor.fetchall()]
+
+
+def _postgres_search(query: str, limit: int, session_id: int | None) -> list[SearchResult]:
+    session_filter = " AND session_id = %(session)s" if session_id is not None else ""
+    sql = f"""
+        WITH q AS (SELECT websearch_to_tsquery('french', %(query)s) AS query)
+        SELECT kind, object_id, session_id, score, ts_headline('french', body, (SELECT query FROM q), %(options)s)
+        FROM (
+            SELECT kind, object_id, session_id, body, ts_rank_cd(search_vector, (SELECT query FROM q)) AS score
+            FROM (
+                (SELECT 'message' AS kind, id AS object_id, session_id, content AS body, search_vector
+                 FROM chatbox_app_message WHERE search_vector @@ (SELECT query FROM q){session_filter}
+                 ORDER BY id DESC LIMIT %(candidates)s)
+                UNION ALL
+                (SELECT 'video' AS kind, id AS object_id, session_id, prompt AS body, search_vector
+                 FROM chatbox_app_generatedvideo WHERE search_vector @@ (SELECT query FROM q){session_filter}
+                 ORDER BY id DESC LIMIT %(candidates)s)
+            ) AS candidates
+            ORDER BY score DESC
+            LIMIT %(limit)s
+        ) AS hits
+        ORDER BY score DESC
+    """
+    params = {
+        "query": query,
+        "limit": limit,
+        "candidates": _candidates(),
+        "session": session_id,
+        "options": HEADLINE_OPTIONS,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            SearchResult(kind, object_id, sid, float(score), snippet=highlight(headline))
+            for kind, object_id, sid, score, headline in cursor.fetchall()
+        ]
+
+
+def _like_search(query: str, limit: int, session_id: int | None) -> list[SearchResult]:
+    results = []
+    for kind, model, field in (("message", Message, "content"), ("video", GeneratedVideo, "prompt")):
+        queryset = model.objects.filter(**{f"{field}__icontains": query})
+        if session_id is not None:
+            queryset = queryset.filter(session_id=session_id)
+        for object_id, sid in queryset.order_by("-pk").values_list("pk", "session_id")[:limit]:
+            results.append(SearchResult(kind, object_id, sid, 0.0))
+    return results[:limit]
+
+
+def search(query: str, limit: int = 20, session_id: int | None = None) -> list[SearchResult]:
+    if connection.vendor == "sqlite":
+        results = _fts5_search(query, limit, session_id)
+    elif connection.vendor == "postgresql":
+        results = _postgres_search(query, limit, session_id)
+    else:
+        results = _like_search(query, limit, session_id)
+
+    messages = Message.objects.select_related("session").in_bulk(
+        [result.object_id for result in results if result.kind == "message"]
+    )
+    videos = GeneratedVideo.objects.select_related("session").in_bulk(
+        [result.object_id for result in results if result.kind == "video"]
+    )
+    found = []
+    for result in results:
+        obj = (messages if result.kind == "message" else videos).get(result.object_id)
+        if obj is None:
+            continue
+        text = obj.content if result.kind == "message" else obj.prompt
+        if not result.snippet:
+            result.snippet = highlight(_snippet(text, query))
+        result.created_at = obj.created_at
+        result.session_name = obj.session.name
+        found.append(result)
+    return found
+
+
+def rebuild(batch_size: int = 2000) -> int:
+    if not _uses_fts5():
+        return 0
+    indexed = 0
+    with connection.cursor() as cursor:
+        for kind, model, field in (("message", Message, "content"), ("video", GeneratedVideo, "prompt")):
+            table = FTS_TABLES[kind]
+            cursor.execute(f"DELETE FROM {table}")
+            last_pk = 0
+            while True:
+                rows = list(
+                    model.objects.filter(pk__gt=last_pk)
+                    .order_by("pk")
+                    .values_list("pk", "session_id", field)[:batch_size]
+                )
+                if not rows:
+                    break
+                cursor.executemany(
+                    f"INSERT INTO {table} (rowid, body, session_id) VALUES (%s, %s, %s)",
+                    [(pk, stem_text(text), session_id) for pk, session_id, text in rows],
+                )
+                indexed += len(rows)
+                last_pk = rows[-1][0]
+            cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+    return indexed
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.exceptions import ImproperlyConfigured
+
+
+SHARED_BACKENDS = (RedisCache, BaseMemcachedCache, DatabaseCache)
+ATOMIC_BACKENDS = (RedisCache, BaseMemcachedCache)
+
+
+def _is_django_redis(backend) -> bool:
+    return type(backend).__module__.startswith("django_redis.")
+
+
+def is_shared(alias: str = "default") -> bool:
+    backend = caches[alias]
+    return isinstance(backend, SHARED_BACKENDS) or _is_django_redis(backend)
+
+
+def is_atomic(alias: str = "default") -> bool:
+    # add/incr run server-side here, so counters and locks hold across processes.
+    backend = caches[alias]
+    return isinstance(backend, ATOMIC_BACKENDS) or _is_django_redis(backend)
+
+
+def require_atomic(feature: str, alias: str = "default") -> None:
+    if not is_atomic(alias):
+        raise ImproperlyConfigured(
+            f"{feature} nécessite un cache partagé entre les processus (Redis ou Memcached, voir REDIS_URL) : "
+            f"le cache « {alias} » est propre à chaque processus."
+        )
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import context, events, fragments, metrics, search, status_cache, video_cache
+from .models import AttachmentBlob, ChatSession, GeneratedVideo, Message
+
+
+SESSION_COUNTERS = {Message: "message_count", GeneratedVideo: "video_count"}
+
+
+@receiver(post_save, sender=Message, dispatch_uid="chatbox_message_published")
+def publish_message(sender, instance: Message, created: bool, **kwargs) -> None:
+    if not created:
+        return
+    data = {"id": instance.pk, "sender": instance.sender}
+    transaction.on_commit(lambda: events.publish(instance.session_id, "message", data))
+
+
+@receiver(post_save, sender=Message, dispatch_uid="chatbox_message_history_recorded")
+def record_history(sender, instance: Message, created: bool, update_fields=None, **kwargs) -> None:
+    if created:
+        transaction.on_commit(lambda: context.record_message(instance))
+    elif update_fields is None or "content" in update_fields:
+        transaction.on_commit(lambda: context.forget_session(instance.session_id))
+
+
+@receiver(post_delete, sender=Message, dispatch_uid="chatbox_message_history_forgotten")
+def forget_history(sender, instance: Message, **kwargs) -> None:
+    transaction.on_commit(lambda: context.forget_session(instance.session_id))
+
+
+@receiver(post_save, sender=Message, dispatch_uid="chatbox_message_blob_acquired")
+def acquire_blob(sender, instance: Message, created: bool, **kwargs) -> None:
+    if created and instance.blob_id:
+        AttachmentBlob.objects.filter(pk=instance.blob_id).update(
+            ref_count=F("ref_count") + 1, updated_at=timezone.now()
+        )
+
+
+@receiver(post_delete, sender=Message, dispatch_uid="chatbox_message_blob_released")
+def release_blob(sender, instance: Message, **kwargs) -> None:
+    if instance.blob_id:
+        AttachmentBlob.objects.filter(pk=instance.blob_id, ref_count__gt=0).update(
+            ref_count=F("ref_count") - 1, updated_at=timezone.now()
+        )
+
+
+@receiver(post_save, sender=GeneratedVideo, dispatch_uid="chatbox_video_published")
+def publish_video(sender, instance: GeneratedVideo, **kwargs) -> None:
+    data = instance.status_payload()
+    transaction.on_commit(lambda: events.publish(instance.session_id, "video", data))
+
+
+@receiver(post_save, sender=GeneratedVideo, dispatch_uid="chatbox_video_status_cached")
+def cache_video_status(sender, instance: GeneratedVideo, **kwargs) -> None:
+    transaction.on_commit(lambda: status_cache.store(instance))
+
+
+@receiver(post_save, sender=GeneratedVideo, dispatch_uid="chatbox_video_followers_synced")
+def sync_followers(sender, instance: GeneratedVideo, created: bool, **kwargs) -> None:
+    if not created and instance.coalesced_into_id is None:
+        transaction.on_commit(lambda: video_cache.propagate(instance))
+
+
+@receiver(post_delete, sender=GeneratedVideo, dispatch_uid="chatbox_video_status_evicted")
+def evict_video_status(sender, instance: GeneratedVideo, **kwargs) -> None:
+    transaction.on_commit(lambda: status_cache.invalidate(instance.pk))
+
+
+@receiver(post_save, sender=Message, dispatch_uid="chatbox_message_session_touched")
+@receiver(post_save, sender=GeneratedVideo, dispatch_uid="chatbox_video_session_touched")
+def touch_session(sender, instance, created: bool, **kwargs) -> None:
+    if created:
+        counter = SESSION_COUNTERS[sender]
+        fragments.touch_session(instance.session_id, **{counter: F(counter) + 1})
+    else:
+        fragments.touch_session(instance.session_id)
+
+
+@receiver(post_delete, sender=Message, dispatch_uid="chatbox_message_session_released")
+@receiver(post_delete, sender=GeneratedVideo, dispatch_uid="chatbox_video_session_released")
+def release_session(sender, instance, **kwargs) -> None:
+    counter = SESSION_COUNTERS[sender]
+    fragments.touch_session(instance.session_id, **{counter: Greatest(F(counter) - 1, 0)})
+
+
+@receiver(post_save, sender=ChatSession, dispatch_uid="chatbox_session_sidebar_saved")
+@receiver(post_delete, sender=ChatSession, dispatch_uid="chatbox_session_sidebar_deleted")
+def bump_sidebar(sender, instance: ChatSession, **kwargs) -> None:
+    transaction.on_commit(fragments.bump_sidebar)
+
+
+@receiver(post_save, sender=Message, dispatch_uid="chatbox_message_indexed")
+def index_message(sender, instance: Message, created: bool, update_fields=None, **kwargs) -> None:
+    if created or update_fields is None or "content" in update_fields:
+        search.index_object("message", instance.pk, instance.session_id, instance.content)
+
+
+@receiver(post_save, sender=GeneratedVideo, dispatch_uid="chatbox_video_indexed")
+def index_video(sender, instance: GeneratedVideo, created: bool, update_fields=None, **kwargs) -> None:
+    if created or (update_fields is not None and "prompt" in update_fields):
+        search.index_object("video", instance.pk, instance.session_id, instance.prompt)
+
+
+@receiver(post_delete, sender=Message, dispatch_uid="chatbox_message_unindexed")
+def unindex_message(sender, instance: Message, **kwargs) -> None:
+    search.unindex_object("message", instance.pk)
+
+
+@receiver(post_delete, sender=GeneratedVideo, dispatch_uid="chatbox_video_unindexed")
+def unindex_video(sender, instance: GeneratedVideo, **kwargs) -> None:
+    search.unindex_object("video", instance.pk)
+
+
+@receiver(connection_created, dispatch_uid="chatbox_query_metrics")
+def track_queries(sender, connection, **kwargs) -> None:
+    metrics.install_query_tracker(connection)
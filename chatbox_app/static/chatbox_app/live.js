@@ -0,0 +1,98 @@
+(function () {
+    const TERMINAL_STATUSES = ["completed", "failed"];
+    const container = document.getElementById("chat-messages");
+
+    function updateVideo(data) {
+        const item = document.querySelector(`.timeline-item[data-video-id="${data.id}"]`);
+        if (!item) {
+            return;
+        }
+        item.dataset.videoPending = TERMINAL_STATUSES.includes(data.status) ? "false" : "true";
+
+        const icon = item.querySelector(".timeline-icon");
+        if (icon) {
+            icon.className = `timeline-icon status-${data.status}`;
+        }
+        const badge = item.querySelector(".status-badge");
+        if (badge) {
+            badge.className = `badge status-badge status-${data.status}`;
+            badge.textContent = data.status_display || data.status;
+        }
+        if (data.video_url && !item.querySelector(".video-link")) {
+            const link = document.createElement("div");
+            link.className = "mt-2 video-link";
+            const anchor = document.createElement("a");
+            anchor.href = data.video_url;
+            anchor.target = "_blank";
+            anchor.className = "btn btn-sm btn-outline-primary";
+            anchor.innerHTML = '<i class="fa-solid fa-play me-1"></i>Regarder la vidéo';
+            link.appendChild(anchor);
+            item.querySelector(".timeline-content").appendChild(link);
+        }
+    }
+
+    function lastMessageId() {
+        const bubbles = container.querySelectorAll("[data-message-id]");
+        return bubbles.length ? bubbles[bubbles.length - 1].dataset.messageId : null;
+    }
+
+    let fetchingMessages = false;
+
+    function appendNewMessages() {
+        if (fetchingMessages) {
+            return;
+        }
+        const after = lastMessageId();
+        const query = after ? `after=${after}` : "";
+        fetchingMessages = true;
+        fetch(`${container.dataset.messagesUrl}?${query}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                if (!data.messages.length) {
+                    return;
+                }
+                const emptyState = container.querySelector(".empty-state");
+                if (emptyState) {
+                    emptyState.remove();
+                }
+                const existing = new Set(
+                    Array.from(container.querySelectorAll("[data-message-id]"), node => node.dataset.messageId)
+                );
+                const fragment = document.createElement("div");
+                fragment.innerHTML = data.messages
+                    .filter(message => !existing.has(String(message.id)))
+                    .map(message => message.html)
+                    .join("");
+                container.append(...fragment.children);
+                container.scrollTop = container.scrollHeight;
+            })
+            .catch(error => console.error("Erreur de mise à jour des messages", error))
+            .finally(() => {
+                fetchingMessages = false;
+            });
+    }
+
+    window.chatboxLive = {updateVideo: updateVideo, appendNewMessages: appendNewMessages, connected: false};
+
+    if (!container || !container.dataset.eventsUrl || !("EventSource" in window)) {
+        return;
+    }
+
+    const source = new EventSource(container.dataset.eventsUrl);
+    window.chatboxLive.connected = true;
+    source.addEventListener("video", event => updateVideo(JSON.parse(event.data)));
+    source.addEventListener("message", () => appendNewMessages());
+    source.addEventListener("error", () => {
+        if (source.readyState === EventSource.CLOSED) {
+            window.chatboxLive.connected = false;
+            if (window.chatboxPolling) {
+                window.chatboxPolling.start();
+            }
+        }
+    });
+})();
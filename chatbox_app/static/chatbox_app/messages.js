@@ -0,0 +1,44 @@
+(function () {
+    const container = document.getElementById("chat-messages");
+    if (!container) {
+        return;
+    }
+
+    const messagesUrl = container.dataset.messagesUrl;
+    const pageSize = container.dataset.pageSize || 50;
+
+    function loadOlder(button) {
+        const before = button.dataset.before;
+        button.disabled = true;
+        fetch(`${messagesUrl}?before=${before}&limit=${pageSize}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                const wrapper = document.getElementById("load-older-wrapper");
+                const previousHeight = container.scrollHeight;
+                const fragment = document.createElement("div");
+                fragment.innerHTML = data.messages.map(message => message.html).join("");
+                wrapper.after(...fragment.children);
+                container.scrollTop += container.scrollHeight - previousHeight;
+                if (data.has_more && data.first_id) {
+                    button.dataset.before = data.first_id;
+                    button.disabled = false;
+                } else {
+                    wrapper.remove();
+                }
+            })
+            .catch(error => {
+                console.error("Erreur de chargement des messages", error);
+                button.disabled = false;
+            });
+    }
+
+    const loadOlderButton = document.getElementById("load-older");
+    if (loadOlderButton) {
+        loadOlderButton.addEventListener("click", () => loadOlder(loadOlderButton));
+    }
+})();
@@ -1,12 +1,19 @@
 (function () {
     const POLL_INTERVAL = 5000;
+    const TERMINAL_STATUSES = ["completed", "failed"];
 
-    function schedulePoll(videoId) {
-        setTimeout(() => pollVideoStatus(videoId), POLL_INTERVAL);
+    const pending = new Set();
+    let started = false;
+
+    function schedulePoll() {
+        setTimeout(pollVideoStatuses, POLL_INTERVAL);
     }
 
-    function pollVideoStatus(videoId) {
-        fetch(`/videos/${videoId}/status/`)
+    function pollVideoStatuses() {
+        if (!pending.size) {
+            return;
+        }
+        fetch(`/videos/status/?ids=${Array.from(pending).join(",")}`, {cache: "no-cache"})
             .then(response => {
                 if (!response.ok) {
                     throw new Error(`HTTP ${response.status}`);
@@ -14,26 +21,41 @@
                 return response.json();
             })
             .then(data => {
-                if (data.status === "completed" && data.video_url) {
-                    window.location.reload();
-                } else if (data.status === "failed") {
-                    console.error("Génération vidéo échouée", data);
-                    window.location.reload();
-                } else {
-                    schedulePoll(videoId);
-                }
+                Object.values(data.videos).forEach(video => {
+                    if (window.chatboxLive) {
+                        window.chatboxLive.updateVideo(video);
+                    }
+                    if (TERMINAL_STATUSES.includes(video.status)) {
+                        if (video.status === "failed") {
+                            console.error("Génération vidéo échouée", video);
+                        }
+                        pending.delete(String(video.id));
+                    }
+                });
+                schedulePoll();
             })
             .catch(error => {
                 console.error("Erreur de polling", error);
-                schedulePoll(videoId);
+                schedulePoll();
             });
     }
 
-    const pendingVideos = document.querySelectorAll("[data-video-pending='true']");
-    pendingVideos.forEach(node => {
-        const videoId = node.dataset.videoId;
-        if (videoId) {
-            schedulePoll(videoId);
+    function start() {
+        if (started) {
+            return;
         }
-    });
+        started = true;
+        document.querySelectorAll("[data-video-pending='true']").forEach(node => {
+            if (node.dataset.videoId) {
+                pending.add(node.dataset.videoId);
+            }
+        });
+        schedulePoll();
+    }
+
+    window.chatboxPolling = {start: start};
+
+    if (!window.chatboxLive || !window.chatboxLive.connected) {
+        start();
+    }
 })();
@@ -0,0 +1,136 @@
+(function () {
+    const form = document.getElementById("message-form");
+    const container = document.getElementById("chat-messages");
+    if (!form || !container || !form.dataset.streamUrl || !window.ReadableStream || !window.TextDecoder) {
+        return;
+    }
+
+    function insertHtml(html, placeholder) {
+        const fragment = document.createElement("div");
+        fragment.innerHTML = html;
+        const node = fragment.firstElementChild;
+        if (!node) {
+            return;
+        }
+        if (container.querySelector(`[data-message-id="${node.dataset.messageId}"]`)) {
+            if (placeholder) {
+                placeholder.remove();
+            }
+            return;
+        }
+        if (placeholder) {
+            placeholder.replaceWith(node);
+        } else {
+            container.appendChild(node);
+        }
+        container.scrollTop = container.scrollHeight;
+    }
+
+    function createPlaceholder() {
+        const bubble = document.createElement("div");
+        bubble.className = "chat-bubble chat-bubble-assistant";
+        const content = document.createElement("div");
+        content.className = "bubble-content";
+        bubble.appendChild(content);
+        container.appendChild(bubble);
+        return bubble;
+    }
+
+    function handleEvent(name, data, state) {
+        if (name === "message") {
+            const emptyState = container.querySelector(".empty-state");
+            if (emptyState) {
+                emptyState.remove();
+            }
+            insertHtml(data.html);
+        } else if (name === "delta") {
+            if (!state.placeholder) {
+                state.placeholder = createPlaceholder();
+            }
+            state.placeholder.querySelector(".bubble-content").textContent += data.text;
+            container.scrollTop = container.scrollHeight;
+        } else if (name === "done") {
+            if (data.html) {
+                insertHtml(data.html, state.placeholder);
+            } else if (state.placeholder) {
+                state.placeholder.remove();
+            }
+            state.placeholder = null;
+        } else if (name === "error") {
+            console.error("Réponse IA interrompue", data.message);
+            if (state.placeholder) {
+                state.placeholder.classList.add("opacity-50");
+            }
+        }
+    }
+
+    function parseEvents(buffer, state) {
+        const blocks = buffer.split("\n\n");
+        const rest = blocks.pop();
+        blocks.forEach(block => {
+            let name = "message";
+            const dataLines = [];
+            block.split("\n").forEach(line => {
+                if (line.startsWith("event:")) {
+                    name = line.slice(6).trim();
+                } else if (line.startsWith("data:")) {
+                    dataLines.push(line.slice(5).trim());
+                }
+            });
+            if (dataLines.length) {
+                handleEvent(name, JSON.parse(dataLines.join("\n")), state);
+            }
+        });
+        return rest;
+    }
+
+    let controller = null;
+
+    form.addEventListener("submit", event => {
+        event.preventDefault();
+        if (controller) {
+            controller.abort();
+        }
+        controller = new AbortController();
+        const submitButton = form.querySelector("[type=submit]");
+        const body = new FormData(form);
+        const state = {placeholder: null};
+        submitButton.disabled = true;
+
+        fetch(form.dataset.streamUrl, {method: "POST", body: body, signal: controller.signal})
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                form.reset();
+                submitButton.disabled = false;
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = "";
+                function read() {
+                    return reader.read().then(({done, value}) => {
+                        if (done) {
+                            return;
+                        }
+                        buffer = parseEvents(buffer + decoder.decode(value, {stream: true}), state);
+                        return read();
+                    });
+                }
+                return read();
+            })
+            .catch(error => {
+                if (error.name !== "AbortError") {
+                    console.error("Erreur d'envoi du message", error);
+                }
+            })
+            .finally(() => {
+                submitButton.disabled = false;
+            });
+    });
+
+    window.addEventListener("beforeunload", () => {
+        if (controller) {
+            controller.abort();
+        }
+    });
+})();
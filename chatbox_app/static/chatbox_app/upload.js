@@ -0,0 +1,133 @@
+(function () {
+    const form = document.getElementById("message-form");
+    const container = document.getElementById("chat-messages");
+    if (!form || !form.dataset.uploadUrl || !window.fetch || !window.Blob) {
+        return;
+    }
+
+    const threshold = parseInt(form.dataset.uploadThreshold || "0", 10);
+    const fileInput = form.querySelector("input[type=file]");
+    const csrfToken = form.querySelector("[name=csrfmiddlewaretoken]").value;
+    const maxRetries = 5;
+
+    function storageKey(file) {
+        return `chatbox-upload:${form.dataset.uploadUrl}:${file.name}:${file.size}:${file.lastModified}`;
+    }
+
+    function request(url, options) {
+        const headers = Object.assign({"X-CSRFToken": csrfToken}, options.headers || {});
+        return fetch(url, Object.assign({}, options, {headers: headers})).then(response =>
+            response.json().then(data => ({response: response, data: data}))
+        );
+    }
+
+    function startUpload(file) {
+        const saved = window.localStorage && localStorage.getItem(storageKey(file));
+        if (saved) {
+            return request(saved, {method: "GET"}).then(({response, data}) =>
+                response.ok ? data : createUpload(file)
+            );
+        }
+        return createUpload(file);
+    }
+
+    function createUpload(file) {
+        const body = new FormData();
+        body.append("filename", file.name);
+        body.append("size", file.size);
+        return request(form.dataset.uploadUrl, {method: "POST", body: body}).then(({response, data}) => {
+            if (!response.ok) {
+                throw new Error(data.error || `HTTP ${response.status}`);
+            }
+            if (window.localStorage) {
+                localStorage.setItem(storageKey(file), data.upload_url);
+            }
+            return data;
+        });
+    }
+
+    function sendChunks(file, upload, attempt) {
+        if (upload.offset >= file.size) {
+            return Promise.resolve(upload);
+        }
+        const start = upload.offset;
+        const end = Math.min(start + upload.chunk_size, file.size);
+        return request(upload.upload_url, {
+            method: "PUT",
+            body: file.slice(start, end),
+            headers: {"Content-Range": `bytes ${start}-${end - 1}/${file.size}`},
+        })
+            .then(({response, data}) => {
+                if (response.ok) {
+                    form.dispatchEvent(new CustomEvent("chatbox:upload-progress", {detail: data}));
+                    return sendChunks(file, data, 0);
+                }
+                if (response.status === 409 && data.offset !== undefined) {
+                    return sendChunks(file, Object.assign(upload, {offset: data.offset}), attempt);
+                }
+                const error = new Error(data.error || `HTTP ${response.status}`);
+                error.fatal = response.status < 500;
+                throw error;
+            })
+            .catch(error => {
+                if (error.fatal || attempt >= maxRetries) {
+                    throw error;
+                }
+                const delay = Math.min(1000 * 2 ** attempt, 15000);
+                return new Promise(resolve => setTimeout(resolve, delay))
+                    .then(() => request(upload.upload_url, {method: "GET"}))
+                    .then(({data}) => sendChunks(file, Object.assign(upload, {offset: data.offset}), attempt + 1));
+            });
+    }
+
+    function completeUpload(file, upload) {
+        const body = new FormData();
+        body.append("content", form.querySelector("[name=content]").value);
+        return request(upload.complete_url, {method: "POST", body: body}).then(({response, data}) => {
+            if (!response.ok) {
+                throw new Error(data.error || `HTTP ${response.status}`);
+            }
+            if (window.localStorage) {
+                localStorage.removeItem(storageKey(file));
+            }
+            return data;
+        });
+    }
+
+    form.addEventListener(
+        "submit",
+        event => {
+            const file = fileInput && fileInput.files[0];
+            if (!file || file.size <= threshold) {
+                return;
+            }
+            event.preventDefault();
+            event.stopImmediatePropagation();
+            const submitButton = form.querySelector("[type=submit]");
+            submitButton.disabled = true;
+
+            startUpload(file)
+                .then(upload => sendChunks(file, upload, 0))
+                .then(upload => completeUpload(file, upload))
+                .then(data => {
+                    form.reset();
+                    if (container && !container.querySelector(`[data-message-id="${data.message_id}"]`)) {
+                        const emptyState = container.querySelector(".empty-state");
+                        if (emptyState) {
+                            emptyState.remove();
+                        }
+                        container.insertAdjacentHTML("beforeend", data.html);
+                        container.scrollTop = container.scrollHeight;
+                    }
+                })
+                .catch(error => {
+                    console.error("Erreur de téléversement", error);
+                    window.alert(`Téléversement interrompu : ${error.message}`);
+                })
+                .finally(() => {
+                    submitButton.disabled = false;
+                });
+        },
+        true
+    );
+})();
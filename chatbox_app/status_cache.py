@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import GeneratedVideo
+from .shared_cache import is_shared
+
+
+def _key(video_id: int) -> str:
+    return f"chatbox:video-status:{video_id}"
+
+
+def _timeout() -> int:
+    return getattr(settings, "VIDEO_STATUS_CACHE_TIMEOUT", 3600)
+
+
+def enabled() -> bool:
+    # Entries are refreshed by the process that saves the video; a per-process cache would serve stale statuses.
+    return bool(_timeout()) and is_shared()
+
+
+def compute_etag(payload) -> str:
+    digest = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _entry(video: GeneratedVideo) -> dict:
+    payload = video.status_payload()
+    return {"payload": payload, "etag": compute_etag(payload)}
+
+
+def store(video: GeneratedVideo) -> dict:
+    entry = _entry(video)
+    if enabled():
+        cache.set(_key(video.pk), entry, _timeout())
+    return entry
+
+
+def invalidate(video_id: int) -> None:
+    if enabled():
+        cache.delete(_key(video_id))
+
+
+def invalidate_many(video_ids: list[int]) -> None:
+    if enabled() and video_ids:
+        cache.delete_many([_key(video_id) for video_id in video_ids])
+
+
+def get_entry(video_id: int) -> dict | None:
+    entry = cache.get(_key(video_id)) if enabled() else None
+    if entry is not None:
+        return entry
+    video = GeneratedVideo.objects.filter(pk=video_id).first()
+    if video is None:
+        return None
+    return store(video)
+
+
+async def aget_entry(video_id: int) -> dict | None:
+    if not enabled():
+        video = await GeneratedVideo.objects.filter(pk=video_id).afirst()
+        return None if video is None else _entry(video)
+    entry = await cache.aget(_key(video_id))
+    if entry is not None:
+        return entry
+    video = await GeneratedVideo.objects.filter(pk=video_id).afirst()
+    if video is None:
+        return None
+    entry = _entry(video)
+    await cache.aset(_key(video_id), entry, _timeout())
+    return entry
+
+
+def get_entries(video_ids: list[int]) -> dict[int, dict]:
+    if not enabled():
+        return {video.pk: _entry(video) for video in GeneratedVideo.objects.filter(pk__in=video_ids)}
+    cached = cache.get_many([_key(video_id) for video_id in video_ids])
+    entries = {}
+    missing = []
+    for video_id in video_ids:
+        entry = cached.get(_key(video_id))
+        if entry is None:
+            missing.append(video_id)
+        else:
+            entries[video_id] = entry
+    if missing:
+        fresh = {video.pk: _entry(video) for video in GeneratedVideo.objects.filter(pk__in=missing)}
+        cache.set_many({_key(video_id): entry for video_id, entry in fresh.items()}, _timeout())
+        entries.update(fresh)
+    return entries
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Iterator
+
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+STOP_WORDS = frozenset(
+    """
+    a au aux avec ce ces dans de des du elle en et eux il ils je la le les leur lui ma mais me meme mes moi
+    mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une vos
+    votre vous c d j l m n s t y est sont ete etre avoir
+    """.split()
+)
+
+
+def fold(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def light_stem(word: str) -> str:
+    # Inflection-only French stemmer: plurals, feminine forms and regular verb/adverb endings.
+    if len(word) < 5 or word.isdigit():
+        return word
+    if word.endswith("aux"):
+        return word[:-3] + "al"
+    if word[-1] in "sx":
+        word = word[:-1]
+    for suffix, replacement in (("euse", "eu"), ("ive", "if"), ("elle", "el"), ("enne", "en"), ("ement", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            word = word[: -len(suffix)] + replacement
+            break
+    for suffix in ("ee", "er", "ez", "e"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[: -len(suffix)]
+    return word
+
+
+def tokens(text: str) -> Iterator[tuple[re.Match, str]]:
+    for match in WORD_RE.finditer(text):
+        word = fold(match.group())
+        if word not in STOP_WORDS:
+            yield match, light_stem(word)
+
+
+def stem_text(text: str) -> str:
+    return " ".join(stem for _, stem in tokens(text))
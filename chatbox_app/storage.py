@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, storages
+
+
+BLOB_PREFIX = "blobs"
+HASH_BLOCK = 64 * 1024
+
+
+def blob_name(sha256: str, content_type: str) -> str:
+    extension = mimetypes.guess_extension(content_type) or ""
+    return f"{BLOB_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+
+def hash_file(fileobj) -> tuple[str, int]:
+    hasher = hashlib.sha256()
+    size = 0
+    if hasattr(fileobj, "chunks"):
+        blocks = fileobj.chunks(HASH_BLOCK)
+    else:
+        fileobj.seek(0)
+        blocks = iter(lambda: fileobj.read(HASH_BLOCK), b"")
+    for block in blocks:
+        hasher.update(block)
+        size += len(block)
+    fileobj.seek(0)
+    return hasher.hexdigest(), size
+
+
+class BlobStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            return name
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        # Identical names mean identical content, so concurrent writers may safely race on os.replace.
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".blob-")
+        try:
+            if hasattr(content, "temporary_file_path"):
+                os.close(fd)
+                file_move_safe(content.temporary_file_path(), temp_path, allow_overwrite=True)
+            else:
+                with os.fdopen(fd, "wb") as handle:
+                    for chunk in content.chunks():
+                        handle.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return name
+
+
+def blob_storage():
+    return storages["blobs"]
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from chatbox_app import archive, search, uploads
+from chatbox_app.models import AttachmentBlob, AttachmentUpload, ChatSession, GeneratedVideo, Message, SessionArchive
+from .utils import TempMediaMixin
+
+
+INACTIVE_FOR = 90 * 24 * 3600
+
+
+@override_settings(ARCHIVE_COMPRESSION="gzip")
+class ArchiveRoundTripTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.session = self._session("Ancienne")
+        self.blob = AttachmentBlob.objects.store(
+            ContentFile(b"%PDF-1.4 rapport", name="rapport.pdf"), content_type="application/pdf"
+        )
+        self.texts = [
+            Message.objects.create(session=self.session, content="Bonjour l'archive"),
+            Message.objects.create(session=self.session, sender=Message.ASSISTANT, content="Réponse"),
+        ]
+        self.with_blob = Message.objects.create(
+            session=self.session, content="Rapport", attachment=self.blob.file.name, blob=self.blob
+        )
+        self.file_name = default_storage.save("uploads/legacy/note.txt", ContentFile(b"note"))
+        self.with_file = Message.objects.create(session=self.session, content="Note", attachment=self.file_name)
+        self.video = GeneratedVideo.objects.create(
+            session=self.session,
+            prompt="Un phare",
+            status=GeneratedVideo.STATUS_COMPLETED,
+            video_url="https://cdn.example.test/phare.mp4",
+        )
+        self._age(self.session)
+
+    def _session(self, name: str) -> ChatSession:
+        return ChatSession.objects.create(name=name)
+
+    def _age(self, session: ChatSession) -> None:
+        ChatSession.objects.filter(pk=session.pk).update(last_activity_at=timezone.now() - timedelta(days=200))
+
+    def _archive(self, **options) -> archive.ArchiveStats:
+        with self.captureOnCommitCallbacks(execute=True):
+            return archive.archive_inactive(INACTIVE_FOR, **options)
+
+    def _rehydrate(self, session: ChatSession) -> bool:
+        session.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            return archive.rehydrate(session)
+
+    def test_archive_then_restore(self):
+        message_ids = sorted(Message.objects.filter(session=self.session).values_list("pk", flat=True))
+        stats = self._archive()
+
+        self.assertEqual((stats.sessions, stats.messages, stats.videos, stats.attachments), (1, 4, 1, 2))
+        self.session.refresh_from_db()
+        self.assertIsNotNone(self.session.archived_at)
+        self.assertFalse(Message.objects.filter(session=self.session).exists())
+        self.assertFalse(GeneratedVideo.objects.filter(session=self.session).exists())
+        self.assertFalse(default_storage.exists(self.file_name))
+        self.blob.refresh_from_db()
+        self.assertEqual(self.blob.ref_count, 0)
+        segment = SessionArchive.objects.get(session=self.session).segment
+        self.assertTrue(segment.endswith(".jsonl.gz"))
+        self.assertEqual(search.search("archive"), [])
+
+        self.assertTrue(self._rehydrate(self.session))
+
+        self.session.refresh_from_db()
+        self.assertIsNone(self.session.archived_at)
+        restored = Message.objects.filter(session=self.session).order_by("pk")
+        self.assertEqual(sorted(message.pk for message in restored), message_ids)
+        self.assertEqual(restored.get(pk=self.texts[0].pk).content, "Bonjour l'archive")
+        self.assertEqual(restored.get(pk=self.with_blob.pk).blob_id, self.blob.pk)
+        self.blob.refresh_from_db()
+        self.assertEqual(self.blob.ref_count, 1)
+        with default_storage.open(restored.get(pk=self.with_file.pk).attachment.name) as handle:
+            self.assertEqual(handle.read(), b"note")
+        video = GeneratedVideo.objects.get(pk=self.video.pk)
+        self.assertEqual(video.video_url, "https://cdn.example.test/phare.mp4")
+        self.assertFalse(SessionArchive.objects.exists())
+        self.assertFalse(archive.archive_storage().exists(segment))
+        hits = [(hit.kind, hit.object_id) for hit in search.search("archive")]
+        self.assertEqual(hits, [("message", self.texts[0].pk)])
+
+    def test_shared_segment_outlives_first_restore(self):
+        other = self._session("Autre")
+        Message.objects.create(session=other, content="Autre message")
+        self._age(other)
+        self._archive()
+        segment = SessionArchive.objects.get(session=self.session).segment
+        self.assertEqual(SessionArchive.objects.get(session=other).segment, segment)
+
+        self._rehydrate(other)
+        self.assertTrue(archive.archive_storage().exists(segment))
+        self.assertEqual(Message.objects.get(session=other).content, "Autre message")
+        self._rehydrate(self.session)
+        self.assertFalse(archive.archive_storage().exists(segment))
+
+    def test_busy_and_recent_sessions_stay_hot(self):
+        GeneratedVideo.objects.create(session=self.session, prompt="En cours")
+        self._age(self.session)
+        self._session("Récente")
+
+        stats = self._archive()
+
+        self.assertEqual((stats.sessions, stats.skipped), (0, 1))
+        self.assertFalse(SessionArchive.objects.exists())
+
+    def test_uploads_hold_a_session_until_they_expire(self):
+        upload = uploads.start_upload(self.session.pk, "gros.bin", 1024)
+        self._age(self.session)
+        self.assertEqual(self._archive().sessions, 0)
+
+        AttachmentUpload.objects.filter(pk=upload.pk).update(updated_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(self._archive().sessions, 1)
+        self.assertFalse(AttachmentUpload.objects.filter(pk=upload.pk).exists())
+        self.assertFalse(uploads.partial_path(upload).exists())
+
+    def test_session_written_during_archival_stays_hot(self):
+        write_frame = archive._write_frame
+
+        def write_then_reply(handle, codec, session, frozen):
+            entry = write_frame(handle, codec, session, frozen)
+            Message.objects.create(session=session, content="Toujours là ?")
+            return entry
+
+        with mock.patch.object(archive, "_write_frame", side_effect=write_then_reply):
+            stats = self._archive()
+
+        self.assertEqual((stats.sessions, stats.skipped, stats.segments), (0, 1, 0))
+        self.session.refresh_from_db()
+        self.assertIsNone(self.session.archived_at)
+        self.assertEqual(Message.objects.filter(session=self.session).count(), 5)
+        self.assertTrue(default_storage.exists(self.file_name))
+        self.assertFalse(SessionArchive.objects.exists())
+        frozen = [path for path in self.archive_root.rglob("*") if path.is_file()]
+        self.assertEqual([path.parts[len(self.archive_root.parts)] for path in frozen], ["attachments"])
+
+    def test_dry_run_changes_nothing(self):
+        stats = self._archive(dry_run=True)
+        self.assertEqual((stats.sessions, stats.messages), (1, 4))
+        self.assertFalse(SessionArchive.objects.exists())
+        self.assertEqual(Message.objects.filter(session=self.session).count(), 4)
+
+    def test_opening_archived_session_restores_it(self):
+        self._archive()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(reverse("chatbox_app:chat_session", args=[self.session.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Bonjour l&#x27;archive")
+        self.assertFalse(SessionArchive.objects.exists())
+
+    def test_command_archives_and_restores(self):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("archive_sessions", stdout=out)
+        self.assertIn("1 session(s) archivée(s)", out.getvalue())
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("archive_sessions", restore=[self.session.pk], stdout=out)
+        self.assertIn("1 session(s) restaurée(s)", out.getvalue())
+
+
+@override_settings(ARCHIVE_COMPRESSION="gzip")
+class ConcurrentRehydrateTests(TempMediaMixin, TransactionTestCase):
+    # Both opens run on their own connections, so the archive must really be committed.
+    def setUp(self):
+        super().setUp()
+        self.session = ChatSession.objects.create(name="Très demandée")
+        for content in ("Un", "Deux", "Trois"):
+            Message.objects.create(session=self.session, content=content)
+        ChatSession.objects.filter(pk=self.session.pk).update(last_activity_at=timezone.now() - timedelta(days=200))
+        archive.archive_inactive(INACTIVE_FOR)
+
+    def test_concurrent_opens_restore_once(self):
+        read_frame = archive.read_frame
+        barrier = threading.Barrier(2)
+        results, errors = [], []
+
+        def slow_read(entry):
+            # Keep the first restore's transaction open while the second one arrives.
+            time.sleep(0.1)
+            return read_frame(entry)
+
+        def open_session(session):
+            try:
+                barrier.wait()
+                results.append(archive.rehydrate(session))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        with mock.patch.object(archive, "read_frame", side_effect=slow_read):
+            sessions = [ChatSession.objects.get(pk=self.session.pk) for _ in range(2)]
+            threads = [threading.Thread(target=open_session, args=(session,)) for session in sessions]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(results), [False, True])
+        self.assertEqual(
+            sorted(Message.objects.filter(session=self.session).values_list("content", flat=True)),
+            ["Deux", "Trois", "Un"],
+        )
+        self.assertFalse(SessionArchive.objects.exists())
+        self.assertIsNone(ChatSession.objects.get(pk=self.session.pk).archived_at)
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+import httpx
+
+from chatbox_app import events, http_client, views
+from chatbox_app.asgi import DisconnectMiddleware
+from chatbox_app.models import ChatSession, GeneratedVideo, Message
+from chatbox_app.webhooks import message_breaker
+
+
+class FakeClient:
+    # Sends the request, then disconnects once `after` body chunks have been received.
+    def __init__(self, after: int, body: bytes = b"") -> None:
+        self.after = after
+        self.request_body = body
+        self.sent: list[dict] = []
+        self._requested = False
+        self._gone = asyncio.Event()
+
+    async def receive(self) -> dict:
+        if not self._requested:
+            self._requested = True
+            return {"type": "http.request", "body": self.request_body, "more_body": False}
+        await self._gone.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message: dict) -> None:
+        self.sent.append(message)
+        if sum(item["type"] == "http.response.body" for item in self.sent) >= self.after:
+            self._gone.set()
+
+    def body(self) -> str:
+        return b"".join(item.get("body", b"") for item in self.sent).decode()
+
+
+def http_scope(path: str, method: str = "GET", headers: list[tuple[bytes, bytes]] | None = None) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"testserver"), *(headers or [])],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+
+
+class DisconnectMiddlewareTests(SimpleTestCase):
+    async def test_endless_stream_is_cancelled(self):
+        closed = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await receive()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            try:
+                while True:
+                    await send({"type": "http.response.body", "body": b"tick", "more_body": True})
+                    await asyncio.sleep(0.01)
+            finally:
+                closed.set()
+
+        client = FakeClient(after=3)
+        await asyncio.wait_for(DisconnectMiddleware(app)(http_scope("/"), client.receive, client.send), 2)
+        self.assertTrue(closed.is_set())
+
+    async def test_view_still_computing_is_left_to_finish(self):
+        client = FakeClient(after=0)
+
+        async def app(scope, receive, send):
+            await receive()
+            await asyncio.sleep(0.05)
+            await send({"type": "http.response.start", "status": 201, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        await asyncio.wait_for(DisconnectMiddleware(app)(http_scope("/"), client.receive, client.send), 2)
+        self.assertEqual(client.sent[0]["status"], 201)
+
+    async def test_errors_propagate(self):
+        async def app(scope, receive, send):
+            raise RuntimeError("boom")
+
+        client = FakeClient(after=1)
+        with self.assertRaises(RuntimeError):
+            await DisconnectMiddleware(app)(http_scope("/"), client.receive, client.send)
+
+
+@override_settings(CHAT_EVENTS_BACKEND="memory", CHAT_EVENTS_KEEPALIVE=0.02, CHAT_EVENTS_MAX_DURATION=300)
+class SessionEventDisconnectTests(TestCase):
+    def setUp(self):
+        self.session = ChatSession.objects.create(name="Onglet fermé")
+        GeneratedVideo.objects.create(session=self.session, prompt="Un chat")
+        events._broker = None
+        self.addCleanup(setattr, events, "_broker", None)
+        # Like the test client: keep the test transaction's connection open across requests.
+        for signal in (request_started, request_finished):
+            signal.disconnect(close_old_connections)
+            self.addCleanup(signal.connect, close_old_connections)
+
+    async def test_stream_ends_when_client_disconnects(self):
+        client = FakeClient(after=4)
+        application = DisconnectMiddleware(ASGIHandler())
+        path = reverse("chatbox_app:session_events", args=[self.session.pk])
+
+        await asyncio.wait_for(application(http_scope(path), client.receive, client.send), 5)
+
+        self.assertEqual(client.sent[0]["status"], 200)
+        self.assertIn("event: video", client.body())
+        self.assertEqual(events.get_broker()._subscribers, {})
+
+    @override_settings(CHAT_EVENTS_MAX_DURATION=0.05)
+    async def test_stream_closes_after_max_duration(self):
+        chunks = [chunk async for chunk in views._session_event_stream(self.session.pk)]
+        self.assertEqual(chunks[0], "retry: 3000\n\n")
+        self.assertEqual(chunks[-1], ": keepalive\n\n")
+        self.assertEqual(events.get_broker()._subscribers, {})
+
+
+class EndlessReply(httpx.AsyncByteStream):
+    def __init__(self) -> None:
+        self.closed = asyncio.Event()
+
+    async def __aiter__(self):
+        while True:
+            yield "mot ".encode()
+            await asyncio.sleep(0.01)
+
+    async def aclose(self) -> None:
+        self.closed.set()
+
+
+@override_settings(
+    AI_MESSAGE_WEBHOOK_URL="https://ai.example.test/message",
+    RATE_LIMIT_ENABLED=False,
+    UPSTREAM_MAX_INFLIGHT=0,
+    CONVERSATION_CONTEXT_ENABLED=False,
+    AI_CALLBACK_SECRET="",
+)
+class StreamReplyDisconnectTests(TestCase):
+    def setUp(self):
+        self.session = ChatSession.objects.create(name="Réponse abandonnée")
+        for signal in (request_started, request_finished):
+            signal.disconnect(close_old_connections)
+            self.addCleanup(signal.connect, close_old_connections)
+
+    async def test_upstream_is_closed_when_client_disconnects(self):
+        reply = EndlessReply()
+        transport = httpx.MockTransport(
+            lambda request: httpx.Response(200, headers={"Content-Type": "text/plain"}, stream=reply)
+        )
+        loop = asyncio.get_running_loop()
+        http_client._async_clients[loop] = httpx.AsyncClient(transport=transport)
+        self.addCleanup(http_client._async_clients.pop, loop, None)
+
+        token = b"a" * 32
+        headers = [
+            (b"content-type", b"application/x-www-form-urlencoded"),
+            (b"cookie", b"csrftoken=" + token),
+            (b"x-csrftoken", token),
+        ]
+        path = reverse("chatbox_app:stream_reply", args=[self.session.pk])
+        client = FakeClient(after=5, body=b"content=Bonjour")
+        application = DisconnectMiddleware(ASGIHandler())
+
+        await asyncio.wait_for(application(http_scope(path, "POST", headers), client.receive, client.send), 5)
+
+        self.assertEqual(client.sent[0]["status"], 200)
+        self.assertIn("event: delta", client.body())
+        self.assertTrue(reply.closed.is_set())
+        self.assertFalse(await Message.objects.filter(sender=Message.ASSISTANT).aexists())
+        snapshot = await sync_to_async(message_breaker.snapshot)()
+        self.assertEqual((snapshot["state"], snapshot["failures"]), ("closed", 0))
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from chatbox_app.models import ChatSession, GeneratedVideo, Message, WebhookDelivery
+from .utils import TempMediaMixin
+
+
+@override_settings(
+    AI_MESSAGE_WEBHOOK_URL="https://ai.example.test/message",
+    AI_VIDEO_API_URL="https://ai.example.test/video",
+    RATE_LIMIT_ENABLED=False,
+    CONVERSATION_CONTEXT_ENABLED=False,
+)
+class ChatSessionViewTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.session = ChatSession.objects.create(name="Async")
+        self.url = reverse("chatbox_app:chat_session", args=[self.session.pk])
+
+    async def test_page_renders(self):
+        await Message.objects.acreate(session=self.session, content="Bonjour tout le monde")
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Bonjour tout le monde")
+
+    async def test_unknown_session(self):
+        response = await self.async_client.get(reverse("chatbox_app:chat_session", args=[999]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_send_message_enqueues_delivery(self):
+        response = await self.async_client.post(self.url, {"action": "send_message", "content": "Salut"})
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        message = await Message.objects.aget(session=self.session)
+        delivery = await WebhookDelivery.objects.aget(message=message)
+        self.assertEqual(delivery.payload["content"], "Salut")
+
+    async def test_generate_video_enqueues_delivery(self):
+        response = await self.async_client.post(self.url, {"action": "generate_video", "prompt": "Un chat qui danse"})
+        self.assertEqual(response.status_code, 302)
+        video = await GeneratedVideo.objects.aget(session=self.session)
+        self.assertTrue(await WebhookDelivery.objects.filter(video=video).aexists())
+
+    async def test_invalid_video_form_rerenders(self):
+        response = await self.async_client.post(self.url, {"action": "generate_video", "prompt": ""})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(await GeneratedVideo.objects.aexists())
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+import requests
+
+from chatbox_app import outbox, webhooks
+from chatbox_app.models import ChatSession, Message, WebhookDelivery
+from chatbox_app.webhooks import BatchItemError, split_batch_response
+
+
+class SplitBatchResponseTests(SimpleTestCase):
+    def test_maps_results_by_message_id(self):
+        data = {"results": [{"message_id": 2, "reply": "b"}, {"message_id": 1, "reply": "a"}]}
+        results = split_batch_response(data, [1, 2])
+        self.assertEqual(results[1]["reply"], "a")
+        self.assertEqual(results[2]["reply"], "b")
+
+    def test_falls_back_to_request_order(self):
+        results = split_batch_response([{"reply": "a"}, {"reply": "b"}], [7, 8])
+        self.assertEqual([results[7]["reply"], results[8]["reply"]], ["a", "b"])
+
+    def test_missing_and_failed_items_are_isolated(self):
+        data = [{"message_id": 1, "reply": "a"}, {"message_id": 2, "error": "quota", "retryable": False}]
+        results = split_batch_response(data, [1, 2, 3])
+        self.assertEqual(results[1]["reply"], "a")
+        self.assertIsInstance(results[2], BatchItemError)
+        self.assertFalse(results[2].retryable)
+        self.assertIsInstance(results[3], BatchItemError)
+        self.assertTrue(results[3].retryable)
+
+    def test_rejects_non_array_response(self):
+        with self.assertRaises(ValueError):
+            split_batch_response({"reply": "a"}, [1])
+
+
+@override_settings(AI_MESSAGE_BATCH_SIZE=3, AI_MESSAGE_BATCH_WINDOW_MS=50, AI_MESSAGE_WEBHOOK_METHOD="POST")
+class MessageBatcherTests(SimpleTestCase):
+    def _deliveries(self, kind: str, count: int) -> list[WebhookDelivery]:
+        return [WebhookDelivery(kind=kind, payload={}) for _ in range(count)]
+
+    def test_full_batches_leave_at_once(self):
+        batcher = outbox.MessageBatcher()
+        self.assertEqual(batcher.add(self._deliveries(WebhookDelivery.KIND_MESSAGE, 4)), [])
+        self.assertEqual([len(batch) for batch in batcher.ready()], [3])
+        self.assertEqual(len(batcher), 1)
+        self.assertEqual([len(batch) for batch in batcher.ready(flush=True)], [1])
+
+    def test_window_flushes_partial_batch(self):
+        batcher = outbox.MessageBatcher(window_ms=50)
+        with mock.patch("chatbox_app.outbox.time.monotonic", return_value=100.0):
+            batcher.add(self._deliveries(WebhookDelivery.KIND_MESSAGE, 2))
+            self.assertEqual(batcher.ready(), [])
+            self.assertAlmostEqual(batcher.wait_time(1.0), 0.05)
+        with mock.patch("chatbox_app.outbox.time.monotonic", return_value=100.06):
+            self.assertEqual([len(batch) for batch in batcher.ready()], [2])
+
+    def test_videos_are_never_batched(self):
+        videos = self._deliveries(WebhookDelivery.KIND_VIDEO, 2)
+        self.assertEqual(outbox.MessageBatcher().add(videos), videos)
+
+    @override_settings(AI_MESSAGE_WEBHOOK_METHOD="GET")
+    def test_disabled_for_get_webhooks(self):
+        deliveries = self._deliveries(WebhookDelivery.KIND_MESSAGE, 2)
+        self.assertEqual(outbox.MessageBatcher().add(deliveries), deliveries)
+
+
+@override_settings(
+    AI_MESSAGE_WEBHOOK_URL="https://ai.example.test/message",
+    AI_MESSAGE_BATCH_SIZE=3,
+    WEBHOOK_MAX_ATTEMPTS=3,
+    UPSTREAM_MAX_INFLIGHT=0,
+    CONVERSATION_CONTEXT_ENABLED=False,
+)
+class ProcessBatchTests(TestCase):
+    def setUp(self):
+        session = ChatSession.objects.create(name="Lot")
+        for content in ("un", "deux", "trois"):
+            message = Message.objects.create(session=session, content=content)
+            WebhookDelivery.objects.create(
+                kind=WebhookDelivery.KIND_MESSAGE, message=message, payload={"message_id": message.pk}
+            )
+        self.deliveries = outbox.claim_deliveries(3)
+        self.ids = [delivery.message_id for delivery in self.deliveries]
+
+    def test_sends_one_request_and_isolates_failures(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = [
+            {"message_id": self.ids[0], "reply": "Réponse un"},
+            {"message_id": self.ids[1], "error": "timeout"},
+            {"message_id": self.ids[2], "error": "refusé", "retryable": False},
+        ]
+        with mock.patch.object(webhooks.http_client, "request", return_value=response) as request:
+            outcomes = outbox.process_batch(self.deliveries)
+
+        request.assert_called_once()
+        self.assertEqual(len(request.call_args.kwargs["json"]), 3)
+        self.assertEqual(outcomes, [True, False, False])
+        statuses = dict(WebhookDelivery.objects.values_list("message_id", "status"))
+        self.assertEqual(
+            [statuses[message_id] for message_id in self.ids],
+            [WebhookDelivery.STATUS_DELIVERED, WebhookDelivery.STATUS_PENDING, WebhookDelivery.STATUS_FAILED],
+        )
+        reply = Message.objects.get(sender=Message.ASSISTANT)
+        self.assertEqual(reply.content, "Réponse un")
+
+    def test_transport_error_retries_every_delivery(self):
+        error = requests.ConnectionError("connexion refusée")
+        with mock.patch.object(outbox, "dispatch_message_batch", side_effect=error):
+            self.assertEqual(outbox.process_batch(self.deliveries), [False] * 3)
+        self.assertEqual(
+            set(WebhookDelivery.objects.values_list("status", flat=True)), {WebhookDelivery.STATUS_PENDING}
+        )
+
+    async def test_async_batch_settles_replies(self):
+        results = {message_id: {"reply": f"ok {message_id}"} for message_id in self.ids}
+        with mock.patch.object(outbox, "adispatch_message_batch", mock.AsyncMock(return_value=results)):
+            self.assertEqual(await outbox.aprocess_batch(self.deliveries), [True] * 3)
+        self.assertEqual(await Message.objects.filter(sender=Message.ASSISTANT).acount(), 3)
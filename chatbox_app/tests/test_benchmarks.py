@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import tempfile
+from functools import partial
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+import httpx
+
+from benchmarks.driver import LoadResult, run_load
+from benchmarks.stub_ai import StubConfig, start_in_thread
+from benchmarks.suite import _compare, _query_totals
+from chatbox_app import metrics
+
+
+def report(label: str, rps: float, p95: float, p99: float, error_ratio: float = 0.0) -> dict:
+    return {"label": label, "throughput_rps": rps, "error_ratio": error_ratio, "latency_ms": {"p95": p95, "p99": p99}}
+
+
+class SuiteHelperTests(SimpleTestCase):
+    def test_query_totals_reads_rendered_histograms(self):
+        histogram = metrics.Histogram("chatbox_view_db_queries", "", ("view",), metrics.QUERY_COUNT_BUCKETS)
+        for count in (3, 5):
+            histogram.observe(count, "chatbox_app:dashboard")
+        histogram.observe(1, "chatbox_app:video_status")
+
+        totals = _query_totals("\n".join(histogram.render()))
+
+        self.assertEqual(totals["chatbox_app:dashboard"], (8.0, 2.0))
+        self.assertEqual(totals["chatbox_app:video_status"], (1.0, 1.0))
+
+    def test_compare_reports_changes_against_baseline(self):
+        baseline = {"results": [report("asgi:dashboard", 100, 20, 40), report("asgi:video_status", 0, 0, 10)]}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "baseline.json"
+            path.write_text(json.dumps(baseline))
+            deltas = _compare(
+                [
+                    report("asgi:dashboard", 150, 10, 40, error_ratio=0.125),
+                    report("asgi:video_status", 50, 5, 5),
+                    report("new", 1, 1, 1),
+                ],
+                str(path),
+            )
+
+        self.assertEqual([delta["label"] for delta in deltas], ["asgi:dashboard", "asgi:video_status"])
+        self.assertEqual(deltas[0]["throughput_rps"], {"before": 100, "after": 150, "change_pct": 50.0})
+        self.assertEqual(deltas[0]["p95_ms"]["change_pct"], -50.0)
+        self.assertEqual(deltas[0]["p99_ms"]["change_pct"], 0.0)
+        self.assertEqual(deltas[0]["error_ratio"], {"before": 0.0, "after": 0.125, "change_pts": 12.5})
+        self.assertIsNone(deltas[1]["throughput_rps"]["change_pct"])
+
+    def test_load_result_percentiles(self):
+        latencies = [index / 1000 for index in range(1, 101)]
+        result = LoadResult("dashboard", 4, latencies=latencies, statuses={200: 100}, elapsed=2.0)
+        data = result.as_dict()
+        self.assertEqual(data["throughput_rps"], 50.0)
+        self.assertEqual((data["latency_ms"]["p50"], data["latency_ms"]["p99"]), (50.0, 99.0))
+        self.assertEqual(LoadResult("vide", 1).as_dict()["latency_ms"]["p95"], 0.0)
+
+    def test_failed_responses_count_as_errors_only(self):
+        async def request(client: httpx.AsyncClient, index: int) -> httpx.Response:
+            return await client.get(f"/{index}")
+
+        def reply(request: httpx.Request) -> httpx.Response:
+            index = int(request.url.path.strip("/"))
+            if index == 3:
+                raise httpx.ConnectError("refused")
+            return httpx.Response(429 if index % 2 else 200)
+
+        transport = httpx.MockTransport(reply)
+        with mock.patch("benchmarks.driver.httpx.AsyncClient", partial(httpx.AsyncClient, transport=transport)):
+            result = asyncio.run(run_load("mixte", "http://bench.test", request, 6, 2))
+        data = result.as_dict()
+
+        self.assertEqual((data["requests"], data["succeeded"], data["errors"]), (6, 3, 1))
+        self.assertEqual(data["statuses"], {"200": 3, "429": 2})
+        self.assertEqual(data["error_ratio"], 0.5)
+        self.assertEqual(len(result.latencies), 3)
+
+
+class StubAITests(SimpleTestCase):
+    def test_batch_replies_map_to_messages(self):
+        server = start_in_thread(StubConfig(latency=0, response_size=5))
+        response = httpx.post(server.url, json=[{"message_id": 1}, {"message_id": 2}])
+        self.assertEqual([item["message_id"] for item in response.json()], [1, 2])
+        self.assertEqual(response.json()[0]["reply"], "xxxxx")
+
+    def test_error_rate(self):
+        server = start_in_thread(StubConfig(latency=0, error_rate=1.0))
+        self.assertEqual(httpx.post(server.url, json={"content": "Bonjour"}).status_code, 503)
+        self.assertEqual((server.requests, server.errors), (1, 1))
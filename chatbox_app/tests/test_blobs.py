@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import hashlib
+from datetime import timedelta
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from chatbox_app.models import AttachmentBlob, ChatSession, Message
+from .utils import TempMediaMixin
+
+
+class AttachmentBlobTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.session = ChatSession.objects.create(name="Blobs")
+
+    def _store(self, data: bytes = b"contenu identique") -> AttachmentBlob:
+        return AttachmentBlob.objects.store(ContentFile(data, name="fichier.txt"), content_type="text/plain")
+
+    def _attach(self, blob: AttachmentBlob) -> Message:
+        return Message.objects.create(session=self.session, attachment=blob.file.name, blob=blob)
+
+    def _gc(self, *args) -> str:
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("gc_blobs", *args, stdout=out)
+        return out.getvalue()
+
+    def test_identical_content_is_stored_once(self):
+        first, second = self._store(), self._store()
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(first.sha256, hashlib.sha256(b"contenu identique").hexdigest())
+        self.assertTrue(first.file.name.startswith(f"blobs/{first.sha256[:2]}/{first.sha256[2:4]}/"))
+        self.assertNotEqual(self._store(b"autre contenu").pk, first.pk)
+
+    def test_references_follow_messages(self):
+        blob = self._store()
+        first, second = self._attach(blob), self._attach(blob)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+        first.delete()
+        second.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+
+    def test_gc_deletes_orphans_after_grace(self):
+        blob = self._store()
+        self._gc("--grace", "3600")
+        self.assertTrue(AttachmentBlob.objects.filter(pk=blob.pk).exists())
+
+        AttachmentBlob.objects.filter(pk=blob.pk).update(updated_at=timezone.now() - timedelta(hours=2))
+        self.assertIn("1 blob(s) supprimé(s)", self._gc("--grace", "3600"))
+        self.assertFalse(AttachmentBlob.objects.filter(pk=blob.pk).exists())
+        self.assertFalse(blob.file.storage.exists(blob.file.name))
+
+    def test_gc_keeps_referenced_blobs_and_fixes_counts(self):
+        blob = self._store()
+        self._attach(blob)
+        AttachmentBlob.objects.filter(pk=blob.pk).update(ref_count=0, updated_at=timezone.now() - timedelta(days=1))
+        self.assertIn("1 compteur(s) corrigé(s), 0 blob(s) supprimé(s)", self._gc("--grace", "0"))
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+    def test_dry_run_changes_nothing(self):
+        blob = self._store()
+        AttachmentBlob.objects.filter(pk=blob.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        self.assertIn("[simulation]", self._gc("--grace", "0", "--dry-run"))
+        self.assertTrue(AttachmentBlob.objects.filter(pk=blob.pk).exists())
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+import requests
+
+from chatbox_app.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+from chatbox_app.models import CircuitBreakerState
+
+
+def failing_call(breaker: CircuitBreaker) -> None:
+    try:
+        with breaker.guard():
+            raise requests.ConnectionError("refused")
+    except requests.ConnectionError:
+        pass
+
+
+@override_settings(BREAKER_FAILURE_THRESHOLD=2, BREAKER_FAILURE_WINDOW=60, BREAKER_COOLDOWN=30)
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker("message")
+
+    def test_opens_after_threshold_and_fails_fast(self):
+        failing_call(self.breaker)
+        self.assertEqual(self.breaker.snapshot()["failures"], 1)
+        failing_call(self.breaker)
+        self.assertEqual(self.breaker.state()["state"], OPEN)
+        with self.assertRaises(CircuitOpen) as ctx:
+            with self.breaker.guard():
+                self.fail("the upstream must not be called while open")
+        self.assertGreater(ctx.exception.retry_after, 0)
+
+    def test_state_is_shared_through_the_database(self):
+        failing_call(self.breaker)
+        failing_call(CircuitBreaker("message"))
+        row = CircuitBreakerState.objects.get(name="message")
+        self.assertEqual((row.state, row.transitions[-1]["to"]), (OPEN, OPEN))
+        self.assertEqual(CircuitBreaker("message").snapshot()["state"], OPEN)
+        self.assertEqual(CircuitBreaker("video").snapshot()["state"], CLOSED)
+
+    def test_success_resets_failures(self):
+        failing_call(self.breaker)
+        with self.breaker.guard():
+            pass
+        failing_call(self.breaker)
+        self.assertEqual(self.breaker.state()["state"], CLOSED)
+
+    def test_failures_outside_window_start_over(self):
+        failing_call(self.breaker)
+        CircuitBreakerState.objects.filter(name="message").update(window_started_at=time.time() - 120)
+        failing_call(self.breaker)
+        self.assertEqual(self.breaker.state()["state"], CLOSED)
+
+    def test_single_probe_after_cooldown(self):
+        failing_call(self.breaker)
+        failing_call(self.breaker)
+        CircuitBreakerState.objects.filter(name="message").update(opened_at=time.time() - 60)
+        probe = self.breaker.before_call()
+        self.assertIsNotNone(probe)
+        self.assertEqual(self.breaker.state()["state"], HALF_OPEN)
+        with self.assertRaises(CircuitOpen):
+            CircuitBreaker("message").before_call()
+        self.breaker.record_success(probe)
+        self.assertEqual(self.breaker.state()["state"], CLOSED)
+        self.assertIsNone(self.breaker.before_call())
+
+    def test_failed_probe_reopens(self):
+        failing_call(self.breaker)
+        failing_call(self.breaker)
+        CircuitBreakerState.objects.filter(name="message").update(opened_at=time.time() - 60)
+        failing_call(self.breaker)
+        snapshot = self.breaker.snapshot()
+        self.assertEqual(snapshot["state"], OPEN)
+        self.assertEqual([t["to"] for t in snapshot["transitions"]], [OPEN, HALF_OPEN, OPEN])
+
+    def test_cancelled_probe_is_released(self):
+        failing_call(self.breaker)
+        failing_call(self.breaker)
+        CircuitBreakerState.objects.filter(name="message").update(opened_at=time.time() - 60)
+        with self.assertRaises(KeyboardInterrupt):
+            with self.breaker.guard():
+                raise KeyboardInterrupt
+        self.assertEqual(CircuitBreakerState.objects.get(name="message").probe_token, "")
+
+    async def test_async_guard_records_failures(self):
+        for _ in range(2):
+            with self.assertRaises(requests.ConnectionError):
+                async with self.breaker.aguard():
+                    raise requests.ConnectionError("refused")
+        state = await CircuitBreakerState.objects.aget(name="message")
+        self.assertEqual(state.state, OPEN)
+
+    def test_health_endpoint_and_reset(self):
+        failing_call(self.breaker)
+        failing_call(self.breaker)
+        response = self.client.get(reverse("chatbox_app:upstream_status"))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["breakers"][0]["state"], OPEN)
+
+        call_command("breaker_status", reset="message", stdout=StringIO())
+        self.assertEqual(self.client.get(reverse("chatbox_app:upstream_status")).status_code, 200)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_health_details_need_metrics_access(self):
+        try:
+            with self.breaker.guard():
+                raise requests.ConnectionError("https://ai.internal.example/message refused")
+        except requests.ConnectionError:
+            pass
+        failing_call(self.breaker)
+        url = reverse("chatbox_app:upstream_status")
+
+        public = self.client.get(url, REMOTE_ADDR="8.8.8.8").json()["breakers"][0]
+        self.assertEqual(set(public), {"name", "state", "retry_after"})
+        self.assertEqual(public["state"], OPEN)
+
+        internal = self.client.get(url, HTTP_AUTHORIZATION="Bearer s3cret").json()["breakers"][0]
+        self.assertEqual(internal["transitions"][-1]["reason"], "2 consecutive failures (ConnectionError)")
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import json
+import time
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from chatbox_app import callbacks
+from chatbox_app.models import ChatSession, GeneratedVideo, Message
+
+
+SECRET = "secret-de-test"
+
+
+@override_settings(AI_CALLBACK_SECRET=SECRET, AI_CALLBACK_TOLERANCE=300)
+class AiCallbackTests(TestCase):
+    def setUp(self):
+        self.url = reverse("chatbox_app:ai_callback")
+        self.session = ChatSession.objects.create(name="Callbacks")
+        self.video = GeneratedVideo.objects.create(
+            session=self.session, prompt="Un chat", external_id="job-1", status=GeneratedVideo.STATUS_PROCESSING
+        )
+
+    def _post(self, data: dict, timestamp: int | None = None, signature: str | None = None, secret: str = SECRET):
+        body = json.dumps(data).encode()
+        stamp = str(int(time.time()) if timestamp is None else timestamp)
+        return self.client.post(
+            self.url,
+            body,
+            content_type="application/json",
+            HTTP_X_KERNEL_TIMESTAMP=stamp,
+            HTTP_X_KERNEL_SIGNATURE=signature or callbacks.sign(body, stamp, secret),
+        )
+
+    def test_video_callback_completes_video(self):
+        data = {"type": "video", "external_id": "job-1", "video_url": "https://cdn.example.test/chat.mp4"}
+        response = self._post(data)
+        self.assertEqual(response.json(), {"status": "ok", "video_id": self.video.pk, "duplicate": False})
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.status, GeneratedVideo.STATUS_COMPLETED)
+        self.assertEqual(self._post(data).json()["duplicate"], True)
+
+    def test_message_callback_is_idempotent(self):
+        message = Message.objects.create(session=self.session, content="Question")
+        data = {"type": "message", "external_id": "reply-1", "message_id": message.pk, "content": "Réponse"}
+        first = self._post(data).json()
+        second = self._post(data).json()
+        self.assertFalse(first["duplicate"])
+        self.assertTrue(second["duplicate"])
+        self.assertEqual(first["message_id"], second["message_id"])
+        self.assertEqual(Message.objects.filter(session=self.session, sender=Message.ASSISTANT).count(), 1)
+
+    def test_wrong_secret_is_rejected(self):
+        response = self._post({"type": "video", "external_id": "job-1"}, secret="autre-secret")
+        self.assertEqual(response.status_code, 401)
+
+    def test_tampered_body_is_rejected(self):
+        stamp = str(int(time.time()))
+        signature = callbacks.sign(b'{"type": "video"}', stamp)
+        response = self._post({"type": "video", "external_id": "job-1"}, timestamp=int(stamp), signature=signature)
+        self.assertEqual(response.status_code, 401)
+
+    def test_expired_timestamp_is_rejected(self):
+        response = self._post({"type": "video", "external_id": "job-1"}, timestamp=int(time.time()) - 3600)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["error"], "Horodatage expiré.")
+
+    def test_missing_signature_is_rejected(self):
+        response = self.client.post(self.url, "{}", content_type="application/json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_unknown_video_is_not_found(self):
+        self.assertEqual(self._post({"type": "video", "external_id": "inconnu"}).status_code, 404)
+
+    @override_settings(AI_CALLBACK_SECRET="")
+    def test_disabled_without_secret(self):
+        self.assertEqual(self.client.post(self.url, "{}", content_type="application/json").status_code, 403)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from chatbox_app import context, webhooks
+from chatbox_app.models import ChatSession, Message
+
+
+@override_settings(
+    CONVERSATION_CONTEXT_ENABLED=True,
+    CONVERSATION_HISTORY_TURNS=20,
+    CONVERSATION_TOKEN_BUDGET=2000,
+    AI_MESSAGE_WEBHOOK_URL="https://ai.example.test/message",
+    AI_MESSAGE_WEBHOOK_METHOD="POST",
+)
+class ConversationContextTests(TestCase):
+    def setUp(self):
+        caches["conversations"].clear()
+        self.session = ChatSession.objects.create(name="Contexte")
+
+    def _say(self, content: str, sender: str = Message.USER) -> Message:
+        # History entries are updated on commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            return Message.objects.create(session=self.session, sender=sender, content=content)
+
+    def test_context_holds_earlier_turns_only(self):
+        self._say("Bonjour")
+        self._say("Salut !", Message.ASSISTANT)
+        message = self._say("Ça va ?")
+        built = context.build_context(message)
+        self.assertEqual([turn["content"] for turn in built["turns"]], ["Bonjour", "Salut !"])
+        self.assertFalse(built["truncated"])
+
+    def test_cached_history_follows_new_messages(self):
+        context.build_context(self._say("Premier"))
+        self._say("Deuxième")
+        message = self._say("Troisième")
+        with self.assertNumQueries(0):
+            built = context.build_context(message)
+        self.assertEqual([turn["content"] for turn in built["turns"]], ["Premier", "Deuxième"])
+
+    @override_settings(CONVERSATION_TOKEN_BUDGET=40)
+    def test_budget_keeps_latest_turns(self):
+        for index in range(5):
+            self._say(f"Message numéro {index} " + "x" * 40)
+        built = context.build_context(self._say("Fin"))
+        self.assertTrue(built["truncated"])
+        self.assertLess(len(built["turns"]), 5)
+        self.assertTrue(built["turns"][-1]["content"].startswith("Message numéro 4"))
+
+    @override_settings(CONVERSATION_HISTORY_TURNS=3)
+    def test_cached_and_cold_summaries_cover_the_same_turns(self):
+        context.build_context(self._say("Tour 0"))
+        for index in range(1, 10):
+            message = self._say(f"Tour {index}")
+        with self.assertNumQueries(0):
+            warm = context.build_context(message)
+        caches["conversations"].clear()
+        cold = context.build_context(message)
+
+        self.assertEqual(warm, cold)
+        self.assertEqual(cold["summary"].splitlines(), ["user: Tour 4", "user: Tour 5", "user: Tour 6"])
+        self.assertEqual([turn["content"] for turn in cold["turns"]], ["Tour 7", "Tour 8"])
+
+    def test_post_payload_carries_context(self):
+        self._say("Bonjour")
+        payload = webhooks.build_message_payload(self._say("Encore"))
+        self.assertEqual([turn["content"] for turn in payload["context"]["turns"]], ["Bonjour"])
+
+    @override_settings(AI_MESSAGE_WEBHOOK_METHOD="GET")
+    def test_get_webhook_leaves_context_out(self):
+        self._say("Bonjour")
+        message = self._say("Encore")
+        payload = webhooks.build_message_payload(message)
+        self.assertNotIn("context", payload)
+
+        queued = dict(payload, context={"summary": "", "turns": [], "truncated": False})
+        method, _, kwargs = webhooks._message_request(message.pk, queued)
+        self.assertEqual(method, "GET")
+        self.assertNotIn("context", kwargs["params"])
+        self.assertEqual(kwargs["params"]["content"], "Encore")
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from chatbox_app.models import ChatSession, GeneratedVideo, Message
+from chatbox_app.pagination import session_page
+from .utils import TempMediaMixin
+
+
+@override_settings(DASHBOARD_PAGE_SIZE=3)
+class DashboardTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        now = timezone.now()
+        self.sessions = []
+        for i in range(5):
+            session = ChatSession.objects.create(name=f"Projet {i}" if i % 2 else f"Brouillon {i}")
+            ChatSession.objects.filter(pk=session.pk).update(last_activity_at=now - timedelta(minutes=10 - i))
+            self.sessions.append(session)
+
+    def test_sorted_by_activity_with_keyset_pages(self):
+        first = session_page(3)
+        self.assertEqual([s.pk for s in first.sessions], [s.pk for s in reversed(self.sessions[2:])])
+        self.assertTrue(first.has_more)
+        second = session_page(3, after=first.last_id)
+        self.assertEqual([s.pk for s in second.sessions], [self.sessions[1].pk, self.sessions[0].pk])
+        self.assertFalse(second.has_more)
+
+    def test_search_by_name(self):
+        page = session_page(10, query="projet")
+        self.assertEqual({s.pk for s in page.sessions}, {self.sessions[1].pk, self.sessions[3].pk})
+
+    def test_unknown_sort_falls_back_to_activity(self):
+        self.assertEqual(session_page(3, sort="inconnu").sort, "activity")
+
+    def test_counts_come_from_the_session_row(self):
+        Message.objects.create(session=self.sessions[0], content="Bonjour")
+        GeneratedVideo.objects.create(session=self.sessions[0], prompt="Un chat")
+        session = ChatSession.objects.get(pk=self.sessions[0].pk)
+        self.assertEqual((session.message_count, session.video_count), (1, 1))
+        self.assertGreater(session.last_activity_at, self.sessions[4].last_activity_at)
+
+    def test_page_query_budget(self):
+        url = reverse("chatbox_app:dashboard")
+        with self.assertNumQueries(2):
+            self.assertContains(self.client.get(url), "Projet 3")
+        with self.assertNumQueries(1):
+            self.client.get(url, {"after": self.sessions[2].pk})
+
+    def test_create_session(self):
+        response = self.client.post(reverse("chatbox_app:dashboard"), {"name": "Nouvelle"})
+        session = ChatSession.objects.get(name="Nouvelle")
+        self.assertRedirects(
+            response, reverse("chatbox_app:chat_session", args=[session.pk]), fetch_redirect_response=False
+        )
+
+
+class QueryBudgetIsolationTests(TempMediaMixin, TestCase):
+    @mock.patch("chatbox_app.status_cache.is_shared", return_value=True)
+    def test_rolled_back_videos_leave_no_status_entries(self, is_shared):
+        cache.clear()
+        call_command("check_query_budget", "--messages", "5", "--videos", "5", "--sessions", "2", stdout=StringIO())
+        self.assertEqual(list(cache._cache), [])
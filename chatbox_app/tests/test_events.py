@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from asgiref.sync import sync_to_async
+
+from chatbox_app import events, views
+from chatbox_app.models import ChatSession, GeneratedVideo
+
+
+class InProcessBrokerTests(TestCase):
+    async def test_subscriber_receives_published_messages(self):
+        broker = events.InProcessBroker()
+        subscription = broker.subscribe("canal", timeout=0.05)
+        self.assertIsNone(await subscription.__anext__())
+        broker.publish("canal", "bonjour")
+        self.assertEqual(await subscription.__anext__(), "bonjour")
+        await subscription.aclose()
+        self.assertNotIn("canal", broker._subscribers)
+
+
+@override_settings(CHAT_EVENTS_BACKEND="memory", CHAT_EVENTS_KEEPALIVE=0.05)
+class SessionEventStreamTests(TestCase):
+    def setUp(self):
+        self.session = ChatSession.objects.create(name="Événements")
+        self.video = GeneratedVideo.objects.create(session=self.session, prompt="Un chat")
+
+    def test_wsgi_clients_are_told_to_poll(self):
+        response = self.client.get(reverse("chatbox_app:session_events", args=[self.session.pk]))
+        self.assertEqual(response.status_code, 204)
+
+    async def test_stream_replays_pending_then_pushes_events(self):
+        stream = views._session_event_stream(self.session.pk)
+        self.assertEqual(await stream.__anext__(), "retry: 3000\n\n")
+        first = await stream.__anext__()
+        self.assertTrue(first.startswith("event: video\n"))
+        self.assertEqual(json.loads(first.split("data: ", 1)[1])["status"], GeneratedVideo.STATUS_PENDING)
+
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)
+        events.publish(self.session.pk, "message", {"id": 42, "sender": "assistant"})
+        self.assertEqual(await pending, events.format_sse("message", {"id": 42, "sender": "assistant"}))
+        await stream.aclose()
+
+    async def test_idle_tick_catches_out_of_band_updates(self):
+        stream = views._session_event_stream(self.session.pk)
+        await stream.__anext__()
+        await stream.__anext__()
+
+        await sync_to_async(
+            GeneratedVideo.objects.filter(pk=self.video.pk).update
+        )(status=GeneratedVideo.STATUS_COMPLETED, video_url="https://cdn.example.test/chat.mp4")
+        chunk = await stream.__anext__()
+        self.assertTrue(chunk.startswith("event: video\n"))
+        self.assertEqual(json.loads(chunk.split("data: ", 1)[1])["status"], GeneratedVideo.STATUS_COMPLETED)
+        self.assertEqual(await stream.__anext__(), ": keepalive\n\n")
+        await stream.aclose()
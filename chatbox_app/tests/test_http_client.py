@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase, override_settings
+
+from chatbox_app import http_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HttpClientTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        http_client.reset()
+        self.addCleanup(http_client.reset)
+
+    def test_session_is_shared(self):
+        self.assertIs(http_client.get_session(), http_client.get_session())
+
+    @override_settings(AI_HTTP_CONNECT_TIMEOUT=2.0, AI_HTTP_READ_TIMEOUT=7.0)
+    def test_default_timeout_from_settings(self):
+        self.assertEqual(http_client.default_timeout(), (2.0, 7.0))
+
+    @override_settings(AI_HTTP_MAX_RETRIES=2, AI_HTTP_POOL_MAXSIZE=5)
+    def test_adapter_retries_and_pool_size(self):
+        adapter = http_client.get_session().get_adapter("https://ai.example.test/")
+        self.assertIsInstance(adapter.max_retries, http_client.JitteredRetry)
+        self.assertEqual(adapter.max_retries.total, 2)
+        self.assertIn(503, adapter.max_retries.status_forcelist)
+        self.assertEqual(adapter._pool_maxsize, 5)
+
+    def test_jittered_backoff_stays_below_ceiling(self):
+        retry = http_client.JitteredRetry(total=5, backoff_factor=1).increment("GET", "/").increment("GET", "/")
+        for _ in range(20):
+            self.assertTrue(0 <= retry.get_backoff_time() <= 2)
+
+    def test_connections_are_reused(self):
+        for _ in range(3):
+            self.assertEqual(http_client.get(self.url).json(), {"ok": True})
+
+        [stats] = http_client.pool_stats().values()
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["connections"], 1)
+        self.assertEqual(stats["reused"], 2)
+
+    def test_async_client_is_per_loop(self):
+        async def fetch():
+            first = http_client.get_async_client()
+            response = await http_client.aget(self.url)
+            same = http_client.get_async_client() is first
+            await http_client.aclose()
+            return response.status_code, same
+
+        self.assertEqual(asyncio.run(fetch()), (200, True))
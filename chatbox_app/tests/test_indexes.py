@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from chatbox_app.models import ChatSession, GeneratedVideo, Message, WebhookDelivery
+
+
+@skipUnless(connection.vendor == "sqlite", "Les plans attendus sont ceux de SQLite.")
+class IndexUsageTests(TestCase):
+    def setUp(self):
+        self.session = ChatSession.objects.create(name="Index")
+        Message.objects.create(session=self.session, content="Bonjour")
+        GeneratedVideo.objects.create(session=self.session, prompt="Un chat")
+
+    def assertUsesIndex(self, queryset, index: str):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", plan)
+
+    def test_session_messages(self):
+        queryset = Message.objects.filter(session=self.session).order_by("created_at", "id")[:50]
+        self.assertUsesIndex(queryset, "message_session_created_idx")
+
+    def test_session_videos(self):
+        queryset = GeneratedVideo.objects.filter(session=self.session).order_by("-created_at")[:50]
+        self.assertUsesIndex(queryset, "video_session_created_idx")
+
+    def test_pending_videos_by_age(self):
+        queryset = GeneratedVideo.objects.filter(status=GeneratedVideo.STATUS_PENDING).order_by("updated_at")[:500]
+        self.assertUsesIndex(queryset, "video_status_updated_idx")
+
+    def test_sessions_by_activity(self):
+        self.assertUsesIndex(ChatSession.objects.order_by("-last_activity_at", "-id")[:20], "session_activity_idx")
+
+    def test_due_deliveries(self):
+        queryset = WebhookDelivery.objects.filter(status=WebhookDelivery.STATUS_PENDING).order_by("next_attempt_at")
+        self.assertUsesIndex(queryset, "delivery_status_next_idx")
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from django.test import SimpleTestCase, override_settings
+
+from chatbox_app import media
+from .utils import TempMediaMixin
+
+
+DATA = bytes(range(256)) * 4
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        self.assertEqual(media.parse_range("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(media.parse_range("bytes=900-", 1000), (900, 999))
+        self.assertEqual(media.parse_range("bytes=-100", 1000), (900, 999))
+        self.assertEqual(media.parse_range("bytes=990-2000", 1000), (990, 999))
+
+    def test_ignored_ranges(self):
+        self.assertIsNone(media.parse_range("bytes=0-10,20-30", 1000))
+        self.assertIsNone(media.parse_range("items=0-10", 1000))
+        self.assertIsNone(media.parse_range("bytes=50-10", 1000))
+
+    def test_unsatisfiable(self):
+        with self.assertRaises(media.RangeNotSatisfiable):
+            media.parse_range("bytes=1000-", 1000)
+        with self.assertRaises(media.RangeNotSatisfiable):
+            media.parse_range("bytes=-0", 1000)
+
+
+@override_settings(MEDIA_SENDFILE_BACKEND="")
+class ServeMediaTests(TempMediaMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        (self.media_root / "attachments").mkdir(parents=True)
+        (self.media_root / "attachments" / "clip.mp4").write_bytes(DATA)
+        self.url = "/media/attachments/clip.mp4"
+
+    def _body(self, response) -> bytes:
+        body = b"".join(response.streaming_content)
+        response.close()
+        return body
+
+    def test_full_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Content-Type"], "video/mp4")
+        self.assertEqual(self._body(response), DATA)
+
+    def test_partial_content(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(DATA)}")
+        self.assertEqual(response["Content-Length"], "100")
+        self.assertEqual(self._body(response), DATA[100:200])
+
+    def test_range_not_satisfiable(self):
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={len(DATA)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(DATA)}")
+
+    def test_stale_if_range_returns_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"autre"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self._body(response)), len(DATA))
+
+    def test_if_range_with_current_etag(self):
+        etag = self.client.head(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self._body(response), DATA[:10])
+
+    def test_not_modified(self):
+        etag = self.client.head(self.url)["ETag"]
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_partial_uploads_and_traversal_are_hidden(self):
+        self.assertEqual(self.client.get("/media/uploads/partial/x.part").status_code, 404)
+        self.assertEqual(self.client.get("/media/../chatbox_project/settings.py").status_code, 400)
+
+    @override_settings(MEDIA_SENDFILE_BACKEND="x-accel-redirect", MEDIA_ACCEL_REDIRECT_PREFIX="/protected/")
+    def test_offload_to_front_server(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Accel-Redirect"], "/protected/attachments/clip.mp4")
+        self.assertEqual(response.content, b"")
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+import httpx
+
+from chatbox_app import metrics
+
+
+class MetricsAccessTests(SimpleTestCase):
+    @override_settings(METRICS_TOKEN="", METRICS_ALLOWED_IPS=["127.0.0.1", "10.0.0.0/8"])
+    def test_allow_list_without_token(self):
+        self.assertTrue(metrics.allowed("", "127.0.0.1", False))
+        self.assertTrue(metrics.allowed("", "10.1.2.3", False))
+        self.assertFalse(metrics.allowed("", "192.168.1.2", False))
+        self.assertFalse(metrics.allowed("", "8.8.8.8", False))
+        self.assertFalse(metrics.allowed("", "127.0.0.1", True))
+        self.assertFalse(metrics.allowed("", "", False))
+
+    @override_settings(METRICS_TOKEN="", METRICS_ALLOWED_IPS=[])
+    def test_closed_without_token_or_allow_list(self):
+        self.assertFalse(metrics.allowed("", "127.0.0.1", False))
+        with self.settings(DEBUG=True):
+            self.assertTrue(metrics.allowed("", "127.0.0.1", False))
+            self.assertFalse(metrics.allowed("", "10.1.2.3", False))
+
+    @override_settings(METRICS_TOKEN="", METRICS_ALLOWED_IPS=["10.0.0.300"])
+    def test_invalid_allow_list(self):
+        with self.assertRaises(ImproperlyConfigured):
+            metrics.allowed("", "10.1.2.3", False)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token_required_when_set(self):
+        self.assertTrue(metrics.allowed("Bearer s3cret", "8.8.8.8", True))
+        self.assertFalse(metrics.allowed("", "127.0.0.1", False))
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN="", METRICS_ALLOWED_IPS=["127.0.0.1"])
+class MetricsViewTests(TestCase):
+    def test_internal_scrape(self):
+        response = self.client.get(reverse("chatbox_app:metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"chatbox_breaker_state", response.content)
+
+    def test_public_and_proxied_scrapes_are_refused(self):
+        url = reverse("chatbox_app:metrics")
+        self.assertEqual(self.client.get(url, REMOTE_ADDR="8.8.8.8").status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_X_FORWARDED_FOR="8.8.8.8").status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_FORWARDED="for=8.8.8.8").status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_X_REAL_IP="8.8.8.8").status_code, 401)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token(self):
+        url = reverse("chatbox_app:metrics")
+        self.assertEqual(self.client.get(url).status_code, 401)
+        response = self.client.get(url, REMOTE_ADDR="8.8.8.8", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(METRICS_TOKEN="", METRICS_ALLOWED_IPS=["127.0.0.1"])
+class WorkerExporterTests(SimpleTestCase):
+    def setUp(self):
+        self.server = metrics.serve(0)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def test_serves_process_metrics(self):
+        metrics.observe_upstream("message", 0.2, None)
+        response = httpx.get(f"{self.base}/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('chatbox_upstream_requests_total{endpoint="message",status="ok"}', response.text)
+        self.assertNotIn("chatbox_breaker_state", response.text)
+
+    def test_other_paths_and_proxied_requests(self):
+        self.assertEqual(httpx.get(f"{self.base}/").status_code, 404)
+        for header in metrics.PROXY_HEADERS:
+            self.assertEqual(httpx.get(f"{self.base}/metrics", headers={header: "1.2.3.4"}).status_code, 401)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+import requests
+
+from chatbox_app import outbox
+from chatbox_app.models import ChatSession, GeneratedVideo, Message, WebhookDelivery
+
+
+@override_settings(
+    AI_MESSAGE_WEBHOOK_URL="https://ai.example.test/message",
+    AI_VIDEO_API_URL="https://ai.example.test/video",
+    WEBHOOK_MAX_ATTEMPTS=3,
+    WEBHOOK_RETRY_BACKOFF=10,
+    WEBHOOK_CLAIM_TIMEOUT=120,
+    UPSTREAM_MAX_INFLIGHT=0,
+    CONVERSATION_CONTEXT_ENABLED=False,
+)
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.session = ChatSession.objects.create(name="Outbox")
+        self.message = Message.objects.create(session=self.session, content="Bonjour")
+
+    def _delivery(self, **fields) -> WebhookDelivery:
+        return WebhookDelivery.objects.create(
+            kind=WebhookDelivery.KIND_MESSAGE, message=self.message, payload={"message_id": self.message.pk}, **fields
+        )
+
+    def test_enqueue_message_stores_payload(self):
+        delivery = outbox.enqueue_message(self.message, callback_url="https://chat.example.test/callbacks/ai/")
+        self.assertEqual(delivery.status, WebhookDelivery.STATUS_PENDING)
+        self.assertEqual(delivery.payload["message_id"], self.message.pk)
+        self.assertEqual(delivery.payload["callback_url"], "https://chat.example.test/callbacks/ai/")
+
+    @override_settings(AI_MESSAGE_WEBHOOK_URL="")
+    def test_enqueue_message_without_webhook(self):
+        self.assertIsNone(outbox.enqueue_message(self.message))
+        self.assertFalse(WebhookDelivery.objects.exists())
+
+    def test_claim_leases_due_deliveries_once(self):
+        due = self._delivery()
+        later = self._delivery(next_attempt_at=timezone.now() + timedelta(minutes=5))
+
+        claimed = outbox.claim_deliveries(10)
+
+        self.assertEqual([delivery.pk for delivery in claimed], [due.pk])
+        self.assertEqual(claimed[0].status, WebhookDelivery.STATUS_SENDING)
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertGreater(claimed[0].next_attempt_at, timezone.now() + timedelta(seconds=100))
+        self.assertEqual(outbox.claim_deliveries(10), [])
+        later.refresh_from_db()
+        self.assertEqual(later.status, WebhookDelivery.STATUS_PENDING)
+
+    def test_claim_respects_limit(self):
+        for _ in range(3):
+            self._delivery()
+        self.assertEqual(len(outbox.claim_deliveries(2)), 2)
+        self.assertEqual(len(outbox.claim_deliveries(2)), 1)
+
+    def test_expired_lease_is_reclaimed(self):
+        delivery = self._delivery()
+        outbox.claim_deliveries(1)
+        WebhookDelivery.objects.filter(pk=delivery.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+        claimed = outbox.claim_deliveries(1)
+
+        self.assertEqual([item.pk for item in claimed], [delivery.pk])
+        self.assertEqual(claimed[0].attempts, 2)
+
+    def test_successful_delivery_stores_reply(self):
+        self._delivery()
+        [delivery] = outbox.claim_deliveries(1)
+        with mock.patch.object(outbox, "dispatch_message_webhook", return_value={"reply": "Salut !"}):
+            self.assertTrue(outbox.process_delivery(delivery))
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, WebhookDelivery.STATUS_DELIVERED)
+        reply = Message.objects.get(session=self.session, sender=Message.ASSISTANT)
+        self.assertEqual(reply.content, "Salut !")
+
+    def test_retryable_failure_backs_off(self):
+        self._delivery()
+        [delivery] = outbox.claim_deliveries(1)
+        error = requests.ConnectionError("connexion refusée")
+        with mock.patch.object(outbox, "dispatch_message_webhook", side_effect=error):
+            self.assertFalse(outbox.process_delivery(delivery))
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, WebhookDelivery.STATUS_PENDING)
+        self.assertIn("ConnectionError", delivery.last_error)
+        delay = delivery.next_attempt_at - timezone.now()
+        self.assertTrue(timedelta(seconds=8) < delay <= timedelta(seconds=10))
+
+    def test_client_error_fails_permanently(self):
+        self._delivery()
+        [delivery] = outbox.claim_deliveries(1)
+        response = requests.Response()
+        response.status_code = 400
+        error = requests.HTTPError("400 Bad Request", response=response)
+        with mock.patch.object(outbox, "dispatch_message_webhook", side_effect=error):
+            outbox.process_delivery(delivery)
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, WebhookDelivery.STATUS_FAILED)
+
+    def test_exhausted_video_delivery_fails_video(self):
+        video = GeneratedVideo.objects.create(session=self.session, prompt="Un chat qui danse")
+        WebhookDelivery.objects.create(
+            kind=WebhookDelivery.KIND_VIDEO, video=video, payload={"prompt": video.prompt}, attempts=2
+        )
+        [delivery] = outbox.claim_deliveries(1)
+        with mock.patch.object(outbox, "trigger_video_generation", side_effect=requests.Timeout("délai dépassé")):
+            outbox.process_delivery(delivery)
+
+        delivery.refresh_from_db()
+        video.refresh_from_db()
+        self.assertEqual(delivery.attempts, 3)
+        self.assertEqual(delivery.status, WebhookDelivery.STATUS_FAILED)
+        self.assertEqual(video.status, GeneratedVideo.STATUS_FAILED)
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from chatbox_app.models import ChatSession, Message
+
+
+@override_settings(CHAT_MESSAGES_PAGE_SIZE=3, CHAT_MESSAGES_MAX_PAGE_SIZE=4)
+class MessagePaginationTests(TestCase):
+    def setUp(self):
+        self.session = ChatSession.objects.create(name="Pages")
+        self.messages = [Message.objects.create(session=self.session, content=f"m{i}") for i in range(7)]
+        self.url = reverse("chatbox_app:session_messages", args=[self.session.pk])
+
+    def _ids(self, response) -> list[int]:
+        return [item["id"] for item in response.json()["messages"]]
+
+    def test_latest_page_in_chronological_order(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self._ids(response), [m.pk for m in self.messages[4:]])
+        self.assertTrue(response.json()["has_more"])
+        self.assertEqual(response.json()["first_id"], self.messages[4].pk)
+
+    def test_before_walks_backwards(self):
+        response = self.client.get(self.url, {"before": self.messages[4].pk})
+        self.assertEqual(self._ids(response), [m.pk for m in self.messages[1:4]])
+        response = self.client.get(self.url, {"before": self.messages[1].pk})
+        self.assertEqual(self._ids(response), [self.messages[0].pk])
+        self.assertFalse(response.json()["has_more"])
+
+    def test_after_returns_newer_messages(self):
+        response = self.client.get(self.url, {"after": self.messages[2].pk, "limit": 2})
+        self.assertEqual(self._ids(response), [self.messages[3].pk, self.messages[4].pk])
+        self.assertTrue(response.json()["has_more"])
+        response = self.client.get(self.url, {"after": self.messages[-1].pk})
+        self.assertEqual(response.json()["messages"], [])
+        self.assertFalse(response.json()["has_more"])
+
+    def test_same_timestamp_is_ordered_by_id(self):
+        Message.objects.filter(session=self.session).update(created_at=self.messages[0].created_at)
+        response = self.client.get(self.url, {"after": self.messages[2].pk, "limit": 4})
+        self.assertEqual(self._ids(response), [m.pk for m in self.messages[3:7]])
+
+    def test_limit_is_clamped(self):
+        self.assertEqual(len(self._ids(self.client.get(self.url, {"limit": 50}))), 4)
+        self.assertEqual(len(self._ids(self.client.get(self.url, {"limit": 0}))), 1)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {"after": "x"}).status_code, 400)
+        response = self.client.get(self.url, {"after": self.messages[0].pk, "before": self.messages[3].pk})
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_session_cursor_is_ignored(self):
+        other = ChatSession.objects.create(name="Autre")
+        foreign = Message.objects.create(session=other, content="ailleurs")
+        response = self.client.get(self.url, {"after": foreign.pk})
+        self.assertEqual(response.json()["messages"], [])
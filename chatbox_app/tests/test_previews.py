@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import io
+from datetime import timedelta
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from PIL import Image
+
+from chatbox_app import previews
+from chatbox_app.models import AttachmentBlob
+from chatbox_app.thumbnails import PreviewOptions, render_preview
+from .utils import TempMediaMixin
+
+
+def _png(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 40, 40)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@override_settings(PREVIEW_MAX_SIZE=64, PREVIEW_QUALITY=60)
+class PreviewTests(TempMediaMixin, TestCase):
+    def _blob(self, data: bytes, content_type: str) -> AttachmentBlob:
+        return AttachmentBlob.objects.store(ContentFile(data, name="piece"), content_type=content_type)
+
+    def test_render_preview_fits_bounding_box(self):
+        blob = self._blob(_png(400, 200), "image/png")
+        data, width, height = render_preview(blob.file.path, "image/png", PreviewOptions(64, 60, "ffmpeg", 1.0))
+        self.assertEqual((width, height), (64, 32))
+        self.assertEqual(Image.open(io.BytesIO(data)).format, "WEBP")
+
+    def test_claim_skips_documents_and_leases_images(self):
+        image = self._blob(_png(10, 10), "image/png")
+        document = self._blob(b"%PDF-1.4", "application/pdf")
+        self.assertEqual([blob.pk for blob in previews.claim_blobs(10)], [image.pk])
+        self.assertEqual(previews.claim_blobs(10), [])
+        document.refresh_from_db()
+        self.assertEqual(document.preview_status, AttachmentBlob.PREVIEW_SKIPPED)
+
+    @override_settings(PREVIEW_CLAIM_TIMEOUT=60)
+    def test_stale_claims_are_requeued(self):
+        image = self._blob(_png(10, 10), "image/png")
+        previews.claim_blobs(10)
+        AttachmentBlob.objects.filter(pk=image.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual([blob.pk for blob in previews.claim_blobs(10)], [image.pk])
+
+    def test_command_generates_previews(self):
+        image = self._blob(_png(300, 300), "image/png")
+        out = StringIO()
+        call_command("generate_previews", "--once", "--workers", "1", stdout=out)
+        self.assertIn("1 aperçu(s) généré(s)", out.getvalue())
+        image.refresh_from_db()
+        self.assertTrue(image.has_preview)
+        self.assertEqual((image.preview_width, image.preview_height), (64, 64))
+        self.assertTrue(image.preview.storage.exists(image.preview.name))
+
+    def test_broken_image_is_marked_failed(self):
+        broken = self._blob(b"\x89PNG\r\n\x1a\n tronque", "image/png")
+        out = StringIO()
+        call_command("generate_previews", "--once", "--workers", "1", stdout=out)
+        broken.refresh_from_db()
+        self.assertEqual(broken.preview_status, AttachmentBlob.PREVIEW_FAILED)
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from chatbox_app import fragments
+from chatbox_app.models import ChatSession, GeneratedVideo, Message
+from .utils import TempMediaMixin
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class ChatSessionQueryBudgetTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        ChatSession.objects.bulk_create([ChatSession(name=f"Budget {i}") for i in range(15)])
+        self.session = ChatSession.objects.create(name="Budget de requêtes")
+        Message.objects.bulk_create([Message(session=self.session, content=f"Message {i}") for i in range(120)])
+        GeneratedVideo.objects.bulk_create(
+            [GeneratedVideo(session=self.session, prompt=f"Prompt {i}") for i in range(30)]
+        )
+        fragments.touch_session(self.session.pk, message_count=120, video_count=30)
+        self.url = reverse("chatbox_app:chat_session", args=[self.session.pk])
+
+    def _get(self, url, queries: int):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_page_budget_with_shared_cache(self):
+        with mock.patch("chatbox_app.fragments.is_shared", return_value=True):
+            self._get(self.url, 4)
+            self._get(self.url, 1)
+
+    def test_page_budget_with_per_process_cache(self):
+        self._get(self.url, 4)
+        # The sidebar version is hashed from its rows, which costs one query per page view.
+        self._get(self.url, 2)
+
+    def test_budget_does_not_grow_with_the_session(self):
+        Message.objects.bulk_create([Message(session=self.session, content="Encore") for _ in range(200)])
+        fragments.touch_session(self.session.pk)
+        self._get(self.url, 4)
+
+    def test_message_page_budget(self):
+        newest = self.session.messages.order_by("-id").values_list("pk", flat=True).first()
+        url = reverse("chatbox_app:session_messages", args=[self.session.pk])
+        self._get(f"{url}?before={newest}", 2)
+
+    def test_sidebar_sees_sessions_created_elsewhere(self):
+        self._get(self.url, 4)
+        # No on_commit bump runs inside TestCase, as when another worker creates the session.
+        ChatSession.objects.create(name="Créée ailleurs")
+        self.assertContains(self.client.get(self.url), "Créée ailleurs")
+        self.assertContains(self.client.get(self.url), "Créée ailleurs")
+
+    def test_new_message_refreshes_message_fragment(self):
+        self.client.get(self.url)
+        Message.objects.create(session=self.session, content="Tout nouveau message")
+        self.assertContains(self.client.get(self.url), "Tout nouveau message")
+
+
+class CheckQueryBudgetCommandTests(TempMediaMixin, TestCase):
+    def test_command_leaves_no_rows_or_cache_entries(self):
+        cache.clear()
+        cache.set("sentinelle", 1)
+        out = StringIO()
+        call_command("check_query_budget", "--messages", "20", "--videos", "5", "--sessions", "3", stdout=out)
+        self.assertIn("Tous les budgets de requêtes sont respectés.", out.getvalue())
+        self.assertFalse(ChatSession.objects.exists())
+        self.assertFalse(GeneratedVideo.objects.exists())
+        self.assertEqual(cache.get("sentinelle"), 1)
+        self.assertEqual(len(cache._cache), 1)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from chatbox_app import checks, ratelimit
+
+
+class RateLimitTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        ratelimit._store = None
+        self.addCleanup(setattr, ratelimit, "_store", None)
+
+    def _shared(self):
+        patcher = mock.patch("chatbox_app.ratelimit.require_atomic")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+@override_settings(RATE_LIMIT_BACKEND="cache", UPSTREAM_MAX_INFLIGHT=0)
+class CacheBucketStoreTests(RateLimitTestCase):
+    def test_refuses_process_local_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ratelimit.get_store()
+
+    def test_window_allows_capacity_then_waits(self):
+        self._shared()
+        store = ratelimit.get_store()
+        bucket = ratelimit.Bucket("chatbox:ratelimit:test", 2, 2 / 60)
+        self.assertEqual(store.consume([bucket], 10.0), 0.0)
+        self.assertEqual(store.consume([bucket], 11.0), 0.0)
+        self.assertAlmostEqual(store.consume([bucket], 12.0), 48.0)
+        self.assertEqual(store.consume([bucket], 61.0), 0.0)
+
+    def test_refused_call_hands_back_other_buckets(self):
+        self._shared()
+        store = ratelimit.get_store()
+        wide = ratelimit.Bucket("chatbox:ratelimit:wide", 5, 5 / 60)
+        narrow = ratelimit.Bucket("chatbox:ratelimit:narrow", 1, 1 / 60)
+        self.assertEqual(store.consume([wide, narrow], 1.0), 0.0)
+        self.assertGreater(store.consume([wide, narrow], 2.0), 0)
+        self.assertEqual(cache.get("chatbox:ratelimit:wide:0"), 1)
+
+    @override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMIT_SESSION="1/60", RATE_LIMIT_IP="", RATE_LIMIT_UPSTREAM="")
+    def test_admit_raises_overloaded_with_retry_after(self):
+        self._shared()
+        request = RequestFactory().post("/", REMOTE_ADDR="10.0.0.1")
+        ratelimit.admit(request, 1, "message")
+        with self.assertRaises(ratelimit.Overloaded) as ctx:
+            ratelimit.admit(request, 1, "message")
+        self.assertGreater(ctx.exception.retry_after, 0)
+        ratelimit.admit(request, 2, "message")
+
+
+@override_settings(UPSTREAM_MAX_INFLIGHT=1)
+class UpstreamSlotTests(RateLimitTestCase):
+    def test_refuses_process_local_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            with ratelimit.upstream_slot():
+                pass
+
+    def test_strict_slot_sheds_and_releases(self):
+        self._shared()
+        with ratelimit.upstream_slot():
+            self.assertTrue(ratelimit.upstream_saturated())
+            with self.assertRaises(ratelimit.Overloaded):
+                with ratelimit.upstream_slot():
+                    pass
+            with ratelimit.upstream_slot(strict=False):
+                self.assertEqual(cache.get(ratelimit.INFLIGHT_KEY), 2)
+        self.assertEqual(cache.get(ratelimit.INFLIGHT_KEY), 0)
+
+    @override_settings(UPSTREAM_INFLIGHT_TTL=300)
+    def test_every_acquisition_refreshes_the_counter_ttl(self):
+        self._shared()
+        key = cache.make_key(ratelimit.INFLIGHT_KEY)
+        with ratelimit.upstream_slot():
+            # About to expire while the first slot is still held.
+            cache.touch(ratelimit.INFLIGHT_KEY, 1)
+            with ratelimit.upstream_slot(strict=False):
+                self.assertGreater(cache._expire_info[key], time.time() + 290)
+                self.assertEqual(cache.get(ratelimit.INFLIGHT_KEY), 2)
+        self.assertEqual(cache.get(ratelimit.INFLIGHT_KEY), 0)
+
+    async def test_async_slot_releases(self):
+        self._shared()
+        async with ratelimit.aupstream_slot():
+            self.assertEqual(await cache.aget(ratelimit.INFLIGHT_KEY), 1)
+        self.assertEqual(await cache.aget(ratelimit.INFLIGHT_KEY), 0)
+
+
+class SharedLimitCheckTests(SimpleTestCase):
+    @override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMIT_BACKEND="cache", UPSTREAM_MAX_INFLIGHT=8)
+    def test_process_local_cache_is_an_error(self):
+        ids = [error.id for error in checks.check_shared_limits(None)]
+        self.assertEqual(ids, ["chatbox_app.E001", "chatbox_app.E002"])
+
+    @override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMIT_BACKEND="redis", UPSTREAM_MAX_INFLIGHT=0)
+    def test_redis_backend_passes(self):
+        self.assertEqual(checks.check_shared_limits(None), [])
+
+    @override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMIT_BACKEND="cache", UPSTREAM_MAX_INFLIGHT=8)
+    def test_atomic_cache_passes(self):
+        with mock.patch("chatbox_app.checks.is_atomic", return_value=True):
+            self.assertEqual(checks.check_shared_limits(None), [])
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+import requests
+
+from chatbox_app import reconcile
+from chatbox_app.models import ChatSession, GeneratedVideo, WebhookDelivery
+
+
+def status_response(data, status_code: int = 200) -> mock.Mock:
+    response = mock.Mock(status_code=status_code)
+    response.json.return_value = data
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError(f"{status_code}", response=response)
+    return response
+
+
+@override_settings(
+    AI_VIDEO_STATUS_URL="https://ai.example.test/videos/status",
+    AI_VIDEO_STATUS_LOOKUP_BATCH=2,
+    VIDEO_PROMPT_CACHE_TTL=0,
+)
+class ReconcileTests(TransactionTestCase):
+    # Lookups run on pool threads with their own connections, so rows must really be committed.
+    def setUp(self):
+        self.session = ChatSession.objects.create(name="Vidéos")
+
+    def _video(self, age: timedelta, **fields) -> GeneratedVideo:
+        video = GeneratedVideo.objects.create(session=self.session, prompt="Un chat", **fields)
+        stamp = timezone.now() - age
+        GeneratedVideo.objects.filter(pk=video.pk).update(created_at=stamp, updated_at=stamp)
+        return video
+
+    def _run(self, **options) -> reconcile.ReconcileStats:
+        options = {"stale_after": 600, "deadline": 86400, "batch_size": 2, "concurrency": 1, **options}
+        return reconcile.reconcile(**options)
+
+    def test_scan_pages_through_stale_rows_only(self):
+        stale = [self._video(timedelta(hours=1)) for _ in range(3)]
+        self._video(timedelta(seconds=10))
+        self._video(timedelta(hours=1), status=GeneratedVideo.STATUS_COMPLETED)
+
+        pages = list(reconcile.scan_stuck(timezone.now() - timedelta(minutes=10), 2))
+
+        self.assertEqual([len(page) for page in pages], [2, 1])
+        self.assertEqual({video.pk for page in pages for video in page}, {video.pk for video in stale})
+
+    def test_applies_batched_lookups(self):
+        done = self._video(timedelta(hours=1), external_id="job-1")
+        failed = self._video(timedelta(hours=1), external_id="job-2", status=GeneratedVideo.STATUS_PROCESSING)
+        running = self._video(timedelta(hours=1), external_id="job-3")
+        jobs = [
+            {"id": "job-1", "status": "completed", "video_url": "https://cdn.example.test/1.mp4"},
+            {"id": "job-2", "status": "failed"},
+            {"id": "job-3", "status": "processing"},
+        ]
+        with mock.patch.object(reconcile.http_client, "post", return_value=status_response(jobs)) as post:
+            stats = self._run()
+
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(stats.looked_up, 3)
+        done.refresh_from_db()
+        failed.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(done.status, GeneratedVideo.STATUS_COMPLETED)
+        self.assertEqual(done.video_url, "https://cdn.example.test/1.mp4")
+        self.assertEqual(failed.status, GeneratedVideo.STATUS_FAILED)
+        self.assertEqual(running.status, GeneratedVideo.STATUS_PENDING)
+
+    def test_expires_rows_past_deadline(self):
+        video = self._video(timedelta(days=2))
+        delivery = WebhookDelivery.objects.create(kind=WebhookDelivery.KIND_VIDEO, video=video, payload={})
+
+        stats = self._run()
+
+        video.refresh_from_db()
+        delivery.refresh_from_db()
+        self.assertEqual(stats.outcomes, {"expired": 1})
+        self.assertEqual(video.status, GeneratedVideo.STATUS_FAILED)
+        self.assertEqual(delivery.status, WebhookDelivery.STATUS_FAILED)
+
+    def test_queued_delivery_is_left_to_the_outbox(self):
+        video = self._video(timedelta(hours=1))
+        WebhookDelivery.objects.create(kind=WebhookDelivery.KIND_VIDEO, video=video, payload={})
+        self.assertEqual(self._run().unchanged, 1)
+
+    def test_follower_takes_leader_result(self):
+        leader = self._video(
+            timedelta(hours=1), status=GeneratedVideo.STATUS_COMPLETED, video_url="https://cdn.example.test/l.mp4"
+        )
+        follower = self._video(timedelta(hours=1), coalesced_into=leader)
+        self._run()
+        follower.refresh_from_db()
+        self.assertEqual(follower.video_url, leader.video_url)
+
+    def test_lookup_errors_are_counted_not_raised(self):
+        self._video(timedelta(hours=1), external_id="job-1")
+        with mock.patch.object(reconcile.http_client, "post", return_value=status_response({}, 502)):
+            stats = self._run()
+        self.assertEqual((stats.lookup_errors, stats.unchanged), (1, 1))
+
+    def test_dry_run_changes_nothing(self):
+        video = self._video(timedelta(days=2))
+        self.assertEqual(self._run(dry_run=True).outcomes, {"expired": 1})
+        video.refresh_from_db()
+        self.assertEqual(video.status, GeneratedVideo.STATUS_PENDING)
+
+    @override_settings(AI_VIDEO_STATUS_URL="https://ai.example.test/videos/{external_id}")
+    def test_per_job_url_and_missing_job(self):
+        video = self._video(timedelta(hours=1), external_id="job-9")
+        with mock.patch.object(reconcile.http_client, "get", return_value=status_response({}, 404)) as get:
+            self._run()
+        get.assert_called_once()
+        self.assertEqual(get.call_args.args[0], "https://ai.example.test/videos/job-9")
+        video.refresh_from_db()
+        self.assertEqual(video.status, GeneratedVideo.STATUS_FAILED)
+
+    def test_command_validates_options(self):
+        with self.assertRaises(CommandError):
+            call_command("reconcile_videos", deadline=60, stale_after=600, stdout=StringIO())
+        out = StringIO()
+        call_command("reconcile_videos", stdout=out)
+        self.assertIn("0 vidéo(s) examinée(s)", out.getvalue())
+
+
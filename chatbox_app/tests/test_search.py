@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from chatbox_app import search
+from chatbox_app.models import ChatSession, GeneratedVideo, Message
+from chatbox_app.stemming import stem_text
+
+
+class StemmingTests(SimpleTestCase):
+    def test_inflections_share_a_stem(self):
+        self.assertEqual(stem_text("chevaux"), stem_text("cheval"))
+        self.assertEqual(stem_text("Heureuses"), stem_text("heureux"))
+        self.assertEqual(stem_text("Élégante"), stem_text("elegant"))
+
+    def test_stop_words_are_dropped(self):
+        self.assertEqual(stem_text("le chat et la souris"), "chat souri")
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.session = ChatSession.objects.create(name="Recherche")
+        self.other = ChatSession.objects.create(name="Autre")
+        self.message = Message.objects.create(session=self.session, content="Les chevaux galopent dans la prairie")
+        self.video = GeneratedVideo.objects.create(
+            session=self.other, prompt="Un cheval élégant au coucher du soleil"
+        )
+        Message.objects.create(session=self.other, content="Rien à voir ici")
+        self.url = reverse("chatbox_app:search")
+
+    def test_matches_messages_and_prompts_across_inflections(self):
+        results = {(item["type"], item["id"]) for item in self.client.get(self.url, {"q": "cheval"}).json()["results"]}
+        self.assertEqual(results, {("message", self.message.pk), ("video", self.video.pk)})
+
+    def test_accents_are_ignored(self):
+        [result] = self.client.get(self.url, {"q": "elegant"}).json()["results"]
+        self.assertEqual((result["type"], result["session_name"]), ("video", "Autre"))
+        self.assertIn("<mark>", result["snippet"])
+
+    def test_session_filter(self):
+        response = self.client.get(self.url, {"q": "cheval", "session": self.session.pk})
+        self.assertEqual([item["id"] for item in response.json()["results"]], [self.message.pk])
+
+    def test_edits_and_deletions_update_the_index(self):
+        self.message.content = "Une licorne dans la prairie"
+        self.message.save()
+        self.assertEqual([r.object_id for r in search.search("licorne")], [self.message.pk])
+        self.assertEqual([r.kind for r in search.search("chevaux")], ["video"])
+        self.video.delete()
+        self.assertEqual(search.search("chevaux"), [])
+
+    def test_short_or_invalid_queries(self):
+        self.assertEqual(self.client.get(self.url, {"q": "a"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"q": "cheval", "limit": "x"}).status_code, 400)
+
+    def test_rebuild(self):
+        search.unindex_object("message", self.message.pk)
+        self.assertEqual(search.rebuild(), 3)
+        self.assertEqual([r.object_id for r in search.search("prairie")], [self.message.pk])
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import io
+import json
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+import requests
+
+from chatbox_app import views, webhooks
+from chatbox_app.models import ChatSession, Message, WebhookDelivery
+
+
+def _response(body: bytes, content_type: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.headers["Content-Type"] = content_type
+    response.raw = io.BytesIO(body)
+    return response
+
+
+def parse_events(body: str) -> list[tuple[str, dict]]:
+    parsed = []
+    for block in body.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if "event" in fields:
+            parsed.append((fields["event"], json.loads(fields["data"])))
+    return parsed
+
+
+class ReplyChunkTests(TestCase):
+    def test_server_sent_events(self):
+        body = b'data: {"delta": "Bon"}\n\ndata: {"choices": [{"delta": {"content": "jour"}}]}\n\ndata: [DONE]\n\n'
+        chunks = webhooks.iter_reply_chunks(_response(body, "text/event-stream"))
+        self.assertEqual(list(chunks), ["Bon", "jour"])
+
+    def test_ndjson(self):
+        body = '{"token": "Ça "}\n{"token": "va"}\n'.encode()
+        self.assertEqual(list(webhooks.iter_reply_chunks(_response(body, "application/x-ndjson"))), ["Ça ", "va"])
+
+    def test_plain_json_reply(self):
+        body = b'{"reply": "Bonjour"}'
+        self.assertEqual(list(webhooks.iter_reply_chunks(_response(body, "application/json"))), ["Bonjour"])
+
+    def test_plain_text(self):
+        self.assertEqual("".join(webhooks.iter_reply_chunks(_response(b"Salut", "text/plain"))), "Salut")
+
+
+@override_settings(
+    AI_MESSAGE_WEBHOOK_URL="https://ai.example.test/message",
+    RATE_LIMIT_ENABLED=False,
+    UPSTREAM_MAX_INFLIGHT=0,
+    CONVERSATION_CONTEXT_ENABLED=False,
+    AI_CALLBACK_SECRET="",
+)
+class StreamReplyTests(TestCase):
+    def setUp(self):
+        self.session = ChatSession.objects.create(name="Flux")
+        self.url = reverse("chatbox_app:stream_reply", args=[self.session.pk])
+
+    def _stream(self, chunks):
+        def fake(message_id, payload):
+            yield from chunks
+
+        with mock.patch.object(views, "stream_message_reply", side_effect=fake) as upstream:
+            response = self.client.post(self.url, {"content": "Bonjour"})
+            body = b"".join(response.streaming_content).decode()
+        return response, parse_events(body), upstream
+
+    def test_reply_is_streamed_and_saved(self):
+        response, events, upstream = self._stream(["Bon", "jour"])
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual([name for name, _ in events], ["message", "delta", "delta", "done"])
+        self.assertEqual(events[1][1], {"text": "Bon"})
+        reply = Message.objects.get(session=self.session, sender=Message.ASSISTANT)
+        self.assertEqual(reply.content, "Bonjour")
+        self.assertEqual(events[-1][1]["id"], reply.pk)
+        message_id, payload = upstream.call_args.args
+        self.assertEqual(payload["content"], "Bonjour")
+
+    def test_failure_before_first_chunk_is_queued(self):
+        def failing(message_id, payload):
+            raise requests.ConnectionError("connexion refusée")
+            yield
+
+        with mock.patch.object(views, "stream_message_reply", side_effect=failing):
+            response = self.client.post(self.url, {"content": "Bonjour"})
+            events = parse_events(b"".join(response.streaming_content).decode())
+        self.assertEqual(events[-1][0], "error")
+        self.assertTrue(WebhookDelivery.objects.filter(message__session=self.session).exists())
+        self.assertFalse(Message.objects.filter(session=self.session, sender=Message.ASSISTANT).exists())
+
+    def test_empty_reply(self):
+        _, events, _ = self._stream([])
+        self.assertEqual(events[-1], ("done", {"id": None, "html": ""}))
+
+    def test_get_is_not_allowed(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+    async def test_asgi_stream(self):
+        async def fake(message_id, payload):
+            for text in ("Bon", "jour"):
+                yield text
+
+        with mock.patch.object(views, "astream_message_reply", side_effect=fake):
+            response = await self.async_client.post(self.url, {"content": "Bonjour"})
+            body = "".join([chunk.decode() async for chunk in response.streaming_content])
+        self.assertEqual([name for name, _ in parse_events(body)], ["message", "delta", "delta", "done"])
+        reply = await Message.objects.aget(session=self.session, sender=Message.ASSISTANT)
+        self.assertEqual(reply.content, "Bonjour")
+
+
+@override_settings(
+    AI_MESSAGE_WEBHOOK_URL="https://ai.example.test/message",
+    AI_MESSAGE_WEBHOOK_METHOD="POST",
+    RATE_LIMIT_ENABLED=False,
+    UPSTREAM_MAX_INFLIGHT=0,
+    CONVERSATION_CONTEXT_ENABLED=True,
+    AI_CALLBACK_SECRET="",
+)
+class StreamReplyContextTests(TestCase):
+    def setUp(self):
+        caches["conversations"].clear()
+        self.session = ChatSession.objects.create(name="Contexte")
+        Message.objects.create(session=self.session, content="Je m'appelle Léa")
+        Message.objects.create(session=self.session, sender=Message.ASSISTANT, content="Enchanté, Léa")
+        self.url = reverse("chatbox_app:stream_reply", args=[self.session.pk])
+
+    def _history(self, payload: dict) -> list[str]:
+        return [turn["content"] for turn in payload["context"]["turns"]]
+
+    async def test_asgi_stream_sends_context(self):
+        async def fake(message_id, payload):
+            yield "Oui"
+
+        with mock.patch.object(views, "astream_message_reply", side_effect=fake) as upstream:
+            response = await self.async_client.post(self.url, {"content": "Comment je m'appelle ?"})
+            body = "".join([chunk.decode() async for chunk in response.streaming_content])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(parse_events(body)[-1][0], "done")
+        self.assertEqual(self._history(upstream.call_args.args[1]), ["Je m'appelle Léa", "Enchanté, Léa"])
+
+    def test_wsgi_stream_sends_context(self):
+        def fake(message_id, payload):
+            yield "Oui"
+
+        with mock.patch.object(views, "stream_message_reply", side_effect=fake) as upstream:
+            response = self.client.post(self.url, {"content": "Comment je m'appelle ?"})
+            b"".join(response.streaming_content)
+        self.assertEqual(self._history(upstream.call_args.args[1]), ["Je m'appelle Léa", "Enchanté, Léa"])
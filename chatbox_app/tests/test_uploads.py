@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import hashlib
+from datetime import timedelta
+from io import StringIO
+
+from django.core.files import locks
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from chatbox_app import uploads
+from chatbox_app.models import AttachmentUpload, ChatSession, Message
+from .utils import TempMediaMixin
+
+
+CONTENT = b"Bonjour, ceci est une piece jointe decoupee en fragments.\n" * 3
+
+
+@override_settings(
+    UPLOAD_CHUNK_SIZE=64,
+    UPLOAD_MAX_SIZES={"default": 1024},
+    RATE_LIMIT_ENABLED=False,
+    AI_MESSAGE_WEBHOOK_URL="",
+    CONVERSATION_CONTEXT_ENABLED=False,
+)
+class ChunkedUploadTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.session = ChatSession.objects.create(name="Fichiers")
+
+    def _start(self, size: int = len(CONTENT), filename: str = "notes.txt") -> dict:
+        response = self.client.post(
+            reverse("chatbox_app:upload_start", args=[self.session.pk]), {"filename": filename, "size": size}
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def _put(self, state: dict, start: int, data: bytes, total: int = len(CONTENT)):
+        return self.client.put(
+            state["upload_url"],
+            data,
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{start + len(data) - 1}/{total}",
+        )
+
+    def _upload_all(self, state: dict) -> None:
+        for start in range(0, len(CONTENT), 64):
+            self.assertEqual(self._put(state, start, CONTENT[start:start + 64]).status_code, 200)
+
+    def test_upload_in_chunks_and_complete(self):
+        state = self._start()
+        self._upload_all(state)
+        upload = AttachmentUpload.objects.get(pk=state["id"])
+        self.assertEqual(upload.received, len(CONTENT))
+
+        response = self.client.post(state["complete_url"], {"content": "Voici le fichier"})
+        self.assertEqual(response.status_code, 201)
+        upload.refresh_from_db()
+        self.assertEqual(upload.sha256, hashlib.sha256(CONTENT).hexdigest())
+        message = Message.objects.get(pk=response.json()["message_id"])
+        self.assertEqual(message.attachment_name, "notes.txt")
+        self.assertEqual(message.blob.sha256, upload.sha256)
+        with message.blob.file.open("rb") as handle:
+            self.assertEqual(handle.read(), CONTENT)
+        self.assertFalse(uploads.partial_path(upload).exists())
+        self.assertEqual(self.client.post(state["complete_url"]).json()["message_id"], message.pk)
+
+    def test_hash_does_not_depend_on_previous_chunk_process(self):
+        state = self._start()
+        self._put(state, 0, CONTENT[:64])
+        upload = AttachmentUpload.objects.get(pk=state["id"])
+        uploads.write_chunk(upload, _Stream(CONTENT[64:128]), 64, 64)
+        upload = AttachmentUpload.objects.get(pk=state["id"])
+        uploads.write_chunk(upload, _Stream(CONTENT[128:]), 128, len(CONTENT) - 128)
+        upload.refresh_from_db()
+        self.assertEqual(upload.sha256, "")
+        blob = uploads.store_upload(upload)
+        self.assertEqual(blob.sha256, hashlib.sha256(CONTENT).hexdigest())
+
+    def test_wrong_offset_reports_resume_point(self):
+        state = self._start()
+        self._put(state, 0, CONTENT[:64])
+        response = self._put(state, 128, CONTENT[128:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["offset"], 64)
+        self.assertEqual(self.client.get(state["upload_url"]).json()["offset"], 64)
+
+    def test_resending_a_chunk_is_rejected(self):
+        state = self._start()
+        self._put(state, 0, CONTENT[:64])
+        self.assertEqual(self._put(state, 0, CONTENT[:64]).status_code, 409)
+
+    def test_chunk_sent_twice_concurrently_is_rejected(self):
+        state = self._start()
+        stale = AttachmentUpload.objects.get(pk=state["id"])
+        self._put(state, 0, CONTENT[:64])
+
+        # The stale copy still expects offset 0, as a PUT racing the first one would.
+        with self.assertRaises(uploads.UploadError) as raised:
+            uploads.write_chunk(stale, _Stream(b"x" * 64), 0, 64)
+        self.assertEqual((raised.exception.status, raised.exception.offset), (409, 64))
+        self.assertEqual(uploads.partial_path(stale).read_bytes(), CONTENT[:64])
+
+    def test_chunk_is_refused_while_another_is_written(self):
+        state = self._start()
+        upload = AttachmentUpload.objects.get(pk=state["id"])
+        with uploads.partial_path(upload).open("rb") as handle:
+            locks.lock(handle, locks.LOCK_EX)
+            response = self._put(state, 0, CONTENT[:64])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["offset"], 0)
+        self.assertEqual(self._put(state, 0, CONTENT[:64]).status_code, 200)
+
+    def test_expired_uploads_are_reaped(self):
+        expired, active = self._start(), self._start()
+        self._put(expired, 0, CONTENT[:64])
+        AttachmentUpload.objects.filter(pk=expired["id"]).update(updated_at=timezone.now() - timedelta(days=2))
+        upload = AttachmentUpload.objects.get(pk=expired["id"])
+
+        out = StringIO()
+        call_command("gc_blobs", stdout=out)
+
+        self.assertIn("1 téléversement(s) expiré(s) supprimé(s)", out.getvalue())
+        self.assertFalse(AttachmentUpload.objects.filter(pk=expired["id"]).exists())
+        self.assertFalse(uploads.partial_path(upload).exists())
+        self.assertTrue(AttachmentUpload.objects.filter(pk=active["id"]).exists())
+        self.assertEqual(self._put(expired, 64, CONTENT[64:128]).status_code, 404)
+
+    def test_oversized_chunk(self):
+        state = self._start()
+        self.assertEqual(self._put(state, 0, CONTENT[:65]).status_code, 413)
+
+    def test_announced_size_over_limit(self):
+        response = self.client.post(
+            reverse("chatbox_app:upload_start", args=[self.session.pk]), {"filename": "gros.bin", "size": 4096}
+        )
+        self.assertEqual(response.status_code, 413)
+
+    def test_incomplete_upload_cannot_complete(self):
+        state = self._start()
+        self._put(state, 0, CONTENT[:64])
+        self.assertEqual(self.client.post(state["complete_url"]).status_code, 409)
+
+    def test_abort_removes_partial_file(self):
+        state = self._start()
+        self._put(state, 0, CONTENT[:64])
+        upload = AttachmentUpload.objects.get(pk=state["id"])
+        self.assertEqual(self.client.delete(state["upload_url"]).status_code, 204)
+        self.assertFalse(uploads.partial_path(upload).exists())
+        self.assertFalse(AttachmentUpload.objects.filter(pk=upload.pk).exists())
+
+
+class _Stream:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def read(self, size: int) -> bytes:
+        block, self._data = self._data[:size], self._data[size:]
+        return block
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from chatbox_app import video_cache
+from chatbox_app.models import ChatSession, GeneratedVideo
+
+
+@override_settings(VIDEO_PROMPT_CACHE_TTL=3600, VIDEO_COALESCE_WINDOW=3600)
+class VideoCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches["video_prompts"].clear()
+        self.session = ChatSession.objects.create(name="Vidéos")
+
+    def _complete(self, video: GeneratedVideo) -> None:
+        video.status = GeneratedVideo.STATUS_COMPLETED
+        video.video_url = "https://cdn.example.test/chat.mp4"
+        video.save()
+        video_cache.propagate(video)
+
+    def test_normalized_prompts_share_a_hash(self):
+        self.assertEqual(video_cache.prompt_hash("Un  Chat\tqui danse "), video_cache.prompt_hash("un chat qui danse"))
+
+    def test_identical_prompts_coalesce_then_hit(self):
+        leader, dispatch = video_cache.create_video(self.session, "Un chat qui danse")
+        self.assertTrue(dispatch)
+        follower, dispatch = video_cache.create_video(self.session, "un chat  qui danse")
+        self.assertFalse(dispatch)
+        self.assertEqual(follower.coalesced_into_id, leader.pk)
+
+        self._complete(leader)
+        follower.refresh_from_db()
+        self.assertEqual((follower.status, follower.video_url), (leader.status, leader.video_url))
+
+        cached, dispatch = video_cache.create_video(self.session, "UN CHAT QUI DANSE")
+        self.assertFalse(dispatch)
+        self.assertEqual(cached.status, GeneratedVideo.STATUS_COMPLETED)
+        self.assertIsNone(cached.coalesced_into_id)
+
+    def test_failed_leader_is_not_reused(self):
+        leader, _ = video_cache.create_video(self.session, "Un chien")
+        GeneratedVideo.objects.filter(pk=leader.pk).update(status=GeneratedVideo.STATUS_FAILED)
+        _, dispatch = video_cache.create_video(self.session, "Un chien")
+        self.assertTrue(dispatch)
+
+    def test_oldest_row_leads_without_shared_cache(self):
+        first = GeneratedVideo.objects.create(session=self.session, prompt="Un chat", prompt_hash="h")
+        second = GeneratedVideo.objects.create(session=self.session, prompt="Un chat", prompt_hash="h")
+        self.assertTrue(video_cache._claim_flight("h", first))
+        self.assertFalse(video_cache._claim_flight("h", second))
+
+    def test_racing_request_follows_visible_leader(self):
+        digest = video_cache.prompt_hash("Un chat")
+        leader = GeneratedVideo.objects.create(session=self.session, prompt="Un chat", prompt_hash=digest)
+        with mock.patch.object(video_cache, "_leader", side_effect=[None, leader, leader]):
+            video, dispatch = video_cache.create_video(self.session, "Un chat")
+        self.assertFalse(dispatch)
+        self.assertEqual(video.coalesced_into_id, leader.pk)
+
+    @mock.patch("chatbox_app.video_cache.is_atomic", return_value=True)
+    def test_flight_key_with_shared_cache(self, is_atomic):
+        leader, dispatch = video_cache.create_video(self.session, "Un oiseau")
+        self.assertTrue(dispatch)
+        self.assertEqual(cache.get(video_cache._flight_key(leader.prompt_hash)), leader.pk)
+        self._complete(leader)
+        self.assertIsNone(cache.get(video_cache._flight_key(leader.prompt_hash)))
+
+    def test_stats_command_requires_shared_cache(self):
+        with self.assertRaises(CommandError):
+            call_command("video_cache_stats", stdout=StringIO())
+
+    @mock.patch("chatbox_app.management.commands.video_cache_stats.is_atomic", return_value=True)
+    def test_stats_command(self, is_atomic):
+        video_cache.create_video(self.session, "Un poisson")
+        video_cache.create_video(self.session, "Un poisson")
+        out = StringIO()
+        call_command("video_cache_stats", "--reset", stdout=out)
+        self.assertIn("regroupements : 1, appels amont : 1", out.getvalue())
+        self.assertEqual(video_cache.stats(), {"hit": 0, "miss": 0, "coalesced": 0})
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from chatbox_app import status_cache
+from chatbox_app.models import ChatSession, GeneratedVideo
+
+
+class VideoStatusTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.session = ChatSession.objects.create(name="Statuts")
+        self.video = GeneratedVideo.objects.create(session=self.session, prompt="Un chat")
+        self.url = reverse("chatbox_app:video_status", args=[self.video.pk])
+
+    def _complete_out_of_band(self):
+        GeneratedVideo.objects.filter(pk=self.video.pk).update(
+            status=GeneratedVideo.STATUS_COMPLETED, video_url="https://cdn.example.test/chat.mp4"
+        )
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()["status"], GeneratedVideo.STATUS_PENDING)
+        etag = response["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_unknown_video(self):
+        self.assertEqual(self.client.get(reverse("chatbox_app:video_status", args=[999])).status_code, 404)
+
+    def test_out_of_band_update_is_served_with_per_process_cache(self):
+        etag = self.client.get(self.url)["ETag"]
+        self._complete_out_of_band()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], GeneratedVideo.STATUS_COMPLETED)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_batch_status(self):
+        other = GeneratedVideo.objects.create(session=self.session, prompt="Un chien")
+        url = reverse("chatbox_app:video_status_batch")
+        response = self.client.get(url, {"ids": f"{other.pk},{self.video.pk},999"})
+        self.assertEqual(set(response.json()["videos"]), {str(self.video.pk), str(other.pk)})
+        ids = {"ids": f"{self.video.pk},{other.pk}"}
+        self.assertEqual(self.client.get(url, ids, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+        self._complete_out_of_band()
+        response = self.client.get(url, ids, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["videos"][str(self.video.pk)]["status"], GeneratedVideo.STATUS_COMPLETED)
+
+    def test_batch_rejects_invalid_ids(self):
+        url = reverse("chatbox_app:video_status_batch")
+        self.assertEqual(self.client.get(url, {"ids": "1,x"}).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+    def test_per_process_cache_stores_nothing(self):
+        status_cache.get_entries([self.video.pk])
+        self.assertIsNone(cache.get(status_cache._key(self.video.pk)))
+
+
+@mock.patch("chatbox_app.status_cache.is_shared", return_value=True)
+class SharedStatusCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.session = ChatSession.objects.create(name="Statuts")
+        self.video = GeneratedVideo.objects.create(session=self.session, prompt="Un chat")
+
+    def test_save_refreshes_entry(self, is_shared):
+        first = status_cache.get_entry(self.video.pk)
+        self.assertEqual(cache.get(status_cache._key(self.video.pk)), first)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.video.status = GeneratedVideo.STATUS_FAILED
+            self.video.save()
+        entry = status_cache.get_entry(self.video.pk)
+        self.assertEqual(entry["payload"]["status"], GeneratedVideo.STATUS_FAILED)
+        self.assertNotEqual(entry["etag"], first["etag"])
+
+    def test_entries_are_served_from_cache(self, is_shared):
+        status_cache.get_entries([self.video.pk])
+        with self.assertNumQueries(0):
+            self.assertIn(self.video.pk, status_cache.get_entries([self.video.pk]))
+
+    def test_invalidate_many(self, is_shared):
+        status_cache.get_entry(self.video.pk)
+        status_cache.invalidate_many([self.video.pk])
+        self.assertIsNone(cache.get(status_cache._key(self.video.pk)))
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test import override_settings
+
+
+class TempMediaMixin:
+    # Uploads, blobs and archives go to a throwaway directory; templates render without a static manifest.
+    def setUp(self):
+        super().setUp()
+        root = Path(tempfile.mkdtemp(prefix="chatbox-tests-"))
+        self.addCleanup(shutil.rmtree, root, True)
+        self.media_root = root / "media"
+        self.archive_root = root / "archive"
+        storages = dict(
+            settings.STORAGES,
+            archives={
+                "BACKEND": "django.core.files.storage.FileSystemStorage",
+                "OPTIONS": {"location": str(self.archive_root), "base_url": None},
+            },
+            staticfiles={"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+        )
+        override = override_settings(MEDIA_ROOT=self.media_root, STORAGES=storages)
+        override.enable()
+        self.addCleanup(override.disable)
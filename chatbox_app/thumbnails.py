@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import io
+import shutil
+import subprocess
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps
+
+
+class PreviewUnavailable(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class PreviewOptions:
+    max_size: int
+    quality: int
+    ffmpeg: str
+    video_offset: float
+
+
+def preview_name(sha256: str, max_size: int) -> str:
+    return f"previews/{sha256[:2]}/{sha256[2:4]}/{sha256}-{max_size}.webp"
+
+
+def _video_frame(source: str, options: PreviewOptions) -> Image.Image:
+    ffmpeg = shutil.which(options.ffmpeg)
+    if ffmpeg is None:
+        raise PreviewUnavailable(f"{options.ffmpeg} introuvable")
+    # Clips shorter than the offset yield no frame, so fall back to the first one.
+    for offset in (options.video_offset, 0):
+        completed = subprocess.run(
+            [ffmpeg, "-v", "error", "-ss", str(offset), "-i", source, "-frames:v", "1",
+             "-f", "image2pipe", "-vcodec", "png", "-"],
+            capture_output=True,
+            timeout=60,
+            check=True,
+        )
+        if completed.stdout:
+            return Image.open(io.BytesIO(completed.stdout))
+    raise PreviewUnavailable("Aucune image extraite de la vidéo")
+
+
+def render_preview(source: str, content_type: str, options: PreviewOptions) -> tuple[bytes, int, int]:
+    if content_type.startswith("video/"):
+        image = _video_frame(source, options)
+    else:
+        image = Image.open(source)
+        image.draft("RGB", (options.max_size, options.max_size))
+        image = ImageOps.exif_transpose(image)
+    image.thumbnail((options.max_size, options.max_size))
+    if image.mode not in {"RGB", "RGBA"}:
+        image = image.convert("RGBA" if image.mode in {"LA", "PA"} or "transparency" in image.info else "RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, "WEBP", quality=options.quality, method=4)
+    return buffer.getvalue(), image.width, image.height
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from django.conf import settings
+from django.core.files import File, locks
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from .models import AttachmentBlob, AttachmentUpload
+from .sniffing import SNIFF_BYTES, sniff_mime
+from .storage import blob_storage, hash_file
+
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK = 64 * 1024
+PARTIAL_DIR = "uploads/partial"
+
+ARCHIVE_TYPES = {
+    "application/zip",
+    "application/gzip",
+    "application/x-7z-compressed",
+    "application/x-rar-compressed",
+    "application/x-tar",
+}
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+class UploadError(Exception):
+    def __init__(self, message: str, status: int = 400, offset: int | None = None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def size_category(mime_type: str) -> str:
+    if mime_type.startswith("video/"):
+        return "video"
+    if mime_type.startswith("image/"):
+        return "image"
+    if mime_type in ARCHIVE_TYPES:
+        return "archive"
+    return "default"
+
+
+def size_limit(mime_type: str) -> int:
+    limits = getattr(settings, "UPLOAD_MAX_SIZES", {})
+    return limits.get(size_category(mime_type), limits.get("default", 50 * 1024 * 1024))
+
+
+def max_upload_size() -> int:
+    limits = getattr(settings, "UPLOAD_MAX_SIZES", {})
+    return max(limits.values(), default=50 * 1024 * 1024)
+
+
+def chunk_size() -> int:
+    return getattr(settings, "UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024)
+
+
+def check_size(mime_type: str, size: int) -> None:
+    limit = size_limit(mime_type)
+    if size > limit:
+        raise UploadError(
+            f"Fichier trop volumineux pour ce type ({mime_type}) : {filesizeformat(limit)} maximum.",
+            status=413,
+        )
+
+
+def partial_path(upload: AttachmentUpload) -> Path:
+    return Path(blob_storage().path(f"{PARTIAL_DIR}/{upload.pk}.part"))
+
+
+def start_upload(session_id: int, filename: str, size: int) -> AttachmentUpload:
+    filename = os.path.basename(filename or "").strip()[:255]
+    if not filename:
+        raise UploadError("Nom de fichier manquant.")
+    if size <= 0:
+        raise UploadError("Taille de fichier invalide.")
+    if size > max_upload_size():
+        raise UploadError("Fichier trop volumineux.", status=413)
+    upload = AttachmentUpload.objects.create(session_id=session_id, filename=filename, size=size)
+    path = partial_path(upload)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return upload
+
+
+def parse_content_range(header: str, content_length: int) -> tuple[int, int]:
+    match = CONTENT_RANGE_RE.match(header.strip())
+    if not match:
+        raise UploadError("En-tête Content-Range invalide.")
+    start, end, total = (int(value) for value in match.groups())
+    if end < start or end - start + 1 != content_length:
+        raise UploadError("Content-Range ne correspond pas au corps de la requête.")
+    return start, total
+
+
+def expiry_cutoff() -> datetime:
+    return timezone.now() - timedelta(seconds=getattr(settings, "UPLOAD_EXPIRY", 24 * 3600))
+
+
+@contextmanager
+def _locked(upload: AttachmentUpload, blocking: bool = True) -> Iterator[BinaryIO | None]:
+    # An exclusive lock on the partial file serialises writers of the same upload, across processes too.
+    try:
+        handle = partial_path(upload).open("r+b")
+    except FileNotFoundError:
+        yield None
+        return
+    with handle:
+        if not locks.lock(handle, locks.LOCK_EX if blocking else locks.LOCK_EX | locks.LOCK_NB):
+            raise UploadError("Un autre fragment est en cours d'envoi.", status=409, offset=upload.received)
+        yield handle
+
+
+def _check_offset(upload: AttachmentUpload, start: int) -> None:
+    if upload.status != AttachmentUpload.STATUS_UPLOADING:
+        raise UploadError("Ce téléversement est terminé.", status=409)
+    if start != upload.received:
+        raise UploadError("Décalage inattendu.", status=409, offset=upload.received)
+
+
+def write_chunk(upload: AttachmentUpload, stream, start: int, length: int) -> AttachmentUpload:
+    _check_offset(upload, start)
+    if length <= 0:
+        raise UploadError("Fragment vide.")
+    if length > chunk_size():
+        raise UploadError("Fragment trop volumineux.", status=413)
+    if start + length > upload.size:
+        raise UploadError("Le fragment dépasse la taille annoncée.", status=413)
+
+    with _locked(upload, blocking=False) as handle:
+        upload = AttachmentUpload.objects.filter(pk=upload.pk).first() if handle is not None else None
+        if upload is None:
+            raise UploadError("Téléversement introuvable.", status=404)
+        # Checked again under the lock: a chunk sent twice must not truncate the one that got in first.
+        _check_offset(upload, start)
+        content_type = upload.content_type
+        written = 0
+        handle.seek(start)
+        handle.truncate()
+        while written < length:
+            block = stream.read(min(READ_BLOCK, length - written))
+            if not block:
+                break
+            if not content_type:
+                content_type = sniff_mime(block[:SNIFF_BYTES])
+                check_size(content_type, upload.size)
+            handle.write(block)
+            written += len(block)
+        if written != length:
+            handle.truncate(start)
+            raise UploadError("Fragment incomplet.")
+        handle.flush()
+
+        updated = AttachmentUpload.objects.filter(pk=upload.pk, received=start).update(
+            received=start + written, content_type=content_type, updated_at=timezone.now()
+        )
+    if not updated:
+        upload.refresh_from_db(fields=["received"])
+        raise UploadError("Décalage inattendu.", status=409, offset=upload.received)
+    upload.received = start + written
+    upload.content_type = content_type
+    return upload
+
+
+class _PartialFile(File):
+    def temporary_file_path(self) -> str:
+        return self.file.name
+
+
+def store_upload(upload: AttachmentUpload) -> AttachmentBlob:
+    if upload.received != upload.size:
+        raise UploadError("Le fichier n'est pas entièrement téléversé.", status=409, offset=upload.received)
+    path = partial_path(upload)
+    with path.open("rb") as handle:
+        # Hashing here rather than on the last chunk keeps every PUT bounded by the chunk size.
+        upload.sha256, _ = hash_file(handle)
+        # BlobStorage moves files exposing temporary_file_path() instead of copying them.
+        blob = AttachmentBlob.objects.store(_PartialFile(handle), upload.sha256, upload.content_type)
+    deduplicated = path.exists()
+    path.unlink(missing_ok=True)
+    logger.info(
+        "Chunked upload stored",
+        extra={
+            "upload_id": str(upload.pk),
+            "size": upload.size,
+            "content_type": upload.content_type,
+            "deduplicated": deduplicated,
+        },
+    )
+    return blob
+
+
+def abort_upload(upload: AttachmentUpload, stale_before: datetime | None = None) -> bool:
+    # Waits for a chunk still being written, so it neither lands in a deleted file nor saves an upload being reaped.
+    with _locked(upload):
+        pending = AttachmentUpload.objects.filter(pk=upload.pk, status=AttachmentUpload.STATUS_UPLOADING)
+        if stale_before is not None:
+            pending = pending.filter(updated_at__lt=stale_before)
+        deleted, _ = pending.delete()
+        if deleted:
+            partial_path(upload).unlink(missing_ok=True)
+    return bool(deleted)
+
+
+def reap_expired(dry_run: bool = False) -> int:
+    cutoff = expiry_cutoff()
+    expired = AttachmentUpload.objects.filter(status=AttachmentUpload.STATUS_UPLOADING, updated_at__lt=cutoff)
+    reaped = 0
+    for upload in list(expired):
+        if dry_run:
+            reaped += 1
+        elif abort_upload(upload, stale_before=cutoff):
+            reaped += 1
+            logger.info(
+                "Expired upload removed",
+                extra={"upload_id": str(upload.pk), "session_id": upload.session_id, "received": upload.received},
+            )
+    return reaped
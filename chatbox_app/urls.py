@@ -6,6 +6,17 @@ app_name = "chatbox_app"
 
 urlpatterns = [
     path("", views.dashboard, name="dashboard"),
+    path("search/", views.search_content, name="search"),
     path("sessions/<int:session_id>/", views.chat_session, name="chat_session"),
+    path("sessions/<int:session_id>/messages/", views.session_messages, name="session_messages"),
+    path("sessions/<int:session_id>/reply/", views.stream_reply, name="stream_reply"),
+    path("sessions/<int:session_id>/events/", views.session_events, name="session_events"),
+    path("sessions/<int:session_id>/uploads/", views.upload_start, name="upload_start"),
+    path("uploads/<uuid:upload_id>/", views.upload_detail, name="upload_detail"),
+    path("uploads/<uuid:upload_id>/complete/", views.upload_complete, name="upload_complete"),
+    path("videos/status/", views.video_status_batch, name="video_status_batch"),
     path("videos/<int:video_id>/status/", views.video_status, name="video_status"),
+    path("metrics", views.metrics_export, name="metrics"),
+    path("health/upstream/", views.upstream_status, name="upstream_status"),
+    path("callbacks/ai/", views.ai_callback, name="ai_callback"),
 ]
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import unicodedata
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils import timezone
+
+from .models import ChatSession, GeneratedVideo
+from .shared_cache import is_atomic
+
+
+logger = logging.getLogger(__name__)
+
+OUTCOMES = ("hit", "miss", "coalesced")
+IN_FLIGHT = [GeneratedVideo.STATUS_PENDING, GeneratedVideo.STATUS_PROCESSING]
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", prompt).casefold()).strip()
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(normalize_prompt(prompt).encode()).hexdigest()
+
+
+def _results():
+    return caches["video_prompts"]
+
+
+def _result_key(digest: str) -> str:
+    return f"result:{digest}"
+
+
+def _flight_key(digest: str) -> str:
+    return f"chatbox:video-flight:{digest}"
+
+
+def _stats_key(outcome: str) -> str:
+    return f"chatbox:video-prompt:stats:{outcome}"
+
+
+def _ttl() -> int:
+    return getattr(settings, "VIDEO_PROMPT_CACHE_TTL", 86400)
+
+
+def _window() -> int:
+    return getattr(settings, "VIDEO_COALESCE_WINDOW", 3600)
+
+
+def _record(outcome: str, video: GeneratedVideo) -> None:
+    key = _stats_key(outcome)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+    logger.info(
+        "Video prompt cache lookup",
+        extra={"outcome": outcome, "video_id": video.pk, "prompt_hash": video.prompt_hash},
+    )
+
+
+def stats() -> dict[str, int]:
+    return {outcome: cache.get(_stats_key(outcome), 0) for outcome in OUTCOMES}
+
+
+def reset_stats() -> None:
+    cache.delete_many([_stats_key(outcome) for outcome in OUTCOMES])
+
+
+def _leader(digest: str, exclude: int | None = None) -> GeneratedVideo | None:
+    if _window() <= 0:
+        return None
+    leaders = GeneratedVideo.objects.filter(
+        prompt_hash=digest,
+        status__in=IN_FLIGHT,
+        coalesced_into__isnull=True,
+        created_at__gte=timezone.now() - timedelta(seconds=_window()),
+    )
+    if exclude is not None:
+        leaders = leaders.exclude(pk=exclude)
+    return leaders.order_by("pk").first()
+
+
+def _claim_flight(digest: str, video: GeneratedVideo) -> bool:
+    if is_atomic():
+        return cache.add(_flight_key(digest), video.pk, _window())
+    # A per-process lock cannot see other workers: the oldest in-flight row leads and later ones follow it.
+    leader = _leader(digest)
+    return leader is None or leader.pk == video.pk
+
+
+def create_video(session: ChatSession, prompt: str) -> tuple[GeneratedVideo, bool]:
+    digest = prompt_hash(prompt)
+    fields = {"session": session, "prompt": prompt, "prompt_hash": digest}
+
+    video_url = _results().get(_result_key(digest)) if _ttl() > 0 else None
+    if video_url:
+        video = GeneratedVideo.objects.create(**fields, video_url=video_url, status=GeneratedVideo.STATUS_COMPLETED)
+        _record("hit", video)
+        return video, False
+
+    leader = _leader(digest)
+    if leader is None:
+        video = GeneratedVideo.objects.create(**fields, status=GeneratedVideo.STATUS_PENDING)
+        if _window() <= 0 or _claim_flight(digest, video):
+            _record("miss", video)
+            return video, True
+        # Another request claimed the flight between our lookup and insert; follow it if it is visible.
+        leader = _leader(digest, exclude=video.pk)
+        if leader is None:
+            if is_atomic():
+                cache.set(_flight_key(digest), video.pk, _window())
+            _record("miss", video)
+            return video, True
+        GeneratedVideo.objects.filter(pk=video.pk).update(coalesced_into=leader)
+        video.coalesced_into = leader
+    else:
+        video = GeneratedVideo.objects.create(**fields, status=leader.status, coalesced_into=leader)
+    leader.refresh_from_db(fields=["status", "video_url"])
+    if leader.is_terminal:
+        # The leader finished while we attached, after it had already synced its followers.
+        video.status, video.video_url = leader.status, leader.video_url
+        video.save(update_fields=["status", "video_url", "updated_at"])
+    _record("coalesced", video)
+    return video, False
+
+
+def propagate(leader: GeneratedVideo) -> None:
+    if not leader.prompt_hash:
+        return
+    if leader.status == GeneratedVideo.STATUS_COMPLETED and leader.video_url and _ttl() > 0:
+        _results().set(_result_key(leader.prompt_hash), leader.video_url, _ttl())
+    if leader.is_terminal and cache.get(_flight_key(leader.prompt_hash)) == leader.pk:
+        cache.delete(_flight_key(leader.prompt_hash))
+
+    followers = leader.followers.exclude(status=leader.status, video_url=leader.video_url)
+    for follower in followers:
+        follower.status = leader.status
+        follower.video_url = leader.video_url
+        follower.save(update_fields=["status", "video_url", "updated_at"])
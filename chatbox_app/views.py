@@ -1,33 +1,235 @@
 from __future__ import annotations
 
+import json
 import logging
+import math
+import time
+from typing import AsyncIterator, Iterator
 
 from django.conf import settings
 from django.contrib import messages as django_messages
-from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotAllowed,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import parse_etags
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods, require_POST
 
+from asgiref.sync import sync_to_async
+import httpx
 import requests
 
+from . import archive, callbacks, events, fragments, metrics, ratelimit, search, status_cache, uploads, video_cache
+from .breaker import BREAKERS, CircuitBreaker
 from .forms import MessageForm, VideoGenerationForm
-from .models import ChatSession, GeneratedVideo, Message
+from .models import AttachmentUpload, ChatSession, GeneratedVideo, Message
+from .outbox import enqueue_message, enqueue_video
+from .pagination import message_page, session_page
+from .webhooks import (
+    astream_message_reply,
+    build_message_payload,
+    save_assistant_reply,
+    stream_message_reply,
+)
 
 
 logger = logging.getLogger(__name__)
 
+QUEUED_REPLY = "Le service IA est momentanément indisponible ; la réponse arrivera dès son rétablissement."
+
 
 def dashboard(request: HttpRequest) -> HttpResponse:
-    sessions = ChatSession.objects.order_by("-created_at")
     if request.method == "POST":
         name = request.POST.get("name", "").strip()
         session = ChatSession.objects.create(name=name)
         return redirect("chatbox_app:chat_session", session_id=session.pk)
-    return render(request, "chatbox_app/dashboard.html", {"sessions": sessions})
+    after = request.GET.get("after", "")
+    page = session_page(
+        getattr(settings, "DASHBOARD_PAGE_SIZE", 20),
+        sort=request.GET.get("sort", "activity"),
+        query=request.GET.get("q", "").strip()[:255],
+        after=int(after) if after.isdigit() else None,
+    )
+    # COUNT(*) over every session is too slow to run on each hit once the table is large.
+    session_total = cache.get_or_set(
+        "chatbox:dashboard:session-total",
+        ChatSession.objects.count,
+        getattr(settings, "DASHBOARD_COUNT_CACHE_TIMEOUT", 60),
+    )
+    return render(
+        request,
+        "chatbox_app/dashboard.html",
+        {"page": page, "session_total": session_total, "paginated": bool(after)},
+    )
+
+
+async def _aget_session(session_id: int) -> ChatSession:
+    try:
+        session = await ChatSession.objects.aget(pk=session_id)
+    except ChatSession.DoesNotExist:
+        raise Http404("Session introuvable")
+    if session.is_archived:
+        await sync_to_async(archive.rehydrate)(session)
+    return session
+
+
+def _store_message(request: HttpRequest, session: ChatSession, cleaned_data: dict) -> Message:
+    with transaction.atomic():
+        message = Message.objects.create(
+            session=session,
+            sender=Message.USER,
+            content=cleaned_data.get("content", ""),
+            attachment=cleaned_data.get("attachment"),
+            attachment_type=cleaned_data.get("attachment_type", ""),
+            attachment_name=cleaned_data.get("attachment_name", ""),
+            blob=cleaned_data.get("blob"),
+        )
+        attachment_url = request.build_absolute_uri(message.attachment.url) if message.attachment else None
+        enqueue_message(message, attachment_url, _callback_url(request))
+    return message
+
+
+def _upload_state(upload: AttachmentUpload) -> dict:
+    return {
+        "id": str(upload.pk),
+        "filename": upload.filename,
+        "size": upload.size,
+        "offset": upload.received,
+        "content_type": upload.content_type,
+        "chunk_size": uploads.chunk_size(),
+        "upload_url": reverse("chatbox_app:upload_detail", args=[upload.pk]),
+        "complete_url": reverse("chatbox_app:upload_complete", args=[upload.pk]),
+    }
+
+
+def _upload_error(exc: uploads.UploadError) -> JsonResponse:
+    data = {"error": str(exc)}
+    if exc.offset is not None:
+        data["offset"] = exc.offset
+    return JsonResponse(data, status=exc.status)
 
 
-def chat_session(request: HttpRequest, session_id: int) -> HttpResponse:
+def _overloaded(exc: ratelimit.Overloaded, as_json: bool = True) -> HttpResponse:
+    headers = {"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+    if as_json:
+        return JsonResponse({"error": exc.message}, status=429, headers=headers)
+    return HttpResponse(exc.message, status=429, headers=headers, content_type="text/plain; charset=utf-8")
+
+
+@require_POST
+def upload_start(request: HttpRequest, session_id: int) -> JsonResponse:
     session = get_object_or_404(ChatSession, pk=session_id)
+    try:
+        size = int(request.POST.get("size", ""))
+    except ValueError:
+        size = 0
+    try:
+        upload = uploads.start_upload(session.pk, request.POST.get("filename", ""), size)
+    except uploads.UploadError as exc:
+        return _upload_error(exc)
+    return JsonResponse(_upload_state(upload), status=201)
+
+
+@require_http_methods(["GET", "PUT", "DELETE"])
+def upload_detail(request: HttpRequest, upload_id) -> HttpResponse:
+    upload = get_object_or_404(AttachmentUpload, pk=upload_id)
+    if request.method == "GET":
+        return JsonResponse(_upload_state(upload))
+    if request.method == "DELETE":
+        if upload.status == AttachmentUpload.STATUS_UPLOADING:
+            uploads.abort_upload(upload)
+        return HttpResponse(status=204)
+
+    try:
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+        start, total = uploads.parse_content_range(request.headers.get("Content-Range", ""), length)
+        if total != upload.size:
+            raise uploads.UploadError("La taille totale ne correspond pas au téléversement.")
+        # Chunks are read from the request stream; request.body would buffer the whole chunk.
+        upload = uploads.write_chunk(upload, request, start, length)
+    except uploads.UploadError as exc:
+        return _upload_error(exc)
+    return JsonResponse(_upload_state(upload))
+
+
+@require_POST
+def upload_complete(request: HttpRequest, upload_id) -> JsonResponse:
+    with transaction.atomic():
+        upload = get_object_or_404(
+            AttachmentUpload.objects.select_for_update().select_related("session", "message"), pk=upload_id
+        )
+        if upload.message is None:
+            try:
+                ratelimit.admit(request, upload.session_id, "message")
+            except ratelimit.Overloaded as exc:
+                return _overloaded(exc)
+            try:
+                blob = uploads.store_upload(upload)
+            except uploads.UploadError as exc:
+                return _upload_error(exc)
+            upload.message = _store_message(
+                request,
+                upload.session,
+                {
+                    "content": request.POST.get("content", ""),
+                    "attachment": blob.file.name,
+                    "attachment_type": upload.content_type,
+                    "blob": blob,
+                    "attachment_name": upload.filename,
+                },
+            )
+            upload.status = AttachmentUpload.STATUS_COMPLETED
+            upload.save(update_fields=["message", "status", "sha256", "updated_at"])
+    return JsonResponse(
+        {"message_id": upload.message.pk, "html": _render_message(request, upload.message)}, status=201
+    )
+
+
+def _store_video(request: HttpRequest, session: ChatSession, prompt: str) -> GeneratedVideo:
+    with transaction.atomic():
+        video, dispatch = video_cache.create_video(session, prompt)
+        if dispatch:
+            enqueue_video(video, _callback_url(request))
+    return video
+
+
+def _render_chat_session(
+    request: HttpRequest, session: ChatSession, message_form: MessageForm, video_form: VideoGenerationForm
+) -> HttpResponse:
+    page_size = getattr(settings, "CHAT_MESSAGES_PAGE_SIZE", 50)
+    sessions, sidebar_version = fragments.sidebar()
+    # Everything below stays lazy so cached fragments skip their queries entirely.
+    context = {
+        "session": session,
+        "sessions": sessions,
+        "sidebar_version": sidebar_version,
+        "fragment_timeout": fragments.fragment_timeout(),
+        "message_page": SimpleLazyObject(lambda: message_page(session, page_size)),
+        "page_size": page_size,
+        "videos": session.generated_videos.order_by("-created_at"),
+        "message_form": message_form,
+        "streaming_enabled": getattr(settings, "AI_MESSAGE_STREAMING", False),
+        "upload_threshold": getattr(settings, "UPLOAD_CHUNKED_THRESHOLD", 10 * 1024 * 1024),
+        "video_form": video_form,
+    }
+    return render(request, "chatbox_app/chat_session.html", context)
+
+
+async def chat_session(request: HttpRequest, session_id: int) -> HttpResponse:
+    session = await _aget_session(session_id)
     message_form = MessageForm()
     video_form = VideoGenerationForm()
 
@@ -36,253 +238,351 @@ def chat_session(request: HttpRequest, session_id: int) -> HttpResponse:
         if action == "send_message":
             message_form = MessageForm(request.POST, request.FILES)
             if message_form.is_valid():
-                message = Message.objects.create(
-                    session=session,
-                    sender=Message.USER,
-                    content=message_form.cleaned_data.get("content", ""),
-                    attachment=message_form.cleaned_data.get("attachment"),
-                )
                 try:
-                    _dispatch_message_webhook(request, message)
-                except requests.RequestException:
-                    django_messages.error(
-                        request,
-                        "L'envoi du message au service distant a échoué. Veuillez réessayer plus tard.",
-                    )
-                except ValueError:
-                    django_messages.warning(
-                        request,
-                        "Réponse inattendue du service distant. Consultez les journaux pour plus de détails.",
-                    )
+                    await sync_to_async(ratelimit.admit)(request, session.pk, "message")
+                except ratelimit.Overloaded as exc:
+                    return _overloaded(exc, as_json=False)
+                # Django has no async transactions; the message and its outbox row are committed together in a thread.
+                await sync_to_async(_store_message)(request, session, message_form.cleaned_data)
                 return redirect(request.path)
         elif action == "generate_video":
             video_form = VideoGenerationForm(request.POST)
             if video_form.is_valid():
-                prompt = video_form.cleaned_data["prompt"]
-                video = _trigger_video_generation(session, prompt)
-                if video.status == GeneratedVideo.STATUS_FAILED:
-                    django_messages.error(request, "La génération vidéo a échoué. Veuillez réessayer.")
-                else:
-                    django_messages.success(request, "Génération vidéo lancée.")
+                try:
+                    await sync_to_async(ratelimit.admit)(request, session.pk, "video")
+                except ratelimit.Overloaded as exc:
+                    return _overloaded(exc, as_json=False)
+                await sync_to_async(_store_video)(request, session, video_form.cleaned_data["prompt"])
+                django_messages.success(request, "Génération vidéo lancée.")
                 return redirect(request.path)
 
-    chat_messages = session.messages.order_by("created_at")
-    videos = session.generated_videos.order_by("-created_at")
-    context = {
-        "session": session,
-        "sessions": ChatSession.objects.order_by("-created_at")[:10],
-        "chat_messages": chat_messages,
-        "videos": videos,
-        "message_form": message_form,
-        "video_form": video_form,
-    }
-    return render(request, "chatbox_app/chat_session.html", context)
+    return await sync_to_async(_render_chat_session)(request, session, message_form, video_form)
 
 
-def video_status(request: HttpRequest, video_id: int) -> JsonResponse:
-    video = get_object_or_404(GeneratedVideo, pk=video_id)
-    data = {
-        "status": video.status,
-        "video_url": video.video_url,
-        "external_id": video.external_id,
-    }
-    return JsonResponse(data)
-
+async def stream_reply(request: HttpRequest, session_id: int) -> HttpResponse:
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    session = await _aget_session(session_id)
+    message_form = MessageForm(request.POST, request.FILES)
+    if not message_form.is_valid():
+        return JsonResponse({"errors": message_form.errors}, status=400)
+    try:
+        await sync_to_async(ratelimit.admit)(request, session.pk, "message")
+    except ratelimit.Overloaded as exc:
+        return _overloaded(exc)
 
-def _trigger_video_generation(session: ChatSession, prompt: str) -> GeneratedVideo:
-    video = GeneratedVideo.objects.create(
+    message = await Message.objects.acreate(
         session=session,
-        prompt=prompt,
-        status=GeneratedVideo.STATUS_PROCESSING,
+        sender=Message.USER,
+        content=message_form.cleaned_data.get("content", ""),
+        attachment=message_form.cleaned_data.get("attachment"),
     )
+    attachment_url = request.build_absolute_uri(message.attachment.url) if message.attachment else None
+    # Context assembly reads the session history from the database.
+    payload = await sync_to_async(build_message_payload)(message, attachment_url, _callback_url(request))
+    if isinstance(request, ASGIRequest):
+        stream = _areply_stream(request, message, payload)
+    else:
+        # WSGI buffers async iterators entirely, so keep a sync generator there.
+        stream = _reply_stream(request, message, payload)
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _render_message(request: HttpRequest, message: Message) -> str:
+    return render_to_string("chatbox_app/partials/message.html", {"message": message}, request)
+
+
+def _reply_stream(request: HttpRequest, message: Message, payload: dict) -> Iterator[str]:
+    yield events.format_sse("message", {"id": message.pk, "html": _render_message(request, message)})
+
+    chunks: list[str] = []
+    # Admission already happened in the view, so a racing stream is counted but never refused mid-response.
+    with ratelimit.upstream_slot(strict=False):
+        upstream = stream_message_reply(message.pk, payload)
+        try:
+            for text in upstream:
+                chunks.append(text)
+                yield events.format_sse("delta", {"text": text})
+        except ratelimit.Overloaded:
+            # The breaker is open: skip the upstream and let the outbox deliver once it recovers.
+            enqueue_message(message, payload=payload)
+            yield events.format_sse("error", {"message": QUEUED_REPLY})
+            return
+        except (requests.RequestException, ValueError):
+            logger.exception(
+                "Streaming reply failed",
+                extra={"session_id": message.session_id, "message_id": message.pk, "received_chunks": len(chunks)},
+            )
+            if not chunks:
+                enqueue_message(message, payload=payload)
+            yield events.format_sse(
+                "error", {"message": "La réponse du service distant a été interrompue. Veuillez réessayer plus tard."}
+            )
+            return
+        finally:
+            # Closing here also runs when the client disconnects, which releases the upstream connection.
+            upstream.close()
+
+    if not chunks:
+        yield events.format_sse("done", {"id": None, "html": ""})
+        return
+    reply = save_assistant_reply(message, "".join(chunks))
+    yield events.format_sse("done", {"id": reply.pk, "html": _render_message(request, reply)})
+
+
+async def _areply_stream(request: HttpRequest, message: Message, payload: dict) -> AsyncIterator[str]:
+    yield events.format_sse("message", {"id": message.pk, "html": _render_message(request, message)})
+
+    chunks: list[str] = []
+    async with ratelimit.aupstream_slot(strict=False):
+        upstream = astream_message_reply(message.pk, payload)
+        try:
+            async for text in upstream:
+                chunks.append(text)
+                yield events.format_sse("delta", {"text": text})
+        except ratelimit.Overloaded:
+            # The breaker is open: skip the upstream and let the outbox deliver once it recovers.
+            await sync_to_async(enqueue_message)(message, payload=payload)
+            yield events.format_sse("error", {"message": QUEUED_REPLY})
+            return
+        except (httpx.HTTPError, ValueError):
+            logger.exception(
+                "Streaming reply failed",
+                extra={"session_id": message.session_id, "message_id": message.pk, "received_chunks": len(chunks)},
+            )
+            if not chunks:
+                await sync_to_async(enqueue_message)(message, payload=payload)
+            yield events.format_sse(
+                "error", {"message": "La réponse du service distant a été interrompue. Veuillez réessayer plus tard."}
+            )
+            return
+        finally:
+            await upstream.aclose()
+
+    if not chunks:
+        yield events.format_sse("done", {"id": None, "html": ""})
+        return
+    reply = await sync_to_async(save_assistant_reply)(message, "".join(chunks))
+    yield events.format_sse("done", {"id": reply.pk, "html": _render_message(request, reply)})
 
-    api_url = getattr(settings, "AI_VIDEO_API_URL", "")
-    api_key = getattr(settings, "AI_VIDEO_API_KEY", "")
 
-    if not api_url:
-        video.status = GeneratedVideo.STATUS_PENDING
-        video.save(update_fields=["status"])
-        return video
+def _callback_url(request: HttpRequest) -> str | None:
+    if not callbacks.callbacks_enabled():
+        return None
+    return request.build_absolute_uri(reverse("chatbox_app:ai_callback"))
 
-    headers = {"Content-Type": "application/json"}
-    if api_key:
-        headers["Authorization"] = f"Bearer {api_key}"
 
-    payload = {
-        "prompt": prompt,
-        "session_id": session.pk,
-        "session_name": session.name,
-    }
+def _monitoring_allowed(request: HttpRequest) -> bool:
+    proxied = any(header in request.headers for header in metrics.PROXY_HEADERS)
+    return metrics.allowed(request.headers.get("Authorization", ""), request.META.get("REMOTE_ADDR", ""), proxied)
 
-    try:
-        logger.info(
-            "Dispatching video generation",
-            extra={
-                "session_id": session.pk,
-                "video_id": video.pk,
-                "endpoint": api_url,
-                "payload": payload,
-            },
-        )
-        response = requests.post(api_url, json=payload, headers=headers, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        logger.info(
-            "Webhook response received",
-            extra={
-                "session_id": session.pk,
-                "video_id": video.pk,
-                "status": data.get("status"),
-                "video_url": data.get("video_url"),
-                "external_id": data.get("id") or data.get("job_id"),
-            },
-        )
-        video.external_id = data.get("id") or data.get("job_id", "")
-        video.video_url = data.get("video_url", "")
-        api_status = (data.get("status") or "").lower()
-        if video.video_url:
-            video.status = GeneratedVideo.STATUS_COMPLETED
-        elif api_status in {GeneratedVideo.STATUS_PENDING, GeneratedVideo.STATUS_PROCESSING}:
-            video.status = GeneratedVideo.STATUS_PENDING
-        elif api_status == GeneratedVideo.STATUS_FAILED:
-            video.status = GeneratedVideo.STATUS_FAILED
-        else:
-            video.status = GeneratedVideo.STATUS_PROCESSING
-        video.save(update_fields=["external_id", "video_url", "status"])
-    except requests.RequestException as exc:
-        video.status = GeneratedVideo.STATUS_FAILED
-        video.save(update_fields=["status"])
-        logger.exception(
-            "Webhook call failed",
-            extra={"session_id": session.pk, "video_id": video.pk, "endpoint": api_url},
-        )
-        raise exc
 
-    return video
+def metrics_export(request: HttpRequest) -> HttpResponse:
+    if not metrics.enabled():
+        raise Http404
+    if not _monitoring_allowed(request):
+        return HttpResponse("Jeton invalide.", status=401, content_type="text/plain; charset=utf-8")
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 
-def _dispatch_message_webhook(request: HttpRequest, message: Message) -> None:
-    webhook_url = getattr(settings, "AI_MESSAGE_WEBHOOK_URL", "")
-    webhook_key = getattr(settings, "AI_MESSAGE_WEBHOOK_KEY", "")
-    webhook_method = getattr(settings, "AI_MESSAGE_WEBHOOK_METHOD", "POST").upper()
+def upstream_status(request: HttpRequest) -> JsonResponse:
+    breakers = [CircuitBreaker(name).snapshot() for name in BREAKERS]
+    healthy = all(breaker["state"] == "closed" for breaker in breakers)
+    if not _monitoring_allowed(request):
+        # Load balancers only need the states; failure counts and history are for the metrics scrapers.
+        breakers = [{key: breaker[key] for key in ("name", "state", "retry_after")} for breaker in breakers]
+    return JsonResponse({"healthy": healthy, "breakers": breakers}, status=200 if healthy else 503)
 
-    if not webhook_url:
-        logger.warning(
-            "No message webhook configured; skipping dispatch",
-            extra={"session_id": message.session_id, "message_id": message.pk},
-        )
-        return
 
-    headers = {"Content-Type": "application/json"}
-    if webhook_key:
-        headers["Authorization"] = f"Bearer {webhook_key}"
-
-    payload = {
-        "message_id": message.pk,
-        "session_id": message.session_id,
-        "session_name": message.session.name,
-        "sender": message.sender,
-        "content": message.content,
-        "created_at": message.created_at.isoformat(),
+def search_content(request: HttpRequest) -> JsonResponse:
+    query = request.GET.get("q", "").strip()
+    max_limit = getattr(settings, "SEARCH_MAX_RESULTS", 100)
+    try:
+        limit = int(request.GET.get("limit", getattr(settings, "SEARCH_RESULTS", 20)))
+        session_id = int(request.GET["session"]) if request.GET.get("session") else None
+    except ValueError:
+        return JsonResponse({"error": "Paramètres de recherche invalides."}, status=400)
+    if len(query) < 2:
+        return JsonResponse({"error": "La recherche doit contenir au moins 2 caractères."}, status=400)
+    limit = max(1, min(limit, max_limit))
+
+    results = search.search(query[:200], limit=limit, session_id=session_id)
+    data = {
+        "query": query,
+        "results": [
+            {
+                "type": result.kind,
+                "id": result.object_id,
+                "session_id": result.session_id,
+                "session_name": result.session_name,
+                "score": round(result.score, 6),
+                "snippet": result.snippet,
+                "created_at": result.created_at.isoformat(),
+                "url": reverse("chatbox_app:chat_session", args=[result.session_id]),
+            }
+            for result in results
+        ],
     }
+    return JsonResponse(data)
+
+
+def session_messages(request: HttpRequest, session_id: int) -> JsonResponse:
+    session = get_object_or_404(ChatSession, pk=session_id)
+    if session.is_archived:
+        archive.rehydrate(session)
+    default_limit = getattr(settings, "CHAT_MESSAGES_PAGE_SIZE", 50)
+    max_limit = getattr(settings, "CHAT_MESSAGES_MAX_PAGE_SIZE", 200)
+    try:
+        limit = int(request.GET.get("limit", default_limit))
+        after = int(request.GET["after"]) if request.GET.get("after") else None
+        before = int(request.GET["before"]) if request.GET.get("before") else None
+    except ValueError:
+        return JsonResponse({"error": "Paramètres de pagination invalides."}, status=400)
+    if after is not None and before is not None:
+        return JsonResponse({"error": "Utilisez after ou before, pas les deux."}, status=400)
+    limit = max(1, min(limit, max_limit))
+
+    page = message_page(session, limit, after=after, before=before)
+    data = {
+        "messages": [
+            {
+                "id": message.pk,
+                "sender": message.sender,
+                "content": message.content,
+                "created_at": message.created_at.isoformat(),
+                "attachment_url": message.attachment.url if message.attachment else "",
+                "attachment_type": message.attachment_type,
+                "html": render_to_string("chatbox_app/partials/message.html", {"message": message}, request),
+            }
+            for message in page.messages
+        ],
+        "has_more": page.has_more,
+        "first_id": page.first_id,
+        "last_id": page.last_id,
+    }
+    return JsonResponse(data)
 
-    if message.attachment:
-        payload["attachment_url"] = request.build_absolute_uri(message.attachment.url)
-        payload["attachment_type"] = message.attachment_type
-
-    logger.info(
-        "Dispatching chat message",
-        extra={
-            "session_id": message.session_id,
-            "message_id": message.pk,
-            "endpoint": webhook_url,
-            "method": webhook_method,
-        },
-    )
 
-    if webhook_method == "GET":
-        response = requests.get(webhook_url, params=payload, headers=headers, timeout=30)
-    elif webhook_method == "POST":
-        response = requests.post(webhook_url, json=payload, headers=headers, timeout=30)
+async def session_events(request: HttpRequest, session_id: int) -> HttpResponse:
+    if not await ChatSession.objects.filter(pk=session_id).aexists():
+        raise Http404("Session introuvable")
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the stream would be buffered forever; 204 tells EventSource to stop and the page to poll.
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(_session_event_stream(session_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def _pending_videos(session_id: int, video_ids=None) -> dict[int, dict]:
+    queryset = GeneratedVideo.objects.filter(session_id=session_id)
+    if video_ids is not None:
+        queryset = queryset.filter(pk__in=list(video_ids))
     else:
-        logger.warning(
-            "Unsupported webhook method; defaulting to POST",
-            extra={"session_id": message.session_id, "message_id": message.pk, "method": webhook_method},
-        )
-        response = requests.post(webhook_url, json=payload, headers=headers, timeout=30)
-    response.raise_for_status()
+        queryset = queryset.exclude(status__in=[GeneratedVideo.STATUS_COMPLETED, GeneratedVideo.STATUS_FAILED])
+    return {video.pk: video.status_payload() async for video in queryset}
+
+
+async def _session_event_stream(session_id: int):
+    watched = await _pending_videos(session_id)
+    yield "retry: 3000\n\n"
+    for data in watched.values():
+        yield events.format_sse("video", data)
 
+    deadline = time.monotonic() + getattr(settings, "CHAT_EVENTS_MAX_DURATION", 300)
+    subscription = events.subscribe(session_id)
     try:
-        data = response.json()
-    except ValueError as exc:
-        logger.warning(
-            "Webhook response is not JSON",
-            extra={"session_id": message.session_id, "message_id": message.pk},
-        )
-        raise ValueError("Réponse JSON invalide") from exc
-
-    logger.info(
-        "Message webhook delivered",
-        extra={
-            "session_id": message.session_id,
-            "message_id": message.pk,
-            "status": data.get("status"),
-            "http_status": response.status_code,
-        },
-    )
+        async for message in subscription:
+            if message is None:
+                # Idle tick: catch updates published by processes outside this broker.
+                if watched:
+                    for video_id, data in (await _pending_videos(session_id, watched)).items():
+                        if data != watched[video_id]:
+                            yield events.format_sse("video", data)
+                        watched[video_id] = data
+                yield ": keepalive\n\n"
+            else:
+                payload = json.loads(message)
+                if payload["event"] == "video":
+                    watched[payload["data"]["id"]] = payload["data"]
+                yield events.format_sse(payload["event"], payload["data"])
+            watched = {
+                video_id: data
+                for video_id, data in watched.items()
+                if data["status"] not in {GeneratedVideo.STATUS_COMPLETED, GeneratedVideo.STATUS_FAILED}
+            }
+            if time.monotonic() >= deadline:
+                # EventSource reconnects after the retry delay and picks up the current state.
+                break
+    finally:
+        await subscription.aclose()
+
+
+def _conditional_json(request: HttpRequest, data: dict, etag: str) -> HttpResponse:
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+    if etag in if_none_match or "*" in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(data)
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
 
-    headers = {"Content-Type": "application/json"}
-    if api_key:
-        headers["Authorization"] = f"Bearer {api_key}"
 
-    payload = {
-        "prompt": prompt,
-        "session_id": session.pk,
-        "session_name": session.name,
-    }
+async def video_status(request: HttpRequest, video_id: int) -> HttpResponse:
+    entry = await status_cache.aget_entry(video_id)
+    if entry is None:
+        raise Http404("Vidéo introuvable")
+    return _conditional_json(request, entry["payload"], entry["etag"])
+
 
+def video_status_batch(request: HttpRequest) -> HttpResponse:
+    max_ids = getattr(settings, "VIDEO_STATUS_BATCH_MAX", 100)
     try:
-        logger.info(
-            "Dispatching video generation",
-            extra={
-                "session_id": session.pk,
-                "video_id": video.pk,
-                "endpoint": api_url,
-                "payload": payload,
-            },
-        )
-        response = requests.post(api_url, json=payload, headers=headers, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        logger.info(
-            "Webhook response received",
-            extra={
-                "session_id": session.pk,
-                "video_id": video.pk,
-                "status": data.get("status"),
-                "video_url": data.get("video_url"),
-                "external_id": data.get("id") or data.get("job_id"),
-            },
-        )
-        video.external_id = data.get("id") or data.get("job_id", "")
-        video.video_url = data.get("video_url", "")
-        api_status = (data.get("status") or "").lower()
-        if video.video_url:
-            video.status = GeneratedVideo.STATUS_COMPLETED
-        elif api_status in {GeneratedVideo.STATUS_PENDING, GeneratedVideo.STATUS_PROCESSING}:
-            video.status = GeneratedVideo.STATUS_PENDING
-        elif api_status == GeneratedVideo.STATUS_FAILED:
-            video.status = GeneratedVideo.STATUS_FAILED
-        else:
-            video.status = GeneratedVideo.STATUS_PROCESSING
-        video.save(update_fields=["external_id", "video_url", "status"])
-    except requests.RequestException as exc:
-        video.status = GeneratedVideo.STATUS_FAILED
-        video.save(update_fields=["status"])
-        logger.exception(
-            "Webhook call failed",
-            extra={"session_id": session.pk, "video_id": video.pk, "endpoint": api_url},
+        video_ids = sorted({int(value) for value in request.GET.get("ids", "").split(",") if value.strip()})
+    except ValueError:
+        return JsonResponse({"error": "Identifiants invalides."}, status=400)
+    if not video_ids:
+        return JsonResponse({"error": "Paramètre ids requis."}, status=400)
+    if len(video_ids) > max_ids:
+        return JsonResponse({"error": f"{max_ids} identifiants maximum."}, status=400)
+
+    entries = status_cache.get_entries(video_ids)
+    data = {"videos": {str(video_id): entry["payload"] for video_id, entry in sorted(entries.items())}}
+    etag = status_cache.compute_etag([entry["etag"] for _, entry in sorted(entries.items())])
+    return _conditional_json(request, data, etag)
+
+
+@csrf_exempt
+@require_POST
+def ai_callback(request: HttpRequest) -> JsonResponse:
+    if not callbacks.callbacks_enabled():
+        return JsonResponse({"error": "Callbacks désactivés."}, status=403)
+    try:
+        callbacks.verify_signature(
+            request.body,
+            request.META.get(callbacks.TIMESTAMP_HEADER, ""),
+            request.META.get(callbacks.SIGNATURE_HEADER, ""),
         )
-        raise exc
-
-    return video
+        try:
+            data = json.loads(request.body)
+        except ValueError as exc:
+            raise callbacks.CallbackError("Corps JSON invalide.") from exc
+        if not isinstance(data, dict):
+            raise callbacks.CallbackError("Corps JSON invalide.")
+
+        kind = data.get("type")
+        if kind == "video":
+            video, changed = callbacks.apply_video_callback(data)
+            return JsonResponse({"status": "ok", "video_id": video.pk, "duplicate": not changed})
+        if kind == "message":
+            message, created = callbacks.apply_message_callback(data)
+            return JsonResponse({"status": "ok", "message_id": message.pk, "duplicate": not created})
+        raise callbacks.CallbackError("Type de callback inconnu.")
+    except callbacks.CallbackError as exc:
+        logger.warning("Rejected AI callback", extra={"reason": str(exc), "http_status": exc.status})
+        return JsonResponse({"error": str(exc)}, status=exc.status)
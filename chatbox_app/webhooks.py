@@ -0,0 +1,452 @@
+from __future__ import annotations
+
+import json
+import logging
+from typing import AsyncIterator, Iterator
+
+from django.conf import settings
+
+from . import context, http_client, metrics
+from .breaker import CircuitBreaker
+from .models import ChatSession, GeneratedVideo, Message
+
+
+logger = logging.getLogger(__name__)
+
+message_breaker = CircuitBreaker("message")
+video_breaker = CircuitBreaker("video")
+
+
+def message_webhook_configured() -> bool:
+    return bool(getattr(settings, "AI_MESSAGE_WEBHOOK_URL", ""))
+
+
+def video_api_configured() -> bool:
+    return bool(getattr(settings, "AI_VIDEO_API_URL", ""))
+
+
+def build_message_payload(
+    message: Message, attachment_url: str | None = None, callback_url: str | None = None
+) -> dict:
+    payload = {
+        "message_id": message.pk,
+        "session_id": message.session_id,
+        "session_name": message.session.name,
+        "sender": message.sender,
+        "content": message.content,
+        "created_at": message.created_at.isoformat(),
+    }
+    if message.attachment and attachment_url:
+        payload["attachment_url"] = attachment_url
+        payload["attachment_type"] = message.attachment_type
+    if callback_url:
+        payload["callback_url"] = callback_url
+    if context.enabled() and getattr(settings, "AI_MESSAGE_WEBHOOK_METHOD", "POST").upper() != "GET":
+        payload["context"] = context.build_context(message)
+    return payload
+
+
+def build_video_payload(session: ChatSession, prompt: str, callback_url: str | None = None) -> dict:
+    payload = {
+        "prompt": prompt,
+        "session_id": session.pk,
+        "session_name": session.name,
+    }
+    if callback_url:
+        payload["callback_url"] = callback_url
+    return payload
+
+
+def _auth_headers(key: str) -> dict:
+    headers = {"Content-Type": "application/json"}
+    if key:
+        headers["Authorization"] = f"Bearer {key}"
+    return headers
+
+
+def apply_video_result(video: GeneratedVideo, data: dict) -> GeneratedVideo:
+    video.video_url = data.get("video_url") or video.video_url
+    api_status = (data.get("status") or "").lower()
+    if video.video_url:
+        video.status = GeneratedVideo.STATUS_COMPLETED
+    elif api_status in {GeneratedVideo.STATUS_PENDING, GeneratedVideo.STATUS_PROCESSING}:
+        video.status = GeneratedVideo.STATUS_PENDING
+    elif api_status == GeneratedVideo.STATUS_FAILED:
+        video.status = GeneratedVideo.STATUS_FAILED
+    else:
+        video.status = GeneratedVideo.STATUS_PROCESSING
+    return video
+
+
+def _video_endpoint() -> tuple[str, dict]:
+    return getattr(settings, "AI_VIDEO_API_URL", ""), _auth_headers(getattr(settings, "AI_VIDEO_API_KEY", ""))
+
+
+def _log_video_dispatch(video: GeneratedVideo, api_url: str, payload: dict) -> None:
+    extra = {"session_id": video.session_id, "video_id": video.pk, "endpoint": api_url}
+    if metrics.sampled():
+        extra["payload"] = payload
+    logger.info("Dispatching video generation", extra=extra)
+
+
+def _record_video_response(video: GeneratedVideo, data: dict) -> None:
+    logger.info(
+        "Webhook response received",
+        extra={
+            "session_id": video.session_id,
+            "video_id": video.pk,
+            "status": data.get("status"),
+            "video_url": data.get("video_url"),
+            "external_id": data.get("id") or data.get("job_id"),
+        },
+    )
+    video.external_id = data.get("id") or data.get("job_id", "")
+    apply_video_result(video, data)
+
+
+def trigger_video_generation(video: GeneratedVideo, payload: dict) -> GeneratedVideo:
+    api_url, headers = _video_endpoint()
+    if not api_url:
+        video.status = GeneratedVideo.STATUS_PENDING
+        video.save(update_fields=["status", "updated_at"])
+        return video
+
+    with video_breaker.guard():
+        video.status = GeneratedVideo.STATUS_PROCESSING
+        video.save(update_fields=["status", "updated_at"])
+        _log_video_dispatch(video, api_url, payload)
+        response = http_client.post(api_url, json=payload, headers=headers)
+        response.raise_for_status()
+    _record_video_response(video, response.json())
+    video.save(update_fields=["external_id", "video_url", "status", "updated_at"])
+    return video
+
+
+async def atrigger_video_generation(video: GeneratedVideo, payload: dict) -> GeneratedVideo:
+    api_url, headers = _video_endpoint()
+    if not api_url:
+        video.status = GeneratedVideo.STATUS_PENDING
+        await video.asave(update_fields=["status", "updated_at"])
+        return video
+
+    async with video_breaker.aguard():
+        video.status = GeneratedVideo.STATUS_PROCESSING
+        await video.asave(update_fields=["status", "updated_at"])
+        _log_video_dispatch(video, api_url, payload)
+        response = await http_client.apost(api_url, json=payload, headers=headers)
+        response.raise_for_status()
+    _record_video_response(video, response.json())
+    await video.asave(update_fields=["external_id", "video_url", "status", "updated_at"])
+    return video
+
+
+REPLY_KEYS = ("reply", "answer", "output", "response")
+CHUNK_KEYS = ("delta", "token", "content", "text") + REPLY_KEYS
+STREAM_ACCEPT = "text/event-stream, application/x-ndjson, application/json;q=0.9, */*;q=0.5"
+
+
+def _text_from(data, keys: tuple[str, ...]) -> str:
+    if isinstance(data, str):
+        return data
+    if isinstance(data, list):
+        return "".join(_text_from(item, keys) for item in data)
+    if not isinstance(data, dict):
+        return ""
+    choices = data.get("choices")
+    if isinstance(choices, list) and choices and isinstance(choices[0], dict):
+        choice = choices[0]
+        delta = choice.get("delta") or choice.get("message") or {}
+        return (delta.get("content") if isinstance(delta, dict) else "") or choice.get("text") or ""
+    for key in keys:
+        value = data.get(key)
+        if isinstance(value, str):
+            return value
+        if isinstance(value, (dict, list)):
+            nested = _text_from(value, keys)
+            if nested:
+                return nested
+    return ""
+
+
+def extract_reply(data) -> str:
+    if isinstance(data, str):
+        return ""
+    return _text_from(data, REPLY_KEYS)
+
+
+def _chunk_text(raw: str) -> str:
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return raw
+    if isinstance(data, (dict, list)):
+        return _text_from(data, CHUNK_KEYS)
+    return raw
+
+
+STREAM_DONE = object()
+NDJSON_TYPES = {"application/x-ndjson", "application/jsonl", "application/stream+json"}
+
+
+def _stream_format(response) -> str:
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if content_type == "text/event-stream":
+        return "sse"
+    if content_type in NDJSON_TYPES:
+        return "ndjson"
+    if content_type == "application/json":
+        return "json"
+    return "text"
+
+
+def _line_text(line: str, stream_format: str):
+    if stream_format == "sse":
+        if not line.startswith("data:"):
+            return ""
+        data = line[5:].strip()
+        return STREAM_DONE if data == "[DONE]" else _chunk_text(data)
+    return _chunk_text(line) if line.strip() else ""
+
+
+def iter_reply_chunks(response) -> Iterator[str]:
+    stream_format = _stream_format(response)
+    if "charset" not in response.headers.get("Content-Type", "").lower():
+        response.encoding = "utf-8"
+
+    if stream_format == "json":
+        text = extract_reply(response.json())
+        if text:
+            yield text
+    elif stream_format == "text":
+        for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+            if chunk:
+                yield chunk
+    else:
+        for line in response.iter_lines(decode_unicode=True):
+            text = _line_text(line, stream_format)
+            if text is STREAM_DONE:
+                break
+            if text:
+                yield text
+
+
+async def aiter_reply_chunks(response) -> AsyncIterator[str]:
+    stream_format = _stream_format(response)
+    if stream_format == "json":
+        await response.aread()
+        text = extract_reply(response.json())
+        if text:
+            yield text
+    elif stream_format == "text":
+        async for chunk in response.aiter_text():
+            if chunk:
+                yield chunk
+    else:
+        async for line in response.aiter_lines():
+            text = _line_text(line, stream_format)
+            if text is STREAM_DONE:
+                break
+            if text:
+                yield text
+
+
+def _stream_request(message_id: int, payload: dict) -> tuple[str, dict] | None:
+    webhook_url = getattr(settings, "AI_MESSAGE_WEBHOOK_URL", "")
+    if not webhook_url:
+        return None
+    headers = _auth_headers(getattr(settings, "AI_MESSAGE_WEBHOOK_KEY", ""))
+    headers["Accept"] = STREAM_ACCEPT
+    logger.info(
+        "Streaming chat message reply",
+        extra={"session_id": payload.get("session_id"), "message_id": message_id, "endpoint": webhook_url},
+    )
+    return webhook_url, headers
+
+
+def stream_message_reply(message_id: int, payload: dict) -> Iterator[str]:
+    endpoint = _stream_request(message_id, payload)
+    if endpoint is None:
+        return
+    webhook_url, headers = endpoint
+    with message_breaker.guard():
+        response = http_client.post(webhook_url, json=dict(payload, stream=True), headers=headers, stream=True)
+        try:
+            response.raise_for_status()
+            yield from iter_reply_chunks(response)
+        finally:
+            response.close()
+
+
+async def astream_message_reply(message_id: int, payload: dict) -> AsyncIterator[str]:
+    endpoint = _stream_request(message_id, payload)
+    if endpoint is None:
+        return
+    webhook_url, headers = endpoint
+    async with message_breaker.aguard():
+        async with http_client.astream(
+            "POST", webhook_url, json=dict(payload, stream=True), headers=headers
+        ) as response:
+            response.raise_for_status()
+            async for text in aiter_reply_chunks(response):
+                yield text
+
+
+def save_assistant_reply(message: Message, content: str, external_id: str = "") -> Message:
+    reply, _ = Message.objects.get_or_create(
+        session_id=message.session_id,
+        external_id=external_id or f"reply:{message.pk}",
+        defaults={"sender": Message.ASSISTANT, "content": content},
+    )
+    return reply
+
+
+def _message_request(message_id: int, payload: dict) -> tuple[str, str, dict] | None:
+    webhook_url = getattr(settings, "AI_MESSAGE_WEBHOOK_URL", "")
+    webhook_key = getattr(settings, "AI_MESSAGE_WEBHOOK_KEY", "")
+    webhook_method = getattr(settings, "AI_MESSAGE_WEBHOOK_METHOD", "POST").upper()
+    session_id = payload.get("session_id")
+
+    if not webhook_url:
+        logger.warning(
+            "No message webhook configured; skipping dispatch",
+            extra={"session_id": session_id, "message_id": message_id},
+        )
+        return None
+
+    logger.info(
+        "Dispatching chat message",
+        extra={
+            "session_id": session_id,
+            "message_id": message_id,
+            "endpoint": webhook_url,
+            "method": webhook_method,
+        },
+    )
+
+    kwargs = {"headers": _auth_headers(webhook_key)}
+    if webhook_method == "GET":
+        # A query string cannot carry the nested context, so GET webhooks only get the flat fields.
+        kwargs["params"] = {key: value for key, value in payload.items() if key != "context"}
+        return "GET", webhook_url, kwargs
+    if webhook_method != "POST":
+        logger.warning(
+            "Unsupported webhook method; defaulting to POST",
+            extra={"session_id": session_id, "message_id": message_id, "method": webhook_method},
+        )
+    kwargs["json"] = payload
+    return "POST", webhook_url, kwargs
+
+
+def _message_response_data(response, message_id: int, payload: dict):
+    session_id = payload.get("session_id")
+    response.raise_for_status()
+
+    try:
+        data = response.json()
+    except ValueError as exc:
+        logger.warning(
+            "Webhook response is not JSON",
+            extra={"session_id": session_id, "message_id": message_id},
+        )
+        raise ValueError("Réponse JSON invalide") from exc
+
+    logger.info(
+        "Message webhook delivered",
+        extra={
+            "session_id": session_id,
+            "message_id": message_id,
+            "status": data.get("status") if isinstance(data, dict) else None,
+            "http_status": response.status_code,
+        },
+    )
+    return data
+
+
+def dispatch_message_webhook(message_id: int, payload: dict) -> dict:
+    request = _message_request(message_id, payload)
+    if request is None:
+        return {}
+    method, url, kwargs = request
+    with message_breaker.guard():
+        response = http_client.request(method, url, **kwargs)
+        return _message_response_data(response, message_id, payload)
+
+
+async def adispatch_message_webhook(message_id: int, payload: dict) -> dict:
+    request = _message_request(message_id, payload)
+    if request is None:
+        return {}
+    method, url, kwargs = request
+    async with message_breaker.aguard():
+        response = await http_client.arequest(method, url, **kwargs)
+        return _message_response_data(response, message_id, payload)
+
+
+class BatchItemError(ValueError):
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def message_batching_enabled() -> bool:
+    return (
+        getattr(settings, "AI_MESSAGE_BATCH_SIZE", 1) > 1
+        and getattr(settings, "AI_MESSAGE_WEBHOOK_METHOD", "POST").upper() == "POST"
+    )
+
+
+def _batch_request(payloads: list[dict]) -> tuple[str, dict]:
+    webhook_url = getattr(settings, "AI_MESSAGE_WEBHOOK_URL", "")
+    logger.info(
+        "Dispatching chat message batch",
+        extra={"endpoint": webhook_url, "batch_size": len(payloads)},
+    )
+    return webhook_url, {"headers": _auth_headers(getattr(settings, "AI_MESSAGE_WEBHOOK_KEY", "")), "json": payloads}
+
+
+def _batch_item(item, message_id):
+    if not isinstance(item, dict):
+        return BatchItemError(f"Réponse invalide pour le message {message_id}")
+    status = str(item.get("status") or "").lower()
+    if item.get("error") or status in {"error", "failed"}:
+        return BatchItemError(str(item.get("error") or status), retryable=item.get("retryable", True) is not False)
+    return item
+
+
+def split_batch_response(data, message_ids: list[int]) -> dict[int, object]:
+    if isinstance(data, dict):
+        data = data.get("results", data.get("messages"))
+    if not isinstance(data, list):
+        raise ValueError("Réponse de lot invalide : un tableau est attendu")
+
+    by_id = {item.get("message_id"): item for item in data if isinstance(item, dict) and "message_id" in item}
+    results = {}
+    for position, message_id in enumerate(message_ids):
+        if by_id:
+            item = by_id.get(message_id)
+        else:
+            # Without message_id the backend must answer in request order.
+            item = data[position] if position < len(data) else None
+        if item is None:
+            results[message_id] = BatchItemError(f"Aucune réponse pour le message {message_id}")
+        else:
+            results[message_id] = _batch_item(item, message_id)
+    return results
+
+
+def dispatch_message_batch(payloads: list[dict]) -> dict[int, object]:
+    url, kwargs = _batch_request(payloads)
+    with message_breaker.guard():
+        response = http_client.request("POST", url, **kwargs)
+        response.raise_for_status()
+        data = response.json()
+    return split_batch_response(data, [payload["message_id"] for payload in payloads])
+
+
+async def adispatch_message_batch(payloads: list[dict]) -> dict[int, object]:
+    url, kwargs = _batch_request(payloads)
+    async with message_breaker.aguard():
+        response = await http_client.arequest("POST", url, **kwargs)
+        response.raise_for_status()
+        data = response.json()
+    return split_batch_response(data, [payload["message_id"] for payload in payloads])
@@ -1,6 +1,8 @@
 import os
 from django.core.asgi import get_asgi_application
 
+from chatbox_app.asgi import DisconnectMiddleware
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "chatbox_project.settings")
 
-application = get_asgi_application()
+application = DisconnectMiddleware(get_asgi_application())
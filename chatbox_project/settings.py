@@ -35,6 +35,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "chatbox_app.middleware.MetricsMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -79,6 +80,55 @@ default_db = dj_database_url.config(
 if default_db:
     DATABASES["default"] = default_db
 
+REDIS_URL = os.getenv("REDIS_URL", "")
+
+VIDEO_PROMPT_CACHE_TTL = int(os.getenv("VIDEO_PROMPT_CACHE_TTL", "86400"))
+CONVERSATION_CACHE_TTL = int(os.getenv("CONVERSATION_CACHE_TTL", "3600"))
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+        # Eviction follows the Redis maxmemory-policy; use a dedicated database to isolate it.
+        "video_prompts": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("VIDEO_PROMPT_CACHE_URL", REDIS_URL),
+            "KEY_PREFIX": "video-prompts",
+            "TIMEOUT": VIDEO_PROMPT_CACHE_TTL,
+        },
+        "conversations": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "conversations",
+            "TIMEOUT": CONVERSATION_CACHE_TTL,
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {"MAX_ENTRIES": int(os.getenv("LOCMEM_CACHE_MAX_ENTRIES", "10000"))},
+        },
+        "video_prompts": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "video-prompts",
+            "TIMEOUT": VIDEO_PROMPT_CACHE_TTL,
+            "OPTIONS": {
+                "MAX_ENTRIES": int(os.getenv("VIDEO_PROMPT_CACHE_MAX_ENTRIES", "5000")),
+                "CULL_FREQUENCY": int(os.getenv("VIDEO_PROMPT_CACHE_CULL_FREQUENCY", "3")),
+            },
+        },
+        # LocMemCache evicts least recently used entries first; it is per process, so use Redis with several workers.
+        "conversations": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "conversations",
+            "TIMEOUT": CONVERSATION_CACHE_TTL,
+            "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CONVERSATION_CACHE_MAX_ENTRIES", "1000"))},
+        },
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -110,6 +160,13 @@ STORAGES = {
     "default": {
         "BACKEND": "django.core.files.storage.FileSystemStorage",
     },
+    "blobs": {
+        "BACKEND": "chatbox_app.storage.BlobStorage",
+    },
+    "archives": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": os.getenv("ARCHIVE_ROOT", str(BASE_DIR / "archive")), "base_url": None},
+    },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
@@ -117,6 +174,30 @@ STORAGES = {
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+MEDIA_SENDFILE_BACKEND = os.getenv("MEDIA_SENDFILE_BACKEND", "")
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+MEDIA_CACHE_MAX_AGE = int(os.getenv("MEDIA_CACHE_MAX_AGE", "3600"))
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+UPLOAD_CHUNKED_THRESHOLD = int(os.getenv("UPLOAD_CHUNKED_THRESHOLD", str(10 * 1024 * 1024)))
+# Chunked uploads idle this long are removed by gc_blobs and no longer keep their session from being archived.
+UPLOAD_EXPIRY = int(os.getenv("UPLOAD_EXPIRY", str(24 * 3600)))
+BLOB_GC_GRACE = int(os.getenv("BLOB_GC_GRACE", "3600"))
+ARCHIVE_INACTIVE_AFTER = int(os.getenv("ARCHIVE_INACTIVE_AFTER", str(90 * 24 * 3600)))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "200"))
+# "zstd" needs the zstandard package; empty picks zstd when it is installed and gzip otherwise.
+ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "")
+PREVIEW_MAX_SIZE = int(os.getenv("PREVIEW_MAX_SIZE", "480"))
+PREVIEW_QUALITY = int(os.getenv("PREVIEW_QUALITY", "75"))
+PREVIEW_WORKERS = int(os.getenv("PREVIEW_WORKERS", "0")) or None
+PREVIEW_FFMPEG_BINARY = os.getenv("PREVIEW_FFMPEG_BINARY", "ffmpeg")
+PREVIEW_VIDEO_OFFSET = float(os.getenv("PREVIEW_VIDEO_OFFSET", "1.0"))
+UPLOAD_MAX_SIZES = {
+    "video": int(os.getenv("UPLOAD_MAX_VIDEO_SIZE", str(2 * 1024 * 1024 * 1024))),
+    "archive": int(os.getenv("UPLOAD_MAX_ARCHIVE_SIZE", str(1024 * 1024 * 1024))),
+    "image": int(os.getenv("UPLOAD_MAX_IMAGE_SIZE", str(20 * 1024 * 1024))),
+    "default": int(os.getenv("UPLOAD_MAX_FILE_SIZE", str(50 * 1024 * 1024))),
+}
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -125,9 +206,92 @@ AI_VIDEO_API_URL = os.getenv(
     "https://maryellen-parchable-gertude.ngrok-free.dev/webhook-test/1aba3258-8d54-4a58-b038-01f73e00ddae",
 )
 AI_VIDEO_API_KEY = os.getenv("AI_VIDEO_API_KEY", "")
+# Job status endpoint: a URL containing {external_id} is queried per job, otherwise ids are POSTed in batches.
+AI_VIDEO_STATUS_URL = os.getenv("AI_VIDEO_STATUS_URL", "")
+AI_VIDEO_STATUS_LOOKUP_BATCH = int(os.getenv("AI_VIDEO_STATUS_LOOKUP_BATCH", "100"))
 AI_MESSAGE_WEBHOOK_URL = os.getenv("AI_MESSAGE_WEBHOOK_URL", AI_VIDEO_API_URL)
 AI_MESSAGE_WEBHOOK_KEY = os.getenv("AI_MESSAGE_WEBHOOK_KEY", AI_VIDEO_API_KEY)
+# GET sends the payload as query parameters, without the conversation context (POST only).
 AI_MESSAGE_WEBHOOK_METHOD = os.getenv("AI_MESSAGE_WEBHOOK_METHOD", "POST").upper()
+AI_MESSAGE_BATCH_SIZE = int(os.getenv("AI_MESSAGE_BATCH_SIZE", "1"))
+AI_MESSAGE_BATCH_WINDOW_MS = float(os.getenv("AI_MESSAGE_BATCH_WINDOW_MS", "50"))
+AI_MESSAGE_STREAMING = os.getenv("AI_MESSAGE_STREAMING", "False").lower() == "true"
+
+AI_HTTP_CONNECT_TIMEOUT = float(os.getenv("AI_HTTP_CONNECT_TIMEOUT", "5"))
+AI_HTTP_READ_TIMEOUT = float(os.getenv("AI_HTTP_READ_TIMEOUT", "30"))
+AI_HTTP_POOL_CONNECTIONS = int(os.getenv("AI_HTTP_POOL_CONNECTIONS", "4"))
+AI_HTTP_POOL_MAXSIZE = int(os.getenv("AI_HTTP_POOL_MAXSIZE", "16"))
+AI_HTTP_ASYNC_MAX_CONNECTIONS = int(os.getenv("AI_HTTP_ASYNC_MAX_CONNECTIONS", "1000"))
+AI_HTTP_MAX_RETRIES = int(os.getenv("AI_HTTP_MAX_RETRIES", "3"))
+AI_HTTP_BACKOFF_FACTOR = float(os.getenv("AI_HTTP_BACKOFF_FACTOR", "0.5"))
+
+AI_CALLBACK_SECRET = os.getenv("AI_CALLBACK_SECRET", "")
+AI_CALLBACK_TOLERANCE = int(os.getenv("AI_CALLBACK_TOLERANCE", "300"))
+
+CHAT_MESSAGES_PAGE_SIZE = int(os.getenv("CHAT_MESSAGES_PAGE_SIZE", "50"))
+CHAT_MESSAGES_MAX_PAGE_SIZE = int(os.getenv("CHAT_MESSAGES_MAX_PAGE_SIZE", "200"))
+DASHBOARD_PAGE_SIZE = int(os.getenv("DASHBOARD_PAGE_SIZE", "20"))
+DASHBOARD_COUNT_CACHE_TIMEOUT = int(os.getenv("DASHBOARD_COUNT_CACHE_TIMEOUT", "60"))
+CHAT_FRAGMENT_CACHE_TIMEOUT = int(os.getenv("CHAT_FRAGMENT_CACHE_TIMEOUT", "3600"))
+
+SEARCH_RESULTS = int(os.getenv("SEARCH_RESULTS", "20"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "100"))
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "2000"))
+
+CHAT_EVENTS_BACKEND = os.getenv("CHAT_EVENTS_BACKEND", "redis" if REDIS_URL else "memory")
+CHAT_EVENTS_KEEPALIVE = float(os.getenv("CHAT_EVENTS_KEEPALIVE", "15"))
+# Streams close after this many seconds and EventSource reconnects, so a connection lost unnoticed cannot live on.
+CHAT_EVENTS_MAX_DURATION = float(os.getenv("CHAT_EVENTS_MAX_DURATION", "300"))
+
+# Only applies with a shared cache (REDIS_URL); with LocMem every status is read from the database.
+VIDEO_STATUS_CACHE_TIMEOUT = int(os.getenv("VIDEO_STATUS_CACHE_TIMEOUT", "3600"))
+VIDEO_STATUS_BATCH_MAX = int(os.getenv("VIDEO_STATUS_BATCH_MAX", "100"))
+# Without REDIS_URL, identical prompts are coalesced through the database and hit counters stay per process.
+VIDEO_COALESCE_WINDOW = int(os.getenv("VIDEO_COALESCE_WINDOW", "3600"))
+VIDEO_RECONCILE_STALE_AFTER = int(os.getenv("VIDEO_RECONCILE_STALE_AFTER", "600"))
+VIDEO_RECONCILE_DEADLINE = int(os.getenv("VIDEO_RECONCILE_DEADLINE", "86400"))
+VIDEO_RECONCILE_CONCURRENCY = int(os.getenv("VIDEO_RECONCILE_CONCURRENCY", "8"))
+
+# Limits and in-flight counters must be shared by every process, so they default to on only with Redis.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True" if REDIS_URL else "False").lower() == "true"
+# "redis" runs token buckets in a Lua script. "cache" counts fixed windows instead, which can let up to twice a
+# limit through across a window boundary.
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "redis" if REDIS_URL else "cache")
+RATE_LIMIT_SESSION = os.getenv("RATE_LIMIT_SESSION", "20/60")
+RATE_LIMIT_IP = os.getenv("RATE_LIMIT_IP", "60/60")
+RATE_LIMIT_UPSTREAM = os.getenv("RATE_LIMIT_UPSTREAM", "600/60")
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+UPSTREAM_MAX_INFLIGHT = int(os.getenv("UPSTREAM_MAX_INFLIGHT", "64" if REDIS_URL else "0"))
+# Refreshed on every acquisition, so only a counter left idle this long (e.g. after a crash) is dropped.
+UPSTREAM_INFLIGHT_TTL = int(os.getenv("UPSTREAM_INFLIGHT_TTL", "300"))
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_FAILURE_WINDOW = int(os.getenv("BREAKER_FAILURE_WINDOW", "60"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))
+BREAKER_PROBE_TIMEOUT = int(os.getenv("BREAKER_PROBE_TIMEOUT", "60"))
+
+CONVERSATION_CONTEXT_ENABLED = os.getenv("CONVERSATION_CONTEXT_ENABLED", "True").lower() == "true"
+CONVERSATION_HISTORY_TURNS = int(os.getenv("CONVERSATION_HISTORY_TURNS", "20"))
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "2000"))
+# Summarises the CONVERSATION_HISTORY_TURNS turns before the window; anything older is left out.
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "300"))
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Without a token, /metrics (and the breaker details on health/upstream/) only answer these addresses or networks,
+# e.g. "10.0.0.0/8", and never through a proxy. With neither set, only loopback in DEBUG gets in.
+METRICS_ALLOWED_IPS: list[str] = [
+    value.strip() for value in os.getenv("METRICS_ALLOWED_IPS", "").split(",") if value.strip()
+]
+METRICS_LOG_SAMPLE_RATE = float(os.getenv("METRICS_LOG_SAMPLE_RATE", "0.01"))
+METRICS_WORKER_PORT = int(os.getenv("METRICS_WORKER_PORT", "0"))
+METRICS_WORKER_ADDR = os.getenv("METRICS_WORKER_ADDR", "127.0.0.1")
+
+WEBHOOK_WORKER_CONCURRENCY = int(os.getenv("WEBHOOK_WORKER_CONCURRENCY", "8"))
+WEBHOOK_WORKER_POLL_INTERVAL = float(os.getenv("WEBHOOK_WORKER_POLL_INTERVAL", "1.0"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+WEBHOOK_RETRY_BACKOFF = int(os.getenv("WEBHOOK_RETRY_BACKOFF", "10"))
+WEBHOOK_CLAIM_TIMEOUT = int(os.getenv("WEBHOOK_CLAIM_TIMEOUT", "120"))
 
 if not DEBUG:
     SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")